@@ -0,0 +1,37 @@
+# coding=utf-8
+# Throughput of the CSV import/export compared to numpy's savetxt/genfromtxt.
+# Usage: python benchmarks/bench_csv.py [n_samples]
+from __future__ import division, print_function
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pyphysio as ph
+
+__author__ = 'AleB'
+
+
+def timeit(f):
+    t0 = time.perf_counter()
+    f()
+    return time.perf_counter() - t0
+
+
+def report(name, seconds, path, n):
+    mb = os.path.getsize(path) / 2 ** 20
+    print("%-22s %7.2f s  %8.1f MB/s  %10.0f rows/s" % (name, seconds, mb / seconds, n / seconds))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    s = ph.MultiEvenly(np.cumsum(np.random.randn(n, 2), axis=0), 1000, 0, 'ACC')
+    path = os.path.join(tempfile.mkdtemp(), 'bench.csv')
+    print("%d rows, %d channels" % (n, s.get_nchannels()))
+
+    table = np.c_[np.arange(n), s.get_times(), s.get_values()]
+    report('np.savetxt', timeit(lambda: np.savetxt(path, table, delimiter=',', fmt='%.6f')), path, n)
+    report('MultiEvenly.to_csv', timeit(lambda: s.to_csv(path)), path, n)
+    report('np.genfromtxt', timeit(lambda: np.genfromtxt(path, delimiter=',', skip_header=4)), path, n)
+    report('ph.from_csv', timeit(lambda: ph.from_csv(path)), path, n)
+    os.remove(path)
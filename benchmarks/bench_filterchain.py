@@ -0,0 +1,51 @@
+# coding=utf-8
+# Time and peak memory of a chain of IIR filters (high-pass, low-pass, band-stop), applied one IIRFilter at a
+# time compared to the fused FilterChain.
+# Usage: python benchmarks/bench_filterchain.py [n_samples] [n_channels]
+from __future__ import division, print_function
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pyphysio as ph
+
+__author__ = 'AleB'
+
+
+def measure(f, n_runs=3):
+    times = []
+    for _ in range(n_runs):
+        t0 = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def report(name, seconds, peak, signal):
+    print("%-28s %8.3f s  %10.1f Msamples/s  peak %5.1f x input" % (name, seconds, signal.size / seconds / 1e6,
+                                                                    peak / signal.nbytes))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    fsamp = 500
+    values = np.cumsum(np.random.randn(n, n_channels), axis=0) + \
+        np.sin(2 * np.pi * 50 * np.arange(n) / fsamp)[:, None]
+    s = ph.EvenlySignal(values[:, 0], fsamp, 0, 'ECG') if n_channels == 1 else ph.MultiEvenly(values, fsamp, 0, 'ECG')
+    stages = [ph.IIRFilter(fp=1, fs=0.2), ph.IIRFilter(fp=30, fs=60), ph.IIRFilter(fp=[40, 60], fs=[48, 52])]
+    chain = ph.FilterChain(stages)
+    print("%d samples, %d channels, %d IIR stages" % (n, n_channels, len(stages)))
+
+    def unfused():
+        x = s
+        for f in stages:
+            x = f(x)
+        return x
+
+    report('IIRFilter x %d' % len(stages), *measure(unfused), signal=s)
+    report('FilterChain', *measure(lambda: chain(s)), signal=s)
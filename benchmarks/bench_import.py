@@ -0,0 +1,43 @@
+# coding=utf-8
+# Time of 'import pyphysio' in fresh interpreters, with the slowest imported modules.
+# Usage: python benchmarks/bench_import.py [n_runs] [max_seconds]
+# Exits with status 1 if the median time exceeds max_seconds (regression guard).
+from __future__ import division, print_function
+import subprocess
+import sys
+
+__author__ = 'AleB'
+
+
+def import_time():
+    out = subprocess.check_output([sys.executable, '-c', "import time; t0 = time.perf_counter(); import pyphysio; "
+                                                         "print(time.perf_counter() - t0)"])
+    return float(out.decode().strip().split('\n')[-1])
+
+
+def slowest_modules(n=10):
+    # -X importtime reports the cumulative time (us) of each import on stderr
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import pyphysio'],
+                         stderr=subprocess.PIPE, stdout=subprocess.DEVNULL).stderr.decode()
+    rows = []
+    for line in err.split('\n'):
+        fields = line.split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            rows.append((int(fields[1]), fields[2].rstrip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+if __name__ == '__main__':
+    n_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    max_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    times = sorted(import_time() for _ in range(n_runs))
+    median = times[len(times) // 2]
+    print("import pyphysio: median %.3f s, min %.3f s (%d runs)" % (median, times[0], n_runs))
+    print("slowest imports (cumulative):")
+    for us, name in slowest_modules():
+        print("  %8.3f s %s" % (us / 1e6, name))
+
+    if max_seconds is not None and median > max_seconds:
+        print("FAIL: import time above %.3f s" % max_seconds)
+        sys.exit(1)
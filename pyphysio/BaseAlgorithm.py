@@ -1,10 +1,48 @@
 # coding=utf-8
 from abc import abstractmethod as _abstract, ABCMeta as _ABCMeta
 from pyphysio.Signal import Signal, EvenlySignal
-from pyphysio.Utility import PhUI as _PhUI
+from pyphysio.SignalBuffers import SignalBuffer as _SignalBuffer, LazySignal as _LazySignal
+from pyphysio.Utility import PhUI as _PhUI, get_n_workers as _get_n_workers, get_precision as _get_precision, \
+    precision as _precision, get_log_replay as _get_log_replay
+from pyphysio.DiskCache import get_disk_cache as _get_disk_cache
+from pyphysio.Profiling import is_profiling as _is_profiling, run_profiled as _run_profiled, \
+    mark_cache_hit as _mark_cache_hit, get_segment as _get_segment, segment_scope as _segment_scope
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from contextlib import contextmanager as _contextmanager
+from contextvars import ContextVar as _ContextVar
 import numpy as _np
 __author__ = 'AleB'
 
+# log entries of the running call, per thread/task (None when not captured)
+_log_context = _ContextVar('pyphysio_log', default=None)
+# tokens of the captures started by Algorithm.set_logger, innermost last
+_logger_tokens = _ContextVar('pyphysio_log_tokens', default=())
+
+
+@_contextmanager
+def capture_log():
+    """
+    Context manager that collects the log entries (logs, warnings and errors) of the algorithms run in the current
+    thread, e.g.
+
+        with capture_log() as log:
+            ibi = ph.BeatFromECG()(ecg)
+    The entries are also passed to the enclosing capture, if any.
+    """
+    log = []
+    token = _log_context.set(log)
+    try:
+        yield log
+    finally:
+        _log_context.reset(token)
+        _append_log(log)
+
+
+def _append_log(log):
+    outer = _log_context.get()
+    if outer is not None:
+        outer.extend(log)
+
 
 class Algorithm(object):
     """
@@ -12,7 +50,15 @@ class Algorithm(object):
     """
     __metaclass__ = _ABCMeta
 
-    _log = None
+    # whether algorithm() processes a MultiEvenly along the samples axis (axis 0) in a single call; the result is
+    # the same as the per-channel execution: a MultiEvenly, or one value per channel
+    _multichannel = False
+    # whether the results are stored in the persistent cache, when enabled (see set_disk_cache): for the slow
+    # algorithms only, as the input signal is hashed at each call
+    _disk_cache = False
+    # whether the algorithm is a filter that can be computed by portions (see get_margin): applied to a LazySignal
+    # it is recorded instead of executed
+    _lazy = False
 
     def __init__(self, **kwargs):
         """
@@ -71,31 +117,106 @@ class Algorithm(object):
         """
         if type(params) is dict:
             kwargs.update(params)
-        if not isinstance(data.get_values(), _np.ndarray):
+        if cls._lazy and isinstance(data, _LazySignal):
+            return _LazySignal(data, cls, kwargs)
+        if _is_profiling():
+            return _run_profiled(cls, kwargs, data, lambda: cls._run(data, kwargs, use_cache))
+        return cls._run(data, kwargs, use_cache)
+
+    @classmethod
+    def _run(cls, data, kwargs, use_cache):
+        if isinstance(data, _SignalBuffer):
+            # algorithms need the samples in a single array
+            data = data.to_evenly()
+        if not isinstance(data.get_raw_values(), _np.ndarray):
             _PhUI.w("The data must be a Signal (see class EvenlySignal and UnevenlySignal).")
             use_cache = False
         if use_cache is True:
             Cache.cache_check(data)
             # noinspection PyTypeChecker
             return Cache.run_cached(data, cls, kwargs)
-        else:            
-            if not data.is_multi():
-                return cls.algorithm(data, kwargs)
+        else:
+            return cls._run_disk_cached(data, kwargs, lambda: cls._compute(data, kwargs))
+
+    @classmethod
+    def _run_disk_cached(cls, data, kwargs, compute):
+        disk_cache = _get_disk_cache()
+        if cls._disk_cache and disk_cache is not None and isinstance(data, Signal):
+            return disk_cache.run(cls, kwargs, data, compute)
+        return compute()
+
+    @classmethod
+    def _compute(cls, data, kwargs):
+        # scaled integer storage is converted to physical units here, for the portion being processed only
+        data = data.to_physical() if data.is_scaled() else data
+        if not data.is_multi():
+            return cls.algorithm(data, kwargs)
+        elif cls._multichannel:
+            output = cls.algorithm(data, kwargs)
+            if isinstance(output, _np.ndarray) and not isinstance(output, Signal):
+                # one value per channel, as returned by the per-channel execution
+                output = list(output)
+            return output
+        else:
+            data_values = data.get_values()
+            n_channels = data.get_nchannels()
+            # output signals are written in a channel-contiguous block, composing a multimodal instance
+            block_out = cls._channels_block(data)
+
+            def run_channel(i_ch):
+                channel_ph = EvenlySignal(data_values[:,i_ch], data.get_sampling_freq(), data.get_start_time())
+                return cls._run_channel(channel_ph, kwargs, block_out[:, i_ch] if block_out is not None else None)
+
+            segment = _get_segment()
+            precision = _get_precision()
+
+            def run_channel_logged(i_ch):
+                with capture_log() as log, _segment_scope(segment), _precision(precision):
+                    return run_channel(i_ch), log
+
+            n_workers = min(_get_n_workers(), n_channels)
+            if n_workers > 1:
+                # outputs and logs of the worker threads are collected in channel order
+                with _ThreadPoolExecutor(n_workers) as pool:
+                    outputs_logs = list(pool.map(run_channel_logged, range(n_channels)))
+                outputs = [output for output, _ in outputs_logs]
+                for _, log in outputs_logs:
+                    _append_log(log)
             else:
-                data_values = data.get_values()
-                values_out = []
-                for i_ch in range(data.get_nchannels()):
-                    channel_ph = EvenlySignal(data_values[:,i_ch], data.get_sampling_freq(), data.get_start_time())
-                    output_ph = cls.algorithm(channel_ph, kwargs)
-                    values_out.append(output_ph)
-        
-                # if output are signals, compose a multimodal instance
-                if isinstance(values_out[0], EvenlySignal):
-                    values_out_np = _np.stack([x.get_values() for x in values_out], axis=1)
-                    output = data.clone_properties(values_out_np)
-                    return(output)
-                else:
-                    return(values_out)
+                outputs = [run_channel(i_ch) for i_ch in range(n_channels)]
+
+            are_signals = [isinstance(output_ph, EvenlySignal) for output_ph in outputs]
+            if not any(are_signals):
+                return outputs
+            assert all(are_signals), cls.__name__ + ": the channels returned both signals and values"
+            lengths = set(len(output_ph) for output_ph in outputs)
+            assert len(lengths) == 1, cls.__name__ + ": the channels returned signals of different lengths"
+            if block_out is None or len(block_out) != len(outputs[0]):
+                block_out = _np.empty((len(outputs[0]), n_channels), dtype=outputs[0].dtype, order='F')
+            for i_ch, output_ph in enumerate(outputs):
+                column = block_out[:, i_ch]
+                values = _np.asarray(output_ph)
+                if not (values.__array_interface__['data'] == column.__array_interface__['data'] and
+                        values.strides == column.strides):
+                    # not written in the block by the algorithm
+                    column[...] = output_ph.get_values()
+            return data.clone_properties(block_out)
+
+    @classmethod
+    def _channels_block(cls, data):
+        """
+        Hook for the per-channel execution: returns the (samples x channels) array the output signals of the
+        channels are written in, None if their length is not known in advance.
+        """
+        return None
+
+    @classmethod
+    def _run_channel(cls, channel, params, out):
+        """
+        Hook for the per-channel execution: computes the algorithm on one channel; out is its column of the block
+        returned by _channels_block (None if none).
+        """
+        return cls.algorithm(channel, params)
 
     @classmethod
     @_abstract
@@ -118,53 +239,123 @@ class Algorithm(object):
         """
         pass
 
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        """
+        Optional hook for the subclasses: computes the algorithm on a stack of equal-length windows of an evenly
+        sampled signal at once (see fmap).
+        :param values: 2D array (windows x samples), usually a read-only strided view of the signal
+        :param meta: dict with the 'sampling_freq' and the 'signal_type' of the signal
+        :param params: The parameters of the algorithm
+        :return: One result per window, None if not supported (the windows are then processed one at a time)
+        """
+        return None
+
+    @classmethod
+    def has_batch(cls):
+        """
+        Returns whether the algorithm implements algorithm_batch.
+        """
+        return cls.algorithm_batch.__func__ is not Algorithm.algorithm_batch.__func__
+
+    @classmethod
+    def run_batch(cls, values, meta, params):
+        """
+        Calls algorithm_batch, recording the call in the active profiles and tracers.
+        """
+        if not cls.has_batch():
+            return None
+        if _is_profiling():
+            return _run_profiled(cls, params, values, lambda: cls.algorithm_batch(values, meta, params))
+        return cls.algorithm_batch(values, meta, params)
+
+    @classmethod
+    def get_margin(cls, params, fsamp):
+        """
+        Placeholder for the subclasses with _lazy = True: returns the number of samples needed on each side of a
+        portion of the signal to compute it as in the whole signal (settling), None if the whole signal is needed.
+        """
+        return None
+
+    @classmethod
+    def lazy_params(cls, params, signal):
+        """
+        Hook for the subclasses with _lazy = True: returns the parameters to compute the portions of the given
+        (whole) input signal with, e.g. resolving the statistics of the whole signal.
+        """
+        return params
+
     @classmethod
     def cache_key(cls, params):
         """
         This method computes an hash to use as a part of the key in the cache starting from the parameters used by the
-        feature.
+        feature and the active precision policy.
         @return: The hash of the parameters used by the feature.
         :param params:
         """
         p = params.copy()
         p.update({'': str(cls)})
-        return str(p).replace('\'', '')
+        key = str(p).replace('\'', '')
+        precision = _get_precision()
+        # the results computed under a precision policy are kept apart
+        return key if precision is None else key + '@' + precision.name
 
     @classmethod
     def log(cls, message):
         l = (_PhUI.i, cls.__name__ + ": " + message)
         cls.emulate_log([l])
-        if cls._log is not None:
-            cls._log.append(l)
+        _append_log([l])
 
     @classmethod
     def warn(cls, message):
         l = (_PhUI.w, cls.__name__ + ": " + message)
         cls.emulate_log([l])
-        if cls._log is not None:
-            cls._log.append(l)
+        _append_log([l])
 
     @classmethod
     def error(cls, message, raise_error=False):
         l = (_PhUI.e, cls.__name__ + ": " + message)
         cls.emulate_log([l])
-        if cls._log is not None:
-            cls._log.append(l)
+        _append_log([l])
         assert not raise_error, l
 
     @classmethod
     def set_logger(cls):
-        cls._log = []
+        """
+        Starts collecting the log entries of the current thread (see capture_log), until unset_logger.
+        """
+        token = _log_context.set([])
+        _logger_tokens.set(_logger_tokens.get() + (token,))
 
     @classmethod
     def unset_logger(cls):
-        u = cls._log
-        cls._log = None
+        """
+        Stops the collection started by the last set_logger, restoring the enclosing capture if any.
+        :return: The collected log entries (None if not started), also passed to the enclosing capture.
+        """
+        tokens = _logger_tokens.get()
+        if len(tokens) == 0:
+            return None
+        u = _log_context.get()
+        _log_context.reset(tokens[-1])
+        _logger_tokens.set(tokens[:-1])
+        _append_log(u)
         return u
 
     @classmethod
     def emulate_log(cls, log):
-        map(lambda f_m: f_m[0](f_m[1]), log)
+        for f, message in log:
+            f(message)
+
+    @classmethod
+    def replay_log(cls, log):
+        """
+        Passes the log entries of a cached result to the enclosing capture and, if enabled (see set_log_replay),
+        to the logger.
+        """
+        if _get_log_replay():
+            cls.emulate_log(log)
+        _append_log(log)
 
 
 # noinspection PyProtectedMember
@@ -219,12 +410,15 @@ class Cache(object):
         """
         key = algorithm.cache_key(params)
 
-        if key not in obj._cache:
-            algorithm.set_logger()
-            val = algorithm.algorithm(obj, params)
-            log = algorithm.unset_logger()
-            obj._cache[key] = (val, log)
+        cached = obj._cache.get(key)
+        if cached is None:
+            # the log of this call is stored with the value, to be replayed by the next calls
+            with capture_log() as log:
+                val = algorithm._run_disk_cached(
+                    obj, params, lambda: algorithm.algorithm(obj.to_physical() if obj.is_scaled() else obj, params))
+            obj._cache[key] = (val, tuple(log))
         else:
-            val, log = obj._cache[key]
-            algorithm.emulate_log(log)
+            val, log = cached
+            _mark_cache_hit()
+            algorithm.replay_log(log)
         return val
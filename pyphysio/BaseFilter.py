@@ -1,12 +1,133 @@
 # coding=utf-8
 from pyphysio.BaseAlgorithm import Algorithm
+from pyphysio.Signal import Signal as _Signal, EvenlySignal as _EvenlySignal
+from pyphysio.Utility import float_dtype as _float_dtype
 from abc import ABCMeta as _ABCMeta
+from contextvars import ContextVar as _ContextVar
+import threading as _threading
+import numpy as _np
 __author__ = 'AleB'
 
+# (filter class, array) the running filter call writes its result in, per thread/task (see Filter.__call__)
+_out = _ContextVar('pyphysio_filter_out', default=None)
+# working buffers reused by the filter calls with an output array, per thread (see Filter.scratch)
+_scratch = _threading.local()
+
 
 class Filter(Algorithm):
     """
     Algorithms that take as input a signal and return another signal of the same nature.
     """
     __metaclass__ = _ABCMeta
-    pass
+
+    def __call__(self, data, out=None, inplace=False):
+        """
+        Executes the filter using the parameters saved by the constructor.
+        @param data: The signal.
+        @param out: Array (or signal) with the shape of data and its float type, where to write the result: the
+        returned signal is a view of it. Allows to reuse the same buffers along a chain of filters.
+        @param inplace: Whether to write the result in data (out=data, only for signals of floats).
+        @return: The filtered signal.
+        """
+        return self.run(data, self._params, out=data if inplace else out)
+
+    @classmethod
+    def run(cls, data, params=None, use_cache=False, out=None, **kwargs):
+        """
+        As Algorithm.run; if out is given the result is written in it (see __call__).
+        """
+        if out is None:
+            return super(Filter, cls).run(data, params, use_cache, **kwargs)
+        assert isinstance(data, _EvenlySignal), "The data must be an EvenlySignal to filter into an output array"
+        out_values = _np.asarray(out)
+        assert out_values.shape == data.shape, "out should have the shape of the signal " + str(data.shape)
+        assert out_values.dtype == _float_dtype(data.get_raw_values()), \
+            "out should be an array of " + str(_float_dtype(data.get_raw_values()))
+
+        token = _out.set((cls, out_values))
+        try:
+            result = super(Filter, cls).run(data, params, False, **kwargs)
+        finally:
+            _out.reset(token)
+        values = _np.asarray(result)
+        if not (values.__array_interface__['data'] == out_values.__array_interface__['data'] and
+                values.strides == out_values.strides):
+            # the filter does not support writing in out (or returned the input)
+            out_values[...] = values
+        if isinstance(out, _Signal):
+            setattr(out, "_mutated", True)
+        return cls.view_as(out_values, result)
+
+    @classmethod
+    def _channels_block(cls, data):
+        # the filters write each channel in its column (see get_out), or in the output array of the call
+        out = cls.get_out(data)
+        if out is None:
+            out = _np.empty(data.shape, dtype=_float_dtype(data.get_raw_values()), order='F')
+        return out
+
+    @classmethod
+    def _run_channel(cls, channel, params, out):
+        token = _out.set((cls, out))
+        try:
+            return cls.algorithm(channel, params)
+        finally:
+            _out.reset(token)
+
+    @classmethod
+    def _out_copy(cls, signal):
+        # working copy of the values of signal: the output array, if any
+        values = signal.get_values()
+        out = cls.get_out(signal)
+        if out is None:
+            return values.copy()
+        out[...] = values
+        return out
+
+    @classmethod
+    def _out_signal(cls, values, signal):
+        # the result of a working copy (see _out_copy) as a signal
+        if values is cls.get_out(signal):
+            return cls.view_as(values, signal)
+        return signal.clone_properties(values)
+
+    @staticmethod
+    def view_as(values, signal):
+        """
+        Returns a signal viewing the given values, with the class and the metadata of signal (clone_properties can
+        copy the values, e.g. to change their order).
+        """
+        out = values.view(signal.__class__)
+        out._pyphysio = signal.ph.copy()
+        return out
+
+    @classmethod
+    def get_out(cls, signal):
+        """
+        Returns the array the running call of this filter should write its result for signal in (see __call__),
+        None if the result is to be allocated.
+        """
+        target = _out.get()
+        if target is not None and target[0] is cls and target[1].shape == signal.shape:
+            return target[1]
+        return None
+
+    @staticmethod
+    def scratch(name, shape, dtype):
+        """
+        Returns a working buffer (uninitialized), kept and reused by the following calls in the same thread.
+        The filters use the scratch buffers only when writing in an output array, see clear_scratch.
+        """
+        dtype = _np.dtype(dtype)
+        size = int(_np.prod(shape)) * dtype.itemsize
+        buffers = _scratch.__dict__
+        if name not in buffers or buffers[name].nbytes < size:
+            buffers[name] = _np.empty(size, dtype=_np.uint8)
+        return buffers[name][:size].view(dtype).reshape(shape)
+
+    @staticmethod
+    def clear_scratch():
+        """
+        Releases the scratch buffers of the current thread.
+        """
+        _scratch.__dict__.clear()
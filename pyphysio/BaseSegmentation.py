@@ -5,6 +5,7 @@ import numpy as _np
 from .Utility import PhUI as _PhUI
 from .BaseAlgorithm import Algorithm as _Algorithm, Cache
 from .Signal import EvenlySignal as _EvenlySignal, UnevenlySignal as _UnevenlySignal
+from .SignalBuffers import SignalBuffer as _SignalBuffer
 
 __author__ = 'AleB'
 
@@ -129,7 +130,7 @@ class SegmentsGenerator(_Algorithm):
         """
         if type(params) is dict:
             kwargs.update(params)
-        if not isinstance(data.get_values(), _np.ndarray):
+        if not isinstance(data, _SignalBuffer) and not isinstance(data.get_raw_values(), _np.ndarray):
             _PhUI.w("The data must be a Signal (see class EvenlySignal and UnevenlySignal).")
             use_cache = False
         if use_cache is True:
@@ -0,0 +1,284 @@
+# coding=utf-8
+from __future__ import division
+import hashlib as _hashlib
+import inspect as _inspect
+import os as _os
+import pickle as _pickle
+import tempfile as _tempfile
+import zlib as _zlib
+from contextlib import contextmanager as _contextmanager
+import numpy as _np
+from .Signal import Signal as _Signal
+from .Utility import PhUI as _PhUI
+
+__author__ = 'AleB'
+
+# Persistent cache of the results of the algorithms marked with _disk_cache = True. Each result is a file
+#
+#     <cache dir>/<key>.phc : zlib(pickle((result, log)))
+#
+# whose key hashes the content and the metadata of the input signal, the algorithm class, its parameters, the
+# source code of the algorithm classes, the precision policy and the cache format. Files are written atomically
+# (temporary file + rename), so that concurrent processes can share the directory; the access time for the LRU
+# eviction is the modification time, updated at each hit.
+
+_EXTENSION = '.phc'
+# to be increased when the stored results change without a change of the algorithm classes (e.g. in the helpers
+# they call or in the Signal classes)
+_FORMAT = 1
+# writes after which the size of the cache is read again from the directory (other processes may write in it)
+_RESCAN_WRITES = 100
+# active disk cache (None: disabled)
+_disk_cache = [None]
+# hash of the source code of each algorithm class
+_sources = {}
+
+
+class _PackedSignal(object):
+    # Signal in pickleable form: the metadata is not kept by the pickling of numpy arrays
+    def __init__(self, signal):
+        self.cls = signal.__class__
+        self.values = _np.asarray(signal)
+        self.ph = signal.ph
+
+    def unpack(self):
+        signal = self.values.view(self.cls)
+        signal._pyphysio = self.ph
+        return signal
+
+
+def _pack(value):
+    if isinstance(value, _Signal):
+        return _PackedSignal(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_pack(v) for v in value)
+    return value
+
+
+def _unpack(value):
+    if isinstance(value, _PackedSignal):
+        return value.unpack()
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unpack(v) for v in value)
+    return value
+
+
+def _source_hash(algorithm):
+    # the classes the algorithm inherits from are included, as they can define algorithm()
+    digest = _sources.get(algorithm)
+    if digest is None:
+        h = _hashlib.sha1()
+        for cls in algorithm.__mro__[:-1]:
+            try:
+                h.update(_inspect.getsource(cls).encode())
+            except (OSError, TypeError):
+                # source not available (e.g. defined interactively)
+                h.update(cls.__qualname__.encode())
+        digest = _sources[algorithm] = h.hexdigest()
+    return digest
+
+
+def _update_hash(h, value):
+    if isinstance(value, _np.ndarray):
+        value = _np.ascontiguousarray(value)
+        h.update(('%s%s%s' % (value.__class__.__name__, value.dtype.str, value.shape)).encode())
+        if value.dtype.kind == 'O':
+            h.update(repr(value.tolist()).encode())
+        else:
+            h.update(value.view(_np.uint8).reshape(-1).data)
+    elif isinstance(value, dict):
+        h.update(b'{')
+        for k in sorted(value, key=str):
+            h.update(str(k).encode())
+            _update_hash(h, value[k])
+        h.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        h.update(b'[')
+        for v in value:
+            _update_hash(h, v)
+        h.update(b']')
+    else:
+        h.update(repr(value).encode())
+
+
+class DiskCache(object):
+    """
+    Persistent cache of algorithm results, shared by runs and processes (see set_disk_cache).
+
+    The results are stored with pickle, and loading them can execute arbitrary code: only use directories that no
+    one else can write to.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the cache (created if needed)
+    max_bytes : int, default=2**30
+        Size cap of the cache: the least recently used results are removed when it is exceeded
+    level : int, default=1
+        zlib compression level of the results
+    """
+
+    def __init__(self, path, max_bytes=2 ** 30, level=1):
+        assert max_bytes > 0, "max_bytes should be positive"
+        path = _os.path.expanduser(path)
+        self._path = path
+        self._max_bytes = max_bytes
+        self._level = level
+        # size of the cache as known by this process, None to read it from the directory
+        self._size = None
+        self._n_writes = 0
+        if not _os.path.isdir(path):
+            _os.makedirs(path)
+
+    @staticmethod
+    def key(algorithm, params, data):
+        """
+        Returns the key of the result of algorithm with params on data.
+        """
+        from . import __version__
+        from .Utility import get_precision
+        precision = get_precision()
+        h = _hashlib.sha1()
+        _update_hash(h, [__version__, _FORMAT, precision.name if precision is not None else None,
+                         algorithm.__module__ + '.' + algorithm.__name__,
+                         _source_hash(algorithm), params, data.__class__.__name__, data.get_raw_values(),
+                         dict(data.ph)])
+        return h.hexdigest()
+
+    def _file(self, key):
+        return _os.path.join(self._path, key + _EXTENSION)
+
+    def get(self, key):
+        """
+        Returns the cached (result, log) with the given key, None if missing.
+        """
+        path = self._file(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            value, log = _pickle.loads(_zlib.decompress(data))
+            _os.utime(path)
+        except (IOError, OSError, EOFError, ValueError, _zlib.error, _pickle.UnpicklingError):
+            # missing, removed by another process or not readable
+            return None
+        return _unpack(value), [(getattr(_PhUI, level), message) for level, message in log]
+
+    def put(self, key, value, log):
+        """
+        Stores (value, log) with the given key, then enforces the size cap. The directory is scanned only when the
+        size known by this process exceeds the cap, or every _RESCAN_WRITES writes.
+        """
+        log = [(f.__name__, message) for f, message in log]
+        data = _zlib.compress(_pickle.dumps((_pack(value), log), protocol=_pickle.HIGHEST_PROTOCOL), self._level)
+        fd, tmp = _tempfile.mkstemp(suffix='.tmp', dir=self._path)
+        try:
+            with _os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            _os.replace(tmp, self._file(key))
+        except Exception:
+            if _os.path.exists(tmp):
+                _os.remove(tmp)
+            raise
+        self._n_writes += 1
+        if self._size is None or self._n_writes % _RESCAN_WRITES == 0:
+            self._size = self.size()
+        else:
+            # a replaced result is counted twice: the size is overestimated until the next scan
+            self._size += len(data)
+        if self._size > self._max_bytes:
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in _os.listdir(self._path):
+            if name.endswith(_EXTENSION):
+                try:
+                    st = _os.stat(_os.path.join(self._path, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self._max_bytes:
+                break
+            try:
+                _os.remove(_os.path.join(self._path, name))
+            except OSError:
+                # removed by another process
+                pass
+            total -= size
+        self._size = total
+
+    def size(self):
+        """
+        Returns the total size (bytes) of the cached results.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """
+        Removes all the cached results.
+        """
+        for _, _, name in self._entries():
+            try:
+                _os.remove(_os.path.join(self._path, name))
+            except OSError:
+                pass
+        self._size = 0
+
+    def run(self, algorithm, params, data, compute):
+        """
+        Returns the cached result of algorithm with params on data, or computes it with compute() and caches it.
+        The log of the call is stored with the result and replayed at each hit (see Algorithm.replay_log).
+        """
+        from .BaseAlgorithm import capture_log
+        from .Profiling import mark_cache_hit
+        key = self.key(algorithm, params, data)
+        cached = self.get(key)
+        if cached is not None:
+            value, log = cached
+            mark_cache_hit()
+            algorithm.replay_log(log)
+            return value
+        with capture_log() as log:
+            value = compute()
+        self.put(key, value, log)
+        return value
+
+
+def set_disk_cache(path, max_bytes=2 ** 30):
+    """
+    Enables the persistent cache of the results of the slow algorithms (e.g. BeatFromECG, DriverEstim,
+    PhasicEstim, OptimizeBateman) in the given directory, shared by runs and processes.
+    The results are stored with pickle: only use directories that no one else can write to.
+    :param path: Directory of the cache, None to disable it.
+    :param max_bytes: Size cap of the cache: the least recently used results are removed when it is exceeded.
+    """
+    _disk_cache[0] = DiskCache(path, max_bytes) if path is not None else None
+
+
+def get_disk_cache():
+    return _disk_cache[0]
+
+
+@_contextmanager
+def disk_cache(path, max_bytes=2 ** 30):
+    """
+    Context manager that enables the persistent cache of the results of the slow algorithms, e.g.
+
+        with ph.disk_cache('~/.cache/pyphysio'):
+            ibi = ph.BeatFromECG()(ecg)
+    :param path: Directory of the cache, None to disable it.
+    :param max_bytes: Size cap of the cache: the least recently used results are removed when it is exceeded.
+    :return: The DiskCache (None if disabled).
+    """
+    previous = get_disk_cache()
+    set_disk_cache(path, max_bytes)
+    try:
+        yield get_disk_cache()
+    finally:
+        _disk_cache[0] = previous
@@ -0,0 +1,339 @@
+# coding=utf-8
+from __future__ import division
+import json as _json
+import os as _os
+import threading as _threading
+import time as _time
+import tracemalloc as _tracemalloc
+from contextlib import contextmanager as _contextmanager
+from contextvars import ContextVar as _ContextVar
+from .Utility import PhUI as _PhUI
+
+__author__ = 'AleB'
+
+# active profiles
+_profiles = []
+# number of active profiles tracking the memory
+_memory_profiles = [0]
+# whether tracemalloc was started by a profile: its peak is reset only in this case
+_owns_tracemalloc = [False]
+# active tracers
+_tracers = []
+# algorithm calls being profiled in the current thread/task, innermost last
+_frames = _ContextVar('pyphysio_profile_frames', default=())
+# segment being processed by fmap in the current thread/task
+_segment = _ContextVar('pyphysio_trace_segment', default=None)
+
+_SORT_FIELDS = ['calls', 'total_time', 'self_time', 'samples', 'cache_hits', 'peak_bytes', 'amplification']
+
+
+class _Frame(object):
+    __slots__ = ['children_time', 'cache_hit', 'memory_start', 'memory_peak']
+
+    def __init__(self):
+        self.children_time = 0.
+        self.cache_hit = False
+        # traced memory at the start of the call, highest traced memory seen (absolute)
+        self.memory_start = None
+        self.memory_peak = 0
+
+
+class Profile(object):
+    """
+    Statistics of the algorithm calls collected by ph.profile(), per algorithm class and parameter set:
+    number of calls, cumulative wall time (total_time), wall time excluding the nested algorithm calls
+    (self_time), cumulative input length (samples) and cache hits.
+
+    With memory tracking, also the highest memory allocated during a call (peak_bytes, including the nested
+    calls), the size of the input of that call (input_bytes) and the highest ratio between the two over the
+    calls (amplification).
+    """
+
+    def __init__(self, memory=False):
+        self._stats = {}
+        self._lock = _threading.Lock()
+        self._memory = memory
+
+    def _add(self, algorithm, params, total_time, self_time, n_samples, cache_hit, peak_bytes, input_bytes):
+        key = (algorithm, params)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {'algorithm': algorithm, 'params': params, 'calls': 0,
+                                            'total_time': 0., 'self_time': 0., 'samples': 0, 'cache_hits': 0}
+                if self._memory:
+                    stats.update(peak_bytes=0, input_bytes=0, amplification=0.)
+            stats['calls'] += 1
+            stats['total_time'] += total_time
+            stats['self_time'] += self_time
+            stats['samples'] += n_samples
+            stats['cache_hits'] += int(cache_hit)
+            if self._memory and peak_bytes is not None:
+                if peak_bytes > stats['peak_bytes']:
+                    stats['peak_bytes'], stats['input_bytes'] = peak_bytes, input_bytes
+                stats['amplification'] = max(stats['amplification'], peak_bytes / max(input_bytes, 1))
+
+    def to_dict(self, sort='self_time'):
+        """
+        Returns the statistics as a list of dicts, one per algorithm class and parameter set, sorted by
+        decreasing value of the given field.
+        :param sort: Field used to sort: 'calls', 'total_time', 'self_time', 'samples', 'cache_hits' or, with
+        memory tracking, 'peak_bytes' and 'amplification'
+        """
+        assert sort in _SORT_FIELDS, "sort should be in " + repr(_SORT_FIELDS)
+        with self._lock:
+            stats = [dict(s) for s in self._stats.values()]
+        return sorted(stats, key=lambda s: s[sort], reverse=True)
+
+    def report(self, sort='self_time', limit=None):
+        """
+        Returns a text table of the statistics.
+        :param sort: Field used to sort (see to_dict)
+        :param limit: Maximum number of rows
+        """
+        rows = self.to_dict(sort)[:limit]
+        lines = ["%-50s %8s %12s %12s %12s %10s" % ('algorithm', 'calls', 'total (s)', 'self (s)', 'samples',
+                                                    'cache hits')]
+        for s in rows:
+            name = s['algorithm'] + s['params']
+            name = name if len(name) <= 50 else name[:47] + '...'
+            lines.append("%-50s %8d %12.4f %12.4f %12d %10d" % (name, s['calls'], s['total_time'], s['self_time'],
+                                                                 s['samples'], s['cache_hits']))
+        return '\n'.join(lines)
+
+    def memory_report(self, limit=None):
+        """
+        Returns a text table of the memory statistics, ranking the algorithms by memory amplification
+        (peak bytes allocated during a call / bytes of its input).
+        :param limit: Maximum number of rows
+        """
+        assert self._memory, "Memory was not tracked: use ph.profile(memory=True)"
+        rows = self.to_dict('amplification')[:limit]
+        lines = ["%-50s %8s %14s %14s %14s" % ('algorithm', 'calls', 'peak (bytes)', 'input (bytes)',
+                                               'amplification')]
+        for s in rows:
+            name = s['algorithm'] + s['params']
+            name = name if len(name) <= 50 else name[:47] + '...'
+            lines.append("%-50s %8d %14d %14d %14.1f" % (name, s['calls'], s['peak_bytes'], s['input_bytes'],
+                                                         s['amplification']))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return self.report()
+
+
+class Tracer(object):
+    """
+    Timeline of the algorithm calls and of the fmap segments collected by ph.trace(), as Chrome trace events
+    (viewable with chrome://tracing or Perfetto). Each span records the segment id, the worker thread, the
+    start and the duration and, for algorithms, the cache hit.
+
+    The events are buffered in memory and, if a path is given, written to the file in batches of batch_size
+    events; otherwise they are kept in memory (see events and save).
+    """
+
+    def __init__(self, path=None, batch_size=10000):
+        self._path = path
+        self._batch_size = batch_size
+        self._buffer = []
+        self._events = []
+        self._threads = set()
+        self._lock = _threading.Lock()
+        self._pid = _os.getpid()
+        self._t0 = _time.perf_counter()
+        self._file = None
+        self._n_written = 0
+        if path is not None:
+            self._file = open(path, 'w')
+            self._file.write('[')
+
+    def _span(self, name, category, t_start, duration, args):
+        tid = _threading.get_ident()
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': self._pid, 'tid': tid,
+                 'ts': (t_start - self._t0) * 1e6, 'dur': duration * 1e6, 'args': args}
+        with self._lock:
+            if tid not in self._threads:
+                # names the worker in the timeline
+                self._threads.add(tid)
+                self._buffer.append({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid,
+                                     'args': {'name': _threading.current_thread().name}})
+            self._buffer.append(event)
+            if len(self._buffer) >= self._batch_size:
+                self._flush()
+
+    def _flush(self):
+        if self._file is not None:
+            if len(self._buffer) > 0:
+                self._file.write(('\n' if self._n_written == 0 else ',\n') +
+                                 ',\n'.join(_json.dumps(e) for e in self._buffer))
+                self._n_written += len(self._buffer)
+        else:
+            self._events.extend(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        """
+        Writes the buffered events and completes the file.
+        """
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.write('\n]\n')
+                self._file.close()
+                self._file = None
+
+    def events(self):
+        """
+        Returns the trace events (only if not written to a file).
+        """
+        assert self._path is None, "The events were written to " + self._path
+        with self._lock:
+            return self._events + self._buffer
+
+    def save(self, path):
+        """
+        Saves the trace events (only if not written to a file) in a JSON file.
+        :param path: File system path to the file to write (create/overwrite).
+        """
+        with open(path, 'w') as f:
+            _json.dump({'traceEvents': self.events(), 'displayTimeUnit': 'ms'}, f)
+
+
+def is_profiling():
+    return len(_profiles) > 0 or len(_tracers) > 0
+
+
+def run_profiled(algorithm, params, data, run):
+    """
+    Runs run() recording the call of the given algorithm in the active profiles.
+    """
+    frame = _Frame()
+    parents = _frames.get()
+    memory = _memory_profiles[0] > 0 and _owns_tracemalloc[0] and _tracemalloc.is_tracing()
+    if memory:
+        # the peak of tracemalloc is global: the one reached so far is kept by the caller before resetting it
+        current, peak = _tracemalloc.get_traced_memory()
+        if len(parents) > 0:
+            parents[-1].memory_peak = max(parents[-1].memory_peak, peak)
+        _tracemalloc.reset_peak()
+        frame.memory_start = frame.memory_peak = current
+    token = _frames.set(parents + (frame,))
+    t_start = _time.perf_counter()
+    try:
+        return run()
+    finally:
+        total_time = _time.perf_counter() - t_start
+        _frames.reset(token)
+        peak_bytes = None
+        if memory:
+            frame.memory_peak = max(frame.memory_peak, _tracemalloc.get_traced_memory()[1])
+            peak_bytes = frame.memory_peak - frame.memory_start
+            if len(parents) > 0:
+                parents[-1].memory_peak = max(parents[-1].memory_peak, frame.memory_peak)
+        if len(parents) > 0:
+            parents[-1].children_time += total_time
+        params = '{' + ', '.join('%s: %s' % (k, params[k]) for k in sorted(params)) + '}'
+        n_samples = len(data) if hasattr(data, '__len__') else 0
+        input_bytes = getattr(data, 'nbytes', 0)
+        for profile_ in list(_profiles):
+            profile_._add(algorithm.__name__, params, total_time, total_time - frame.children_time, n_samples,
+                          frame.cache_hit, peak_bytes, input_bytes)
+        for tracer in list(_tracers):
+            tracer._span(algorithm.__name__ + params, 'algorithm', t_start, total_time,
+                         {'segment': _segment.get(), 'cache_hit': frame.cache_hit, 'samples': n_samples})
+
+
+def mark_cache_hit():
+    frames = _frames.get()
+    if len(frames) > 0:
+        frames[-1].cache_hit = True
+
+
+@_contextmanager
+def profile(memory=False):
+    """
+    Context manager that records the algorithm calls, e.g.
+
+        with ph.profile() as p:
+            ibi = ph.BeatFromECG()(ecg)
+        print(p.report())
+    :param memory: Whether to track the memory allocated by each call (with tracemalloc, started if needed).
+    Memory tracking slows down the execution; with algorithms running concurrently in several threads the
+    allocations are attributed approximately. If tracemalloc was already started by the caller, its peak is left
+    untouched and the memory is not tracked (warning).
+    :return: The Profile collecting the statistics.
+    """
+    profile_ = Profile(memory)
+    start_tracing = memory and not _tracemalloc.is_tracing()
+    if start_tracing:
+        _tracemalloc.start()
+        _owns_tracemalloc[0] = True
+    elif memory and not _owns_tracemalloc[0]:
+        _PhUI.w("profile: tracemalloc was started by the caller, the memory is not tracked")
+    _profiles.append(profile_)
+    _memory_profiles[0] += int(memory)
+    try:
+        yield profile_
+    finally:
+        _profiles.remove(profile_)
+        _memory_profiles[0] -= int(memory)
+        if start_tracing:
+            _owns_tracemalloc[0] = False
+            _tracemalloc.stop()
+
+
+def get_segment():
+    return _segment.get()
+
+
+@_contextmanager
+def segment_scope(segment_id):
+    """
+    Context manager that sets the segment the algorithm calls belong to, e.g. in worker threads.
+    """
+    token = _segment.set(segment_id)
+    try:
+        yield
+    finally:
+        _segment.reset(token)
+
+
+@_contextmanager
+def trace_segment(segment_id, begin, end, label):
+    """
+    Context manager that records the processing of a segment in the active tracers.
+    """
+    t_start = _time.perf_counter()
+    try:
+        with segment_scope(segment_id):
+            yield
+    finally:
+        if len(_tracers) > 0:
+            duration = _time.perf_counter() - t_start
+            label = label.item() if hasattr(label, 'item') else label
+            for tracer in list(_tracers):
+                tracer._span('segment %d' % segment_id, 'segment', t_start, duration,
+                             {'segment': segment_id, 'begin': float(begin) if begin is not None else None,
+                              'end': float(end) if end is not None else None, 'label': label})
+
+
+@_contextmanager
+def trace(path=None, batch_size=10000):
+    """
+    Context manager that records the timeline of the algorithm calls and of the fmap segments, e.g.
+
+        with ph.trace('trace.json'):
+            values, names = ph.fmap(segments, indicators, ecg)
+    The file can be opened with chrome://tracing or Perfetto.
+    :param path: File system path to the file to write (create/overwrite). By default the events are kept in
+    memory (see Tracer.events and Tracer.save).
+    :param batch_size: Number of events buffered before writing them to the file.
+    :return: The Tracer collecting the events.
+    """
+    tracer = Tracer(path, batch_size)
+    _tracers.append(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracers.remove(tracer)
+        tracer.close()
@@ -1,11 +1,9 @@
 # coding=utf-8
 from __future__ import division
 import numpy as _np
-from scipy import interpolate as _interp
-from matplotlib.pyplot import plot as _plot, vlines as _vlines, xlabel as _xlabel, ylabel as _ylabel, grid as _grid 
-from matplotlib.pyplot import subplot as _subplot, tight_layout as _tight_layout, subplots_adjust as _subplots_adjust, xlim as _xlim
 from numbers import Number as _Number
-from pyphysio.Utility import abstractmethod as _abstract, PhUI as _PhUI
+from pyphysio.Utility import abstractmethod as _abstract, PhUI as _PhUI, float_dtype as _float_dtype, \
+    write_csv as _write_csv
 import copy
 #from pyphysio.filters.Filters import ImputeNAN as _ImputeNAN
 __author__ = 'AleB'
@@ -40,12 +38,65 @@ def from_pickle(path):
     return from_pickleable(p)
 
 
+def from_adc(values, sampling_freq, scale, offset=0, start_time=None, signal_type=""):
+    """
+    Builds a Signal that keeps the raw integer (ADC) values and converts them to physical units
+    (value * scale + offset) only when they are read (get_values, the algorithms).
+    numpy operations act on the raw counts instead (e.g. s + 1, s.mean(), np.asarray(s)); their results are not
+    scaled. Use s.get_values() or s.to_physical() to compute in physical units.
+    :param values: Integer array of counts, 1D for an EvenlySignal, 2D (samples x channels) for a MultiEvenly.
+    :param sampling_freq: Sampling frequency.
+    :param scale: Scale factor, a scalar or one value per channel.
+    :param offset: Offset added after scaling, a scalar or one value per channel.
+    :param start_time: Instant of signal start.
+    :param signal_type: Type of signal (e.g. 'ECG', 'EDA').
+    :return: An EvenlySignal or a MultiEvenly.
+    """
+    values = _np.asarray(values)
+    assert values.dtype.kind in 'iu', "ADC values should be integers"
+    if values.ndim > 1:
+        signal = MultiEvenly(values, sampling_freq, start_time, signal_type)
+    else:
+        signal = EvenlySignal(values, sampling_freq, start_time, signal_type)
+    signal.set_scaling(scale, offset)
+    return signal
+
+
+def from_adc_file(path, sampling_freq, scale, offset=0, dtype='int16', n_channels=1, header_bytes=0,
+                  start_time=None, signal_type=""):
+    """
+    Memory-maps a binary file of interleaved integer samples (samples x channels) as a scaled Signal.
+    No sample is loaded or converted to float until an algorithm reads it.
+    :param path: File system path to the binary file.
+    :param dtype: Numpy integer type of the samples, including the byte order (e.g. '<i2').
+    :param n_channels: Number of interleaved channels.
+    :param header_bytes: Number of bytes to skip at the beginning of the file.
+    :return: An EvenlySignal (n_channels == 1) or a MultiEvenly.
+    """
+    raw = _np.memmap(path, dtype=dtype, mode='r', offset=header_bytes)
+    if n_channels > 1:
+        raw = raw[:len(raw) - len(raw) % n_channels].reshape(-1, n_channels)
+    return from_adc(raw, sampling_freq, scale, offset, start_time, signal_type)
+
+
 class Signal(_np.ndarray):
     _MT_NATURE = "signal_type"
     _MT_START_TIME = "start_time"
     _MT_SAMPLING_FREQ = "sampling_freq"
+    _MT_SCALE = "scale"
+    _MT_OFFSET = "offset"
     _MT_INFO_ATTR = "_pyphysio"
 
+    # samples converted at once from scaled integer storage
+    _SCALE_CHUNK = 2 ** 16
+
+    # series derived from the values (along the samples axis), see get_derived
+    _DERIVED = {
+        'diff': lambda v: _np.diff(v, axis=0),
+        'cumsum': lambda v: _np.cumsum(v, axis=0),
+        'sorted': lambda v: _np.sort(v, axis=0),
+    }
+
     def __new__(cls, values, sampling_freq, start_time=None, signal_type=""):
         assert sampling_freq > 0, "The sampling frequency cannot be zero or negative"
         assert start_time is None or isinstance(start_time, _Number), "Start time is not numeric"
@@ -69,6 +120,13 @@ class Signal(_np.ndarray):
             self._pyphysio = getattr(obj, self._MT_INFO_ATTR).copy()
 
     def __array_wrap__(self, out_arr, context=None):
+        if out_arr is self:
+            # in-place operation (e.g. s += 1)
+            setattr(self, "_mutated", True)
+        elif isinstance(out_arr, Signal) and self._MT_SCALE in getattr(out_arr, self._MT_INFO_ATTR, {}):
+            # computed from the raw counts of a scaled signal: the result is not in counts of the same scale
+            out_arr.ph.pop(self._MT_SCALE, None)
+            out_arr.ph.pop(self._MT_OFFSET, None)
         # Just call the parent's
         # noinspection PyArgumentList
         if isinstance(out_arr, Signal):
@@ -76,10 +134,36 @@ class Signal(_np.ndarray):
         else:
             return out_arr
 
+    def __setitem__(self, key, value):
+        setattr(self, "_mutated", True)
+        _np.ndarray.__setitem__(self, key, value)
+
     @property
     def ph(self):
         return self._pyphysio
 
+    def get_derived(self, name):
+        """
+        Returns a series derived from the values, computed at the first request and kept with the signal (see
+        Cache) until the signal is mutated, so that the algorithms processing the same signal share it; the
+        physical view of a scaled signal (see to_physical) shares the ones of the signal. The channels of a
+        multichannel signal processed one by one are new signals at each run, whose series are not shared.
+        Changes made through other arrays sharing the memory of the signal are not detected.
+        :param name: 'diff' (differences of consecutive samples), 'cumsum' or 'sorted'. Multichannel signals are
+        processed along the samples axis.
+        :return: The derived series (read-only numpy array).
+        """
+        from .BaseAlgorithm import Cache
+        assert name in self._DERIVED, "name should be in " + repr(sorted(self._DERIVED))
+        Cache.cache_check(self)
+        key = ('derived', name)
+        derived = self._cache.get(key)
+        if derived is None:
+            derived = self._DERIVED[name](self.get_values())
+            derived.setflags(write=False)
+            self._cache[key] = derived
+        return derived
+
     def clone(self):
         obj = self.copy()
         obj._pyphysio = copy.deepcopy(self.ph)
@@ -89,7 +173,60 @@ class Signal(_np.ndarray):
         return(self.get_nchannels()>1)
     
     def get_values(self):
+        if self.is_scaled():
+            return self._unscale(_np.asarray(self))
         return _np.asarray(self)
+
+    def get_raw_values(self):
+        """
+        Returns the stored values, without applying scale and offset.
+        """
+        return _np.asarray(self)
+
+    def _get_values_range(self, iidx_start, iidx_stop):
+        # physical values of a range of samples, scaled only there
+        raw = self.get_raw_values()[iidx_start:iidx_stop]
+        return self._unscale(raw) if self.is_scaled() else raw
+
+    def is_scaled(self):
+        return self.ph.get(self._MT_SCALE) is not None
+
+    def get_scale(self):
+        return self.ph.get(self._MT_SCALE)
+
+    def get_offset(self):
+        return self.ph.get(self._MT_OFFSET, 0)
+
+    def set_scaling(self, scale, offset=0):
+        """
+        Declares the stored values as raw counts: the physical values are value * scale + offset.
+        :param scale: Scale factor (None to remove the scaling), a scalar or one value per channel.
+        :param offset: Offset, a scalar or one value per channel.
+        """
+        setattr(self, "_mutated", True)
+        if scale is None:
+            self.ph.pop(self._MT_SCALE, None)
+            self.ph.pop(self._MT_OFFSET, None)
+        else:
+            self.ph[self._MT_SCALE] = _np.asarray(scale, dtype=float)
+            self.ph[self._MT_OFFSET] = _np.asarray(offset, dtype=float)
+
+    def _unscale(self, raw):
+        # block-wise, so that the only float allocation is the output
+        scale, offset = self.get_scale(), self.get_offset()
+        out = _np.empty(raw.shape, dtype=_float_dtype(raw))
+        for i in range(0, len(raw), self._SCALE_CHUNK):
+            block = out[i:i + self._SCALE_CHUNK]
+            _np.multiply(raw[i:i + self._SCALE_CHUNK], scale, out=block)
+            block += offset
+        return out
+
+    def _as_float(self, values):
+        # values computed by the algorithms follow the precision policy, or the float type of this signal
+        values = _np.asarray(values)
+        if values.dtype.kind == 'f':
+            values = values.astype(_float_dtype(self.get_raw_values()), copy=False)
+        return values
     
     def get_nchannels(self):
         if self.ndim>1:
@@ -168,6 +305,9 @@ class Signal(_np.ndarray):
         pass
 
     def plot(self, style="", vlines_height=1000):
+        # matplotlib is imported only when plotting (slow import)
+        from matplotlib.pyplot import plot as _plot, vlines as _vlines, xlabel as _xlabel, ylabel as _ylabel, \
+            grid as _grid
         _xlabel("time")
         _ylabel(self.get_signal_type())
         _grid()
@@ -223,12 +363,25 @@ class EvenlySignal(Signal):
     """
 
     def clone_properties(self, new_values):
-        x_new = EvenlySignal(new_values,
+        x_new = EvenlySignal(self._as_float(new_values),
                              self.get_sampling_freq(),
                              self.get_start_time(),
                              self.get_signal_type())
         return(x_new)
 
+    def to_physical(self):
+        """
+        Returns the signal with values in physical units (float), converting the scaled integer storage if any.
+        """
+        if not self.is_scaled():
+            return self
+        from .BaseAlgorithm import Cache
+        physical = self.clone_properties(self.get_values())
+        # same values: the cached results and derived series (see get_derived) are shared with the signal
+        Cache.cache_check(self)
+        physical._cache = self._cache
+        return physical
+
     def get_times(self):
         return _np.arange(len(self)) / self.get_sampling_freq() + self.get_start_time()
 
@@ -245,11 +398,13 @@ class EvenlySignal(Signal):
         return self.get_time(iidx)
 
     def get_value_t(self, instant):
-        values = self.get_values()
+        values = self.get_raw_values()
         nearest_idx = int(_np.round(self.get_sampling_freq() * (instant - self.get_start_time())))
         assert nearest_idx < len(self), "Required instant is after the end of the signal"  # return self[-1]
         assert nearest_idx >= 0, "Required instant is before the start of the signal"  # return self[0]
-        
+
+        if self.is_scaled():
+            return values[nearest_idx] * self.get_scale() + self.get_offset()
         return values[nearest_idx]
     
     def resample(self, fout, kind='linear'):
@@ -268,16 +423,18 @@ class EvenlySignal(Signal):
         resampled_signal : EvenlySignal
             The resampled signal
         """
+        from scipy import interpolate as _interp
 
         ratio = self.get_sampling_freq() / fout
+        values = self.get_values()
 
         if fout < self.get_sampling_freq() and ratio.is_integer():  # fast interpolation
-            signal_out = self.get_values()[::int(ratio)]
+            signal_out = values[::int(ratio)]
         else:
             # The last sample is doubled to allow the new size to be correct
             indexes = _np.arange(len(self) + 1)
             indexes_out = _np.arange(len(self) * fout / self.get_sampling_freq()) * ratio
-            self_l = _np.append(self, self[-1])
+            self_l = _np.append(values, values[-1])
 
             if kind == 'cubic':
                 tck = _interp.InterpolatedUnivariateSpline(indexes, self_l)
@@ -312,7 +469,8 @@ class EvenlySignal(Signal):
     # TRYME
     def segment_iidx(self, iidx_start, iidx_stop=None):
 
-        signal_values = self.get_values()
+        # slice the stored values: scaled integer storage is converted only when the portion is read
+        signal_values = self.get_raw_values()
 
         if iidx_start is None:
             iidx_start = 0
@@ -322,6 +480,7 @@ class EvenlySignal(Signal):
         values = signal_values[int(iidx_start):int(iidx_stop)]
 
         out_signal = self.clone_properties(values)
+        out_signal.set_scaling(self.get_scale(), self.get_offset())
         out_signal.set_start_time(self.get_time(iidx_start))
         return out_signal
 
@@ -343,15 +502,18 @@ class EvenlySignal(Signal):
             The selected portion
         """
 
-        return self.segment_idx(self.get_idx(t_start), self.get_idx(t_stop))
+        return self.segment_idx(self.get_idx(t_start) if t_start is not None else None,
+                                self.get_idx(t_stop) if t_stop is not None else None)
 
-    def to_csv(self, filename, comment=''):
-        values = self.get_values()
-        times = self.get_times()
+    def to_csv(self, filename, comment='', fmt='%.18e', block_len=65536):
         header = self.get_signal_type() + ' \n' + 'Fsamp: ' + str(
             self.get_sampling_freq()) + '\n' + comment + '\nidx,time,value'
 
-        _np.savetxt(filename, _np.c_[times, values], delimiter=',', header=header, comments='')
+        def get_rows(i_start, i_stop):
+            idxs = _np.arange(i_start, i_stop)
+            return _np.c_[idxs, self.get_time(idxs), self._get_values_range(i_start, i_stop)]
+
+        _write_csv(filename, header, get_rows, len(self), ['%d', fmt, fmt], block_len)
 
     def __repr__(self):
         return Signal.__repr__(self)[:-1] + " freq:" + str(self.get_sampling_freq()) + "Hz>\n" + self.view(
@@ -433,7 +595,7 @@ class UnevenlySignal(Signal):
         return obj
 
     def clone_properties(self, new_values, new_x, new_x_type):
-        x_new = UnevenlySignal(new_values,
+        x_new = UnevenlySignal(self._as_float(new_values),
                                self.get_sampling_freq(),
                                self.get_start_time(),
                                self.get_signal_type(),
@@ -474,14 +636,16 @@ class UnevenlySignal(Signal):
         else:
             return None
 
-    def to_csv(self, filename, comment=''):
-        values = self.get_values()
-        times = self.get_times()
+    def to_csv(self, filename, comment='', fmt='%.18e', block_len=65536):
         idxs = self.get_indices()
         header = self.get_signal_type() + ' \n' + 'Fsamp: ' + str(
             self.get_sampling_freq()) + '\n' + comment + '\nidx,time,value'
 
-        _np.savetxt(filename, _np.c_[idxs, times, values], delimiter=',', header=header, comments='')
+        def get_rows(i_start, i_stop):
+            return _np.c_[idxs[i_start:i_stop], self.get_time(idxs[i_start:i_stop]),
+                          self._get_values_range(i_start, i_stop)]
+
+        _write_csv(filename, header, get_rows, len(self), ['%d', fmt, fmt], block_len)
 
     def to_evenly(self, kind='cubic'):
         """
@@ -496,6 +660,7 @@ class UnevenlySignal(Signal):
         interpolated_signal: ndarray
             The interpolated signal
         """
+        from scipy import interpolate as _interp
 
         assert kind != 'cubic' or len(self) > 3, "At least 4 samples needed for cubic interpolation"
 
@@ -622,31 +787,45 @@ class UnevenlySignal(Signal):
 
 
 class MultiEvenly(EvenlySignal):
-    
-    def __new__(cls, values, sampling_freq, start_time=None, signal_type='raw', info = {}):
+    """
+    Evenly spaced multichannel signal, values of shape (samples x channels).
+
+    The values can be stored channel-contiguous (Fortran order, order='F'): each channel returned by get_channel
+    and processed by the algorithms is then a contiguous view.
+    """
+
+    def __new__(cls, values, sampling_freq, start_time=None, signal_type='raw', info = {}, order=None):
         assert sampling_freq > 0, "The sampling frequency cannot be zero or negative"
         assert start_time is None or isinstance(start_time, _Number), "Start time is not numeric"
+        assert order in [None, 'C', 'F'], "order should be None (keep), 'C' or 'F'"
+        if order is not None:
+            values = _np.asarray(values, order=order)
         obj = Signal.__new__(cls, values=values, sampling_freq=sampling_freq, start_time=start_time, signal_type=signal_type)
         
         return obj
 
     def clone_properties(self, new_values):
-        x_new = MultiEvenly(new_values,
+        x_new = MultiEvenly(self._as_float(new_values),
                             self.get_sampling_freq(),
                             self.get_start_time(),
-                            self.get_signal_type())
+                            self.get_signal_type(),
+                            order='F' if self.is_channel_contiguous() else None)
         return(x_new)
-    
-    
-    def set_start_time(self, value):
-        setattr(self, "_mutated", True)
-        self.ph[self._MT_START_TIME] = value  
-        stim = self.get_stim()
-        stim.set_start_time(value)
-        
+
+    def is_channel_contiguous(self):
+        """
+        Returns whether the samples of each channel are contiguous in memory (Fortran order).
+        """
+        return self.strides[0] == self.itemsize or len(self) <= 1
+
     def get_channel(self, i_ch):
-        ch_values = self.get_values()[:,i_ch]
-        return(EvenlySignal(ch_values, self.get_sampling_freq(), self.get_start_time(), self.get_signal_type()))
+        ch_values = self.get_raw_values()[:,i_ch]
+        ch_signal = EvenlySignal(ch_values, self.get_sampling_freq(), self.get_start_time(), self.get_signal_type())
+        if self.is_scaled():
+            scale, offset = self.get_scale(), self.get_offset()
+            ch_signal.set_scaling(scale[i_ch] if scale.ndim > 0 else scale,
+                                  offset[i_ch] if offset.ndim > 0 else offset)
+        return(ch_signal)
         
     def resample(self, fout, kind='linear'):
         """
@@ -664,6 +843,7 @@ class MultiEvenly(EvenlySignal):
         resampled_signal : EvenlySignal
             The resampled signal
         """
+        from scipy import interpolate as _interp
 
         ratio = self.get_sampling_freq() / fout
 
@@ -687,7 +867,7 @@ class MultiEvenly(EvenlySignal):
     # TRYME
     def segment_iidx(self, iidx_start, iidx_stop=None):
 
-        signal_values = self.get_values()
+        signal_values = self.get_raw_values()
 
         if iidx_start is None:
             iidx_start = 0
@@ -697,15 +877,14 @@ class MultiEvenly(EvenlySignal):
         values = signal_values[int(iidx_start):int(iidx_stop),:]
 
         out_signal = self.clone_properties(values)
-        out_stim = self.get_stim().clone()
-        out_stim = out_stim.segment_iidx(iidx_start, iidx_stop)
-        out_signal.set_stim(out_stim)
-        
+        out_signal.set_scaling(self.get_scale(), self.get_offset())
         out_signal.set_start_time(self.get_time(iidx_start))
         return out_signal
     
     
     def plot(self, style=""):
+        from matplotlib.pyplot import vlines as _vlines, ylabel as _ylabel, grid as _grid, subplot as _subplot, \
+            tight_layout as _tight_layout, subplots_adjust as _subplots_adjust, xlim as _xlim
         _grid()
         n_ch = self.get_nchannels()
     
@@ -723,11 +902,14 @@ class MultiEvenly(EvenlySignal):
         _tight_layout()
         _subplots_adjust(top=0.9, bottom=0.01, left=0.05, right=0.95, hspace=0.3, wspace=0.25)
 
-    def to_csv(self, filename, comment='', fmt = '%.6f'): 
-        values = self.get_values()
-        times = self.get_times()
+    def to_csv(self, filename, comment='', fmt='%.6f', block_len=65536):
         header = self.get_signal_type() + ' \n' + 'Fsamp: ' + str(self.get_sampling_freq()) + '\n' + comment + '\nidx,time'+''.join([f',ch{x}' for x in range(self.get_nchannels())])
-        _np.savetxt(filename, _np.c_[_np.arange(len(times)), times, values], delimiter=',', header=header, comments='', fmt = fmt)
+
+        def get_rows(i_start, i_stop):
+            idxs = _np.arange(i_start, i_stop)
+            return _np.c_[idxs, self.get_time(idxs), self._get_values_range(i_start, i_stop)]
+
+        _write_csv(filename, header, get_rows, len(self), ['%d', fmt] + [fmt] * self.get_nchannels(), block_len)
 
     def __repr__(self):
         return f"<start_time: {self.get_start_time()}> freq:  {self.get_sampling_freq()} Hz> {self.view(_np.ndarray).__repr__()}"
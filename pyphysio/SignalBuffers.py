@@ -0,0 +1,402 @@
+# coding=utf-8
+from __future__ import division
+import numpy as _np
+from pyphysio.Signal import EvenlySignal as _EvenlySignal, MultiEvenly as _MultiEvenly
+from pyphysio.Utility import abstractmethod as _abstract
+
+__author__ = 'AleB'
+
+
+class SignalBuffer(object):
+    """
+    Base class of the evenly sampled signals whose samples are not stored in a single array (e.g. a growing
+    acquisition). Segments are returned as EvenlySignal (MultiEvenly if multichannel); the algorithms receive
+    the contiguous EvenlySignal returned by to_evenly(). The buffers that can grow (ChunkedSignal,
+    RingEvenlySignal) also implement append(values).
+
+    Attributes:
+    -----------
+
+    sampling_freq : float, >0
+        Sampling frequency
+    start_time: float,
+        Instant of the first sample
+    signal_type : str, default = ''
+        Type of signal (e.g. 'ECG', 'EDA')
+    n_channels : int, >0, default = 1
+        Number of channels of each sample
+    dtype : numpy type, default = float
+        Type of the stored values
+    """
+
+    def __init__(self, sampling_freq, start_time=None, signal_type="", n_channels=1, dtype=float):
+        assert sampling_freq > 0, "The sampling frequency cannot be zero or negative"
+        assert n_channels > 0, "The number of channels should be positive"
+        self._fsamp = sampling_freq
+        self._start_time = start_time if start_time is not None else 0
+        self._signal_type = signal_type
+        self._n_channels = n_channels
+        self._dtype = _np.dtype(dtype)
+
+    def get_sampling_freq(self):
+        return self._fsamp
+
+    def get_start_time(self):
+        return self._start_time
+
+    def get_signal_type(self):
+        return self._signal_type
+
+    def get_nchannels(self):
+        return self._n_channels
+
+    def is_multi(self):
+        return self._n_channels > 1
+
+    def get_end_time(self):
+        return self.get_time(len(self))
+
+    def get_duration(self):
+        return self.get_end_time() - self.get_start_time()
+
+    def get_idx(self, time):
+        idx = int((time - self.get_start_time()) * self.get_sampling_freq())
+        if idx < 0:
+            idx = 0
+        return idx
+
+    def get_iidx(self, time):
+        return self.get_idx(time)
+
+    def get_time(self, idx):
+        return idx / self.get_sampling_freq() + self.get_start_time() if idx is not None else None
+
+    def get_times(self):
+        return _np.arange(len(self)) / self.get_sampling_freq() + self.get_start_time()
+
+    def get_values(self):
+        return self.to_evenly().get_values()
+
+    def segment_time(self, t_start, t_stop=None):
+        """
+        Segment the signal given a time interval
+
+        Parameters
+        ----------
+        t_start : float
+            The instant of the start of the interval
+        t_stop : float
+            The instant of the end of the interval. By default is the end of the signal
+
+        Returns
+        -------
+        portion : EvenlySignal
+            The selected portion
+        """
+        return self.segment_idx(self.get_idx(t_start) if t_start is not None else None,
+                                self.get_idx(t_stop) if t_stop is not None else None)
+
+    def segment_idx(self, idx_start, idx_stop=None):
+        return self.segment_iidx(idx_start, idx_stop)
+
+    def segment_iidx(self, iidx_start, iidx_stop=None):
+        iidx_start = 0 if iidx_start is None else min(max(int(iidx_start), 0), len(self))
+        iidx_stop = len(self) if iidx_stop is None else min(max(int(iidx_stop), iidx_start), len(self))
+        return self._wrap(self._get_range(iidx_start, iidx_stop), iidx_start)
+
+    def _wrap(self, values, idx_start):
+        if self.is_multi():
+            return _MultiEvenly(values, self._fsamp, self.get_time(idx_start), self._signal_type)
+        return _EvenlySignal(values, self._fsamp, self.get_time(idx_start), self._signal_type)
+
+    def _empty(self, n_samples):
+        shape = (n_samples, self._n_channels) if self.is_multi() else (n_samples,)
+        return _np.empty(shape, dtype=self._dtype)
+
+    def _check_block(self, values):
+        values = _np.asarray(values, dtype=self._dtype)
+        if self.is_multi():
+            assert values.ndim == 2 and values.shape[1] == self._n_channels, \
+                "Expected values of shape (n_samples, %d)" % self._n_channels
+        elif values.ndim == 0:
+            values = values.reshape(1)
+        return values
+
+    def __repr__(self):
+        return "<%s: %s, start_time: %s freq:%sHz, samples: %d>" % (self.__class__.__name__, self._signal_type,
+                                                                    self.get_start_time(), self._fsamp, len(self))
+
+    @_abstract
+    def __len__(self):
+        pass
+
+    @_abstract
+    def _get_range(self, iidx_start, iidx_stop):
+        pass
+
+    @_abstract
+    def to_evenly(self):
+        pass
+
+
+class ChunkedSignal(SignalBuffer):
+    """
+    Evenly spaced signal stored in fixed-size blocks, to be grown during an acquisition.
+    Appending copies each sample once (no re-allocation of the previous samples). Portions within a block are
+    returned as views, portions spanning several blocks are copied once.
+
+    Attributes:
+    -----------
+
+    sampling_freq : float, >0
+        Sampling frequency
+    block_len : int, >0, default = 65536
+        Number of samples of each block
+    start_time: float,
+        Instant of the first sample
+    signal_type : str, default = ''
+        Type of signal (e.g. 'ECG', 'EDA')
+    n_channels : int, >0, default = 1
+        Number of channels of each sample
+    dtype : numpy type, default = float
+        Type of the stored values
+    """
+
+    def __init__(self, sampling_freq, block_len=65536, start_time=None, signal_type="", n_channels=1,
+                 dtype=float):
+        assert block_len > 0, "The block length should be positive"
+        SignalBuffer.__init__(self, sampling_freq, start_time, signal_type, n_channels, dtype)
+        self._block_len = int(block_len)
+        self._blocks = []
+        self._len = 0
+        self._evenly = None
+
+    def __len__(self):
+        return self._len
+
+    def get_blocks(self):
+        """
+        Returns the filled portions of the blocks (views).
+        """
+        return [self._blocks[i][:min(self._block_len, self._len - i * self._block_len)]
+                for i in range(len(self._blocks))]
+
+    def append(self, values):
+        """
+        Appends the given samples at the end of the signal.
+        :param values: Array of samples, (n_samples, n_channels) if multichannel.
+        """
+        values = self._check_block(values)
+        i = 0
+        while i < len(values):
+            i_block, i_in = divmod(self._len, self._block_len)
+            if i_block == len(self._blocks):
+                self._blocks.append(self._empty(self._block_len))
+            n = min(self._block_len - i_in, len(values) - i)
+            self._blocks[i_block][i_in:i_in + n] = values[i:i + n]
+            self._len += n
+            i += n
+        self._evenly = None
+
+    def _get_range(self, iidx_start, iidx_stop):
+        if iidx_stop <= iidx_start:
+            return self._empty(0)
+        bl = self._block_len
+        b_start = iidx_start // bl
+        b_stop = (iidx_stop - 1) // bl
+        if b_start == b_stop:
+            return self._blocks[b_start][iidx_start - b_start * bl:iidx_stop - b_start * bl]
+
+        out = self._empty(iidx_stop - iidx_start)
+        i_out = 0
+        for b in range(b_start, b_stop + 1):
+            portion = self._blocks[b][max(iidx_start - b * bl, 0):min(iidx_stop - b * bl, bl)]
+            out[i_out:i_out + len(portion)] = portion
+            i_out += len(portion)
+        return out
+
+    def to_evenly(self):
+        """
+        Returns the whole signal as a contiguous EvenlySignal (MultiEvenly if multichannel). The copy is made
+        once and kept until the next append.
+        """
+        if self._evenly is None:
+            self._evenly = self.segment_iidx(0, len(self))
+        return self._evenly
+
+
+class RingEvenlySignal(SignalBuffer):
+    """
+    Evenly spaced signal that keeps only the most recent samples, for live monitoring.
+    The storage is preallocated and overwritten circularly; times keep increasing with the written samples, so the
+    start time is the one of the oldest retained sample. Portions are returned as views, unless they cross the
+    end of the storage (one copy).
+
+    Attributes:
+    -----------
+
+    sampling_freq : float, >0
+        Sampling frequency
+    duration : float, >0
+        Duration (in seconds) of the retained signal
+    start_time: float,
+        Instant of the first written sample
+    signal_type : str, default = ''
+        Type of signal (e.g. 'ECG', 'EDA')
+    n_channels : int, >0, default = 1
+        Number of channels of each sample
+    dtype : numpy type, default = float
+        Type of the stored values
+    """
+
+    def __init__(self, sampling_freq, duration, start_time=None, signal_type="", n_channels=1, dtype=float):
+        assert duration * sampling_freq >= 1, "The duration should allow at least one sample"
+        SignalBuffer.__init__(self, sampling_freq, start_time, signal_type, n_channels, dtype)
+        self._capacity = int(duration * sampling_freq)
+        self._buffer = self._empty(self._capacity)
+        self._n_written = 0
+        self._evenly = None
+
+    def __len__(self):
+        return min(self._n_written, self._capacity)
+
+    def get_capacity(self):
+        return self._capacity
+
+    def get_start_time(self):
+        return self._start_time + (self._n_written - len(self)) / self._fsamp
+
+    def append(self, values):
+        """
+        Appends the given samples, overwriting the oldest ones when the capacity is reached.
+        :param values: Array of samples, (n_samples, n_channels) if multichannel.
+        """
+        values = self._check_block(values)
+        if len(values) > self._capacity:
+            # only the last samples would be retained
+            self._n_written += len(values) - self._capacity
+            values = values[-self._capacity:]
+        i_pos = self._n_written % self._capacity
+        n_first = min(len(values), self._capacity - i_pos)
+        self._buffer[i_pos:i_pos + n_first] = values[:n_first]
+        self._buffer[:len(values) - n_first] = values[n_first:]
+        self._n_written += len(values)
+        self._evenly = None
+
+    def get_last(self, duration):
+        """
+        Returns the most recent portion of the signal.
+        :param duration: Duration (in seconds) of the portion.
+        :return: EvenlySignal (MultiEvenly if multichannel)
+        """
+        n = min(int(duration * self._fsamp), len(self))
+        return self.segment_iidx(len(self) - n, len(self))
+
+    def _get_range(self, iidx_start, iidx_stop):
+        if iidx_stop <= iidx_start:
+            return self._empty(0)
+        first = self._n_written - len(self)
+        p_start = (first + iidx_start) % self._capacity
+        p_stop = p_start + iidx_stop - iidx_start
+        if p_stop <= self._capacity:
+            return self._buffer[p_start:p_stop]
+        return _np.concatenate([self._buffer[p_start:], self._buffer[:p_stop - self._capacity]])
+
+    def to_evenly(self):
+        """
+        Returns the retained signal as a contiguous EvenlySignal (MultiEvenly if multichannel). The result is kept
+        until the next append.
+        """
+        if self._evenly is None:
+            self._evenly = self.segment_iidx(0, len(self))
+        return self._evenly
+
+
+class LazySignal(SignalBuffer):
+    """
+    Evenly spaced signal resulting from a chain of filters applied to a source signal, computed only where needed.
+    The filters that can be computed by portions (IIRFilter, FIRFilter, ConvolutionalFilter, Normalize) applied
+    to a LazySignal record the operation and return a LazySignal. A segment of the result is computed from the
+    portion of the source it depends on: the segment plus the settling margin of each filter of the chain. The
+    computation scales with the duration of the segments instead of the one of the signal, and the segments are
+    the ones of the filtered whole signal (up to the residual transients of the IIR filters, see
+    IIRFilter.get_margin). The other algorithms receive the whole signal, computed once (see to_evenly).
+    Normalize (except 'custom') needs the statistics of its whole input: the filters before it are computed on
+    the whole signal, the ones after it by portions.
+
+    Attributes:
+    -----------
+
+    signal : EvenlySignal, MultiEvenly or LazySignal
+        Source signal
+    algorithm : class, optional
+        Filter applied to the signal (recorded by the filter)
+    params : dict, optional
+        Parameters of the filter
+    """
+
+    def __init__(self, signal, algorithm=None, params=None):
+        if isinstance(signal, SignalBuffer) and not isinstance(signal, LazySignal):
+            signal = signal.to_evenly()
+        SignalBuffer.__init__(self, signal.get_sampling_freq(), signal.get_start_time(), signal.get_signal_type(),
+                              signal.get_nchannels() if signal.is_multi() else 1)
+        self._input = signal
+        self._algorithm = algorithm
+        self._params = dict(params) if params is not None else {}
+        self._resolved = None
+        self._margin = None
+        self._evenly = None
+
+    def __len__(self):
+        return len(self._input)
+
+    def __repr__(self):
+        chain = [] if self._algorithm is None else [self._algorithm.__name__ + str(self._params)]
+        signal = self._input
+        while isinstance(signal, LazySignal) and signal._algorithm is not None:
+            chain.insert(0, signal._algorithm.__name__ + str(signal._params))
+            signal = signal._input
+        return SignalBuffer.__repr__(self)[:-1] + ", pending: [%s]>" % ', '.join(chain)
+
+    def _get_params(self):
+        # parameters depending on the whole input (e.g. Normalize statistics) are resolved once, when needed
+        if self._resolved is None:
+            self._resolved = self._algorithm.lazy_params(self._params, self._input)
+        return self._resolved
+
+    def get_margin(self):
+        """
+        Returns the number of samples of the input needed on each side of a portion to compute it as in the
+        whole signal, None if the whole input is needed.
+        """
+        if self._algorithm is None:
+            return 0
+        if self._margin is None:
+            self._margin = [self._algorithm.get_margin(self._get_params(), self._fsamp)]
+        return self._margin[0]
+
+    def segment_iidx(self, iidx_start, iidx_stop=None):
+        iidx_start = 0 if iidx_start is None else min(max(int(iidx_start), 0), len(self))
+        iidx_stop = len(self) if iidx_stop is None else min(max(int(iidx_stop), iidx_start), len(self))
+        if self._algorithm is None:
+            return self._input.segment_iidx(iidx_start, iidx_stop)
+        margin = self.get_margin()
+        if margin is None or self._evenly is not None:
+            return self.to_evenly().segment_iidx(iidx_start, iidx_stop)
+        i_start, i_stop = max(iidx_start - margin, 0), min(iidx_stop + margin, len(self))
+        portion = self._algorithm.run(self._input.segment_iidx(i_start, i_stop), self._get_params())
+        return portion.segment_iidx(iidx_start - i_start, iidx_stop - i_start)
+
+    def _get_range(self, iidx_start, iidx_stop):
+        return self.segment_iidx(iidx_start, iidx_stop).get_values()
+
+    def to_evenly(self):
+        """
+        Returns the whole filtered signal, computed once.
+        """
+        if self._algorithm is None:
+            return self._input if not isinstance(self._input, LazySignal) else self._input.to_evenly()
+        if self._evenly is None:
+            signal = self._input.to_evenly() if isinstance(self._input, LazySignal) else self._input
+            self._evenly = self._algorithm.run(signal, self._get_params())
+        return self._evenly
@@ -1,8 +1,25 @@
 # coding=utf-8
+import logging as _logging
+import threading as _threading
 import numpy as np
-from scipy import interpolate
+from contextlib import contextmanager as _contextmanager
+from contextvars import ContextVar as _ContextVar
 __author__ = 'AleB'
 
+_logger = _logging.getLogger('pyphysio')
+# occurrences of each logged message: message -> [level, count]
+_log_counts = {}
+_log_lock = _threading.Lock()
+# occurrences of a message that are emitted, the following ones are only counted (None: no limit)
+_log_rate_limit = [10]
+# whether the log entries of a cached result are passed again to the logger at each cache hit
+_log_replay = [False]
+
+# float type of the computed values, per thread/task (None to follow the input signals)
+_precision = _ContextVar('pyphysio_precision', default=None)
+# number of threads processing the channels of a multichannel signal
+_n_workers = [1]
+
 
 class AbstractCalledError(RuntimeError):
     pass
@@ -31,6 +48,183 @@ def abstractmethod(funcobj):
     return abstract_error
 
 
+def set_precision(dtype):
+    """
+    Sets the float type of the values computed by the algorithms in the current thread (or asyncio task); the
+    threads processing the channels of a multichannel signal follow the thread that runs the algorithm.
+    :param dtype: A numpy float type (e.g. 'float32'), None to keep the float type of the input signals.
+    """
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        assert dtype.kind == 'f', "The precision should be a float type"
+    _precision.set(dtype)
+
+
+def get_precision():
+    return _precision.get()
+
+
+@_contextmanager
+def precision(dtype):
+    """
+    Context manager that sets the float type of the values computed by the algorithms, e.g.
+
+        with ph.precision('float32'):
+            eda_f = ph.IIRFilter(fp=1, fs=2)(eda)
+    :param dtype: A numpy float type, None to keep the float type of the input signals.
+    """
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        assert dtype.kind == 'f', "The precision should be a float type"
+    token = _precision.set(dtype)
+    try:
+        yield
+    finally:
+        _precision.reset(token)
+
+
+def set_n_workers(n_workers):
+    """
+    Sets the number of threads used to process the channels of multichannel signals, for the algorithms that
+    process one channel at a time. Useful when the algorithms spend most of the time in numpy/scipy functions
+    that release the GIL (filtering, FFTs).
+    :param n_workers: Number of threads, 1 to process the channels serially.
+    """
+    assert int(n_workers) >= 1, "The number of workers should be positive"
+    _n_workers[0] = int(n_workers)
+
+
+def get_n_workers():
+    return _n_workers[0]
+
+
+@_contextmanager
+def parallel(n_workers):
+    """
+    Context manager that sets the number of threads processing the channels of multichannel signals, e.g.
+
+        with ph.parallel(8):
+            phasic = ph.PhasicEstim(delta=0.02)(driver)
+    :param n_workers: Number of threads, 1 to process the channels serially.
+    """
+    previous = get_n_workers()
+    set_n_workers(n_workers)
+    try:
+        yield
+    finally:
+        _n_workers[0] = previous
+
+
+def float_dtype(*arrays):
+    """
+    Returns the float type of the values computed from the given arrays: the one set with the precision
+    policy if any, otherwise the widest float type of the arrays (float64 if none of them is a float array).
+    """
+    dtype = _precision.get()
+    if dtype is not None:
+        return dtype
+    dtypes = [a.dtype for a in arrays if getattr(a, 'dtype', None) is not None and a.dtype.kind == 'f']
+    return np.result_type(*dtypes) if len(dtypes) > 0 else np.dtype(float)
+
+
+def write_csv(filename, header, get_rows, n_rows, fmt, block_len=65536):
+    """
+    Writes a table into a CSV file block by block: each block is formatted with a single string operation.
+    :param filename: File system path or file object to write.
+    :param header: Text written before the rows (without the trailing newline).
+    :param get_rows: Function (i_start, i_stop) -> 2D array of the rows in the given range.
+    :param n_rows: Total number of rows.
+    :param fmt: Format of the values, a string or one string per column (e.g. ['%d', '%.6f']).
+    :param block_len: Number of rows formatted at once.
+    """
+    own_file = not hasattr(filename, 'write')
+    f = open(filename, 'w') if own_file else filename
+    try:
+        f.write(header + '\n')
+        row_fmt = None
+        for i in range(0, n_rows, block_len):
+            rows = get_rows(i, min(i + block_len, n_rows))
+            if row_fmt is None:
+                fmts = [fmt] * rows.shape[1] if isinstance(fmt, str) else fmt
+                assert len(fmts) == rows.shape[1], "One format per column is required"
+                row_fmt = ','.join(fmts) + '\n'
+            f.write((row_fmt * len(rows)) % tuple(rows.ravel().tolist()))
+    finally:
+        if own_file:
+            f.close()
+
+
+def set_log_rate_limit(limit):
+    """
+    Sets how many times each message is passed to the 'pyphysio' logger; the following occurrences are only
+    counted (see get_log_counts).
+    :param limit: Number of occurrences emitted, None for no limit.
+    """
+    assert limit is None or limit > 0, "The limit should be positive"
+    _log_rate_limit[0] = limit
+
+
+def set_log_replay(replay):
+    """
+    Sets whether the messages logged while computing a cached result are passed again to the 'pyphysio' logger at
+    each cache hit (memory or disk cache). By default they are logged once, when the result is computed; the cache
+    hits only pass them to the enclosing capture_log.
+    :param replay: Whether to log the messages at each cache hit.
+    """
+    _log_replay[0] = bool(replay)
+
+
+def get_log_replay():
+    return _log_replay[0]
+
+
+def get_log_counts():
+    """
+    Returns the number of occurrences of each logged message.
+    """
+    with _log_lock:
+        return dict((message, count) for message, (level, count) in _log_counts.items())
+
+
+def reset_log_counts():
+    with _log_lock:
+        _log_counts.clear()
+
+
+def log_message(level, message):
+    """
+    Logs a message through the 'pyphysio' logger, counting the occurrences and applying the rate limit.
+    :param level: Level of the message (e.g. logging.WARNING)
+    :param message: The message
+    """
+    with _log_lock:
+        entry = _log_counts.setdefault(message, [level, 0])
+        entry[1] += 1
+        count = entry[1]
+    limit = _log_rate_limit[0]
+    if limit is None or count < limit:
+        _logger.log(level, message)
+    elif count == limit:
+        _logger.log(level, message + " (further occurrences are only counted)")
+
+
+def log_summary(counts_before, title):
+    """
+    Logs the number of occurrences of the messages logged since counts_before was taken (see get_log_counts).
+    Messages that exceeded the rate limit are summarized at their level, the others at INFO level.
+    :param counts_before: Counts returned by get_log_counts
+    :param title: Name of the operation, prefixed to the summary
+    """
+    with _log_lock:
+        entries = [(message, level, count) for message, (level, count) in _log_counts.items()]
+    limit = _log_rate_limit[0]
+    for message, level, count in entries:
+        n = count - counts_before.get(message, 0)
+        if n > 0:
+            suppressed = limit is not None and count > limit
+            _logger.log(level if suppressed else _logging.INFO, "%s: %s (%d times)" % (title, message, n))
+
+
 def derive(data, labels):
     ll = []
     tt = []
@@ -65,6 +259,7 @@ def interpolate_ibi(rr, interp_freq):
     :param interp_freq:
     :param rr:
     """
+    from scipy import interpolate
     step = 1.0 / interp_freq
     rr /= 1000
     rr = np.array(rr)
@@ -82,6 +277,7 @@ def interpolate_ibi(rr, interp_freq):
 
 
 def template_interpolation(x, t, step, template=None):
+    from scipy import interpolate
     if template is None:
         template = np.square(np.cos(np.arange(0, 0.505, 0.005) * np.pi))
 
@@ -119,19 +315,19 @@ class PhUI(object):
 
     @staticmethod
     def o(mex):
-        PhUI.p(mex, '', 37)
+        log_message(_logging.INFO, mex)
 
     @staticmethod
     def i(mex):
-        PhUI.p(mex, '', 94)
+        log_message(_logging.INFO, mex)
 
     @staticmethod
     def w(mex):
-        PhUI.p(mex, 'Warning: ', 33)
+        log_message(_logging.WARNING, mex)
 
     @staticmethod
     def e(mex):
-        PhUI.p(mex, 'Error: ', 31)
+        log_message(_logging.ERROR, mex)
 
     @staticmethod
     def p(mex, lev, col):
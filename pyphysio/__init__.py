@@ -1,6 +1,10 @@
 # coding=utf-8
 from __future__ import division
 
+__version__ = '2.1'
+
+import os as _os
+import sys as _sys
 from numpy import array as _array
 from .tools.Tools import *
 import numpy as _np
@@ -11,11 +15,17 @@ from .indicators import NonLinearDomain
 from .indicators import PeaksDescription
 from .indicators import TimeDomain
 from .BaseSegmentation import Segment
-from .Signal import EvenlySignal, UnevenlySignal, MultiEvenly, from_pickle, from_pickleable
-from .interactive import Annotate
+from .Signal import EvenlySignal, UnevenlySignal, MultiEvenly, from_pickle, from_pickleable, from_adc, \
+    from_adc_file
+from .SignalBuffers import ChunkedSignal, RingEvenlySignal, LazySignal
+from .Profiling import profile, trace
+from .DiskCache import disk_cache, set_disk_cache, get_disk_cache
+from .Utility import precision, set_precision, get_precision, parallel, set_n_workers, get_n_workers, \
+    set_log_rate_limit, set_log_replay, get_log_counts, reset_log_counts
 # BE CAREFUL with NAMES!!!
 from .estimators.Estimators import *
 from .filters.Filters import *
+from .filters.Streaming import StreamingIIRFilter, StreamingConvolution
 from .indicators.FrequencyDomain import *
 from .indicators.NonLinearDomain import *
 from .indicators.PeaksDescription import *
@@ -26,11 +36,44 @@ from .segmentation.SegmentsGenerators import *
 
 #TODO: all signals as N_SAMPLES x N_CH, with N_CH =1 for non MultiEvenly
 
-print("Please cite:")
-print("Bizzego et al. (2019) 'pyphysio: A physiological signal processing library for data science approaches in physiology', SoftwareX")
-
 __author__ = "AleB"
 
+# attributes imported on first access (see __getattr__): matplotlib (Annotate) is slow to import
+_LAZY = {
+    'save': '.io.Container',
+    'load': '.io.Container',
+    'from_csv': '.io.Csv',
+    'EDFReader': '.io.EDF',
+    'WFDBRecord': '.io.WFDB',
+    'Annotate': '.interactive',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        value = getattr(import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+def cite():
+    """
+    Prints the reference to cite when using pyphysio.
+    """
+    print("Please cite:")
+    print("Bizzego et al. (2019) 'pyphysio: A physiological signal processing library for data science approaches in physiology', SoftwareX")
+
+
+# the banner is shown in interactive sessions only (not in scripts and workers), unless PYPHYSIO_QUIET is set
+if (hasattr(_sys, 'ps1') or _sys.flags.interactive) and not _os.environ.get('PYPHYSIO_QUIET'):
+    cite()
+
 def nature2type(data):
     data.ph['signal_type'] = data.ph['signal_nature']
     if isinstance(data, NIRS):
@@ -194,6 +237,38 @@ def preset_activity(prefix='activity', method='welch'):
 
     return t
  
+def _window_stack(segments, signal):
+    """
+    Returns the portions of an evenly sampled signal selected by the segments as a read-only strided view
+    (windows x samples), for the first segments with equal length and equally spaced starts. The values are not
+    copied, except the covered range of a scaled signal, converted to physical units.
+    :return: windows, number of windows (None, 0 if less than two segments qualify)
+    """
+    from numpy.lib.stride_tricks import as_strided as _as_strided
+
+    if not isinstance(signal, EvenlySignal) or signal.is_multi() or len(segments) < 2:
+        return None, 0
+    n = len(signal)
+    # as Segment.__call__ (segment_time)
+    i_starts = [min(signal.get_idx(seg.get_begin_time()), n) for seg in segments]
+    i_stops = [min(signal.get_idx(seg.get_end_time()), n) if seg.get_end_time() is not None else n
+               for seg in segments]
+    width, step = i_stops[0] - i_starts[0], i_starts[1] - i_starts[0]
+    if width <= 0 or step <= 0:
+        return None, 0
+    n_win = 0
+    while n_win < len(segments) and i_stops[n_win] - i_starts[n_win] == width and \
+            i_starts[n_win] == i_starts[0] + n_win * step:
+        n_win += 1
+    if n_win < 2:
+        return None, 0
+    values = signal.get_raw_values()[i_starts[0]:i_starts[0] + (n_win - 1) * step + width]
+    if signal.is_scaled():
+        values = signal._unscale(values)
+    stride = values.strides[0]
+    return _as_strided(values, shape=(n_win, width), strides=(step * stride, stride), writeable=False), n_win
+
+
 def fmap(segments, algorithms, alt_signal=None):
     # TODO : rename extract_indicators
     """
@@ -206,22 +281,51 @@ def fmap(segments, algorithms, alt_signal=None):
 
     :return: values, col_names A tuple: matrix (segment x algorithms) containing a value for each
      algorithm, the list of the algorithm names.
+
+    Equal-length, equally spaced segments of an evenly sampled signal are processed at once by the algorithms
+    implementing algorithm_batch.
     """
     from numpy import asarray as _asarray
-    
+    from .Utility import get_log_counts as _get_log_counts, log_summary as _log_summary
+    from .Profiling import trace_segment as _trace_segment
+
+    log_counts = _get_log_counts()
     seg_for = segments(alt_signal) if isinstance(segments, SegmentsGenerator) else segments
-    
+
+    # results of the algorithms with a batch implementation, for the first n_batch segments
+    windows, n_batch = None, 0
+    batch_results = {}
+    if isinstance(alt_signal, EvenlySignal) and not alt_signal.is_multi() and \
+            any(alg.has_batch() for alg in algorithms):
+        # the segments are needed all together only to stack the windows
+        seg_for = list(seg_for)
+        windows, n_batch = _window_stack(seg_for, alt_signal)
+    if windows is not None:
+        meta = {'sampling_freq': alt_signal.get_sampling_freq(), 'signal_type': alt_signal.get_signal_type()}
+        for i_alg, alg in enumerate(algorithms):
+            result = alg.run_batch(windows, meta, alg.get())
+            if result is not None:
+                batch_results[i_alg] = result
+
     values = []
-    for seg in seg_for:
+    for i_seg, seg in enumerate(seg_for):
         segment_data = _np.array([seg.get_begin_time(), seg.get_end_time(), seg.get_label()]).reshape(3,1)
         vals_segment = []
-        for alg in algorithms:
-            vals_alg = _np.array(alg(seg(alt_signal)))
-
-            if not alt_signal.is_multi():
-#                vals_alg = _np.expand_dims([vals_alg], 1)
-                vals_alg = _np.array([vals_alg])
-            vals_segment.append(vals_alg)
+        with _trace_segment(i_seg, seg.get_begin_time(), seg.get_end_time(), seg.get_label()):
+            # one portion for all the algorithms: its derived series (see Signal.get_derived) are computed once
+            seg_signal = None
+            for i_alg, alg in enumerate(algorithms):
+                if i_seg < n_batch and i_alg in batch_results:
+                    vals_alg = _np.array(batch_results[i_alg][i_seg])
+                else:
+                    if seg_signal is None:
+                        seg_signal = seg(alt_signal)
+                    vals_alg = _np.array(alg(seg_signal))
+
+                if not alt_signal.is_multi():
+#                    vals_alg = _np.expand_dims([vals_alg], 1)
+                    vals_alg = _np.array([vals_alg])
+                vals_segment.append(vals_alg)
             
         vals_segment = _np.array(vals_segment)
         seg_data_array = _np.repeat(segment_data, alt_signal.get_nchannels(), axis = 1)
@@ -235,7 +339,9 @@ def fmap(segments, algorithms, alt_signal=None):
         values = values[:,:,0]
         
     col_names = ["begin", "end", "label"] + [x.__repr__() for x in algorithms]
-    
+
+    # messages of the run, counted instead of flooding the output
+    _log_summary(log_counts, 'fmap')
     return values, _array(col_names)
 
 
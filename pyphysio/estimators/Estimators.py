@@ -7,6 +7,7 @@ from ..filters.Filters import IIRFilter as _IIRFilter, DeConvolutionalFilter as
     ConvolutionalFilter as _ConvolutionalFilter
 from ..tools.Tools import SignalRange as _SignalRange, PeakDetection as _PeakDetection, Minima as _Minima, \
     PeakSelection as _PeakSelection, Diff as _Diff
+from ..Utility import float_dtype as _float_dtype
 
 __author__ = 'AleB'
 
@@ -150,6 +151,8 @@ class BeatFromECG(_Estimator):
         assert 0 < k < 1, "K coefficient must be in the range (0,1)"
         _Estimator.__init__(self, bpm_max=bpm_max, delta=delta, k=k)
 
+    _disk_cache = True
+
     @classmethod
     def algorithm(cls, signal, params):
         bpm_max, delta, k = params["bpm_max"], params["delta"], params["k"]
@@ -221,13 +224,16 @@ class DriverEstim(_Estimator):
         assert t2 > 0, "t2 value has to be positive"
         _Estimator.__init__(self, t1=t1, t2=t2)
 
+    _disk_cache = True
+
     @classmethod
     def algorithm(cls, signal, params):
         t1 = params['t1']
         t2 = params['t2']
 
         fsamp = signal.get_sampling_freq()
-        bateman = DriverEstim._gen_bateman(fsamp, [t1, t2])
+        dtype = _float_dtype(signal.get_values())
+        bateman = DriverEstim._gen_bateman(fsamp, [t1, t2]).astype(dtype)
         idx_max_bat = _np.argmax(bateman)
 
         # Prepare the input signal to avoid starting/ending peaks in the driver
@@ -240,7 +246,7 @@ class DriverEstim(_Estimator):
             _np.max(bateman_second_half) - _np.min(bateman_second_half))
 
         signal_in = _np.r_[bateman_first_half, signal.get_values(), bateman_second_half]
-        signal_in = _EvenlySignal(signal_in, fsamp)
+        signal_in = _EvenlySignal(signal_in.astype(dtype, copy=False), fsamp)
 
         # deconvolution
         driver = _DeConvolutionalFilter(irf=bateman, normalize=True, deconv_method='fft')(signal_in)
@@ -249,7 +255,7 @@ class DriverEstim(_Estimator):
         # gaussian smoothing
         driver = _ConvolutionalFilter(irftype='gauss', win_len=_np.max([0.2, 1 / fsamp]) * 8, normalize=True)(driver)
 
-        driver = _EvenlySignal(driver, sampling_freq=fsamp, start_time=signal.get_start_time(),signal_type="dEDA")
+        driver = _EvenlySignal(driver.astype(dtype, copy=False), sampling_freq=fsamp, start_time=signal.get_start_time(),signal_type="dEDA")
         return driver
 
     @staticmethod
@@ -326,6 +332,8 @@ class PhasicEstim(_Estimator):
         assert win_post > 0, "Window post peak value has to be positive"
         _Estimator.__init__(self, delta=delta, grid_size=grid_size, win_pre=win_pre, win_post=win_post)
 
+    _disk_cache = True
+
     @classmethod
     def algorithm(cls, signal, params):
         delta = params["delta"]
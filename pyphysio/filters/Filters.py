@@ -1,17 +1,100 @@
 # coding=utf-8
 from __future__ import division
 import numpy as _np
-import scipy.stats as _stats
-from scipy.signal import gaussian as _gaussian, filtfilt as _filtfilt, filter_design as _filter_design, \
-    deconvolve as _deconvolve, firwin as _firwin, convolve as _convolve
-from matplotlib.pyplot import plot as _plot
 from ..BaseFilter import Filter as _Filter
 from ..Signal import EvenlySignal as _EvenlySignal, UnevenlySignal as _UnevenlySignal
-from ..Utility import abstractmethod as _abstract
+from ..Utility import abstractmethod as _abstract, float_dtype as _float_dtype
 from ..tools.Tools import SignalRange
 from collections import Sequence
+from functools import lru_cache as _lru_cache
 __author__ = 'AleB'
 
+# residual edge transient of the IIR filters computed by portions (see IIRFilter.get_margin), relative
+_SETTLING_TOL = 1e-6
+# number of filter designs kept by each of the IIRFilter and FIRFilter design caches
+_DESIGN_CACHE_SIZE = 256
+
+
+def _hashable(value):
+    # frequencies as design cache keys: sequences as tuples, back to lists by _unhashable
+    return tuple(_np.ravel(value).tolist()) if isinstance(value, (list, tuple, _np.ndarray)) else value
+
+
+def _unhashable(value):
+    return list(value) if isinstance(value, tuple) else value
+
+
+@_lru_cache(maxsize=_DESIGN_CACHE_SIZE)
+def _iir_sos(fp, fs, loss, att, ftype, fsamp):
+    from scipy.signal import iirdesign as _iirdesign
+
+    nyq = 0.5 * fsamp
+    fp = _np.array(_unhashable(fp))
+    fs = _np.array(_unhashable(fs))
+
+    wp = fp / nyq
+    ws = fs / nyq
+    return _iirdesign(wp, ws, loss, att, ftype=ftype, output="sos")
+
+
+@_lru_cache(maxsize=_DESIGN_CACHE_SIZE)
+def _fir_taps(fp, fs, loss, att, wtype, fsamp):
+    from scipy.signal import firwin as _firwin
+    fp = _np.array(_unhashable(fp))
+    fs = _np.array(_unhashable(fs))
+    
+    if att>0:
+        att = -att
+    d1 = 10**(loss/10)
+    d2 = 10**(att/10)
+    Dsamp = _np.min(abs(fs-fp))/fsamp
+    
+
+    # from https://dsp.stackexchange.com/questions/31066/how-many-taps-does-an-fir-filter-need
+    N = int(2/3*_np.log10(1/(10*d1*d2))*fsamp/Dsamp)
+            
+    pass_zero=True
+              
+    if isinstance(fp, Sequence):
+        if fp[0]>fs[0]:
+            pass_zero=False
+    else:    
+        if fp[0]>fs[0]:
+            pass_zero=False
+    
+        
+    
+    nyq = 0.5 * fsamp
+    fp = _np.array(fp)
+    wp = fp / nyq
+    
+    if N%2 ==0:
+        N+=1
+    return _firwin(N, wp, width=Dsamp, window=wtype, pass_zero=pass_zero)
+
+
+def design_cache_info():
+    """
+    Returns the statistics of the caches of the filter designs (IIRFilter second-order sections, FIRFilter taps),
+    which are reused by the calls with the same parameters and sampling frequency.
+    :return: dict {filter class name: {'hits', 'misses', 'size', 'hit_rate'}}
+    """
+    info = {}
+    for name, design in [('IIRFilter', _iir_sos), ('FIRFilter', _fir_taps)]:
+        stats = design.cache_info()
+        calls = stats.hits + stats.misses
+        info[name] = {'hits': stats.hits, 'misses': stats.misses, 'size': stats.currsize,
+                      'hit_rate': stats.hits / calls if calls > 0 else 0.}
+    return info
+
+
+def clear_design_cache():
+    """
+    Removes the cached filter designs and resets their statistics.
+    """
+    _iir_sos.cache_clear()
+    _fir_taps.cache_clear()
+
 
 class Normalize(_Filter):
     """
@@ -37,6 +120,9 @@ class Normalize(_Filter):
     signal: 
         The normalized signal. 
 
+    Applied to a LazySignal, the statistics (except for 'custom') are computed on the whole input: the filters
+    of the chain before the Normalize are then computed on the whole signal, as without LazySignal.
+
     """
 
     def __init__(self, norm_method='standard', norm_bias=0, norm_range=1):
@@ -46,21 +132,50 @@ class Normalize(_Filter):
             assert norm_range != 0, "norm_range must not be zero"
         _Filter.__init__(self, norm_method=norm_method, norm_bias=norm_bias, norm_range=norm_range)
 
+    _multichannel = True
+    _lazy = True
+
     @classmethod
-    def algorithm(cls, signal, params):
+    def get_margin(cls, params, fsamp):
+        return 0
+
+    @classmethod
+    def lazy_params(cls, params, signal):
+        # the portions are normalized with the statistics of the whole input
+        if params['norm_method'] == 'custom':
+            return params
+        signal = signal.to_evenly()
+        bias, norm_range = cls._bias_range(signal.astype(_float_dtype(signal), copy=False), params)
+        return dict(params, norm_method='custom', norm_bias=bias, norm_range=norm_range)
+
+    @classmethod
+    def _bias_range(cls, signal, params):
         from ..indicators.TimeDomain import Mean as _Mean, StDev as _StDev
 
         method = params['norm_method']
         if method == "mean":
-            return signal - _Mean()(signal)
+            return _np.asarray(_Mean()(signal)), 1
         elif method == "standard":
-            return (signal - _Mean()(signal)) / _StDev()(signal)
+            return _np.asarray(_Mean()(signal)), _np.asarray(_StDev()(signal))
         elif method == "min":
-            return signal - _np.min(signal)
+            return _np.min(signal.get_values(), axis=0), 1
         elif method == "maxmin":
-            return (signal - _np.min(signal)) / (_np.max(signal) - _np.min(signal))
+            bias = _np.min(signal.get_values(), axis=0)
+            return bias, _np.max(signal.get_values(), axis=0) - bias
         elif method == "custom":
-            return (signal - params['norm_bias']) / params['norm_range']
+            return params['norm_bias'], params['norm_range']
+
+    @classmethod
+    def algorithm(cls, signal, params):
+        signal = signal.astype(_float_dtype(signal), copy=False)
+        # computed before writing the result: out can be the input
+        bias, norm_range = cls._bias_range(signal, params)
+        out = cls.get_out(signal)
+        if out is None:
+            return (signal - bias) / norm_range
+        _np.subtract(signal.get_values(), bias, out=out)
+        _np.divide(out, norm_range, out=out)
+        return cls.view_as(out, signal)
 
 
 
@@ -92,7 +207,9 @@ class IIRFilter(_Filter):
     Notes
     -----
     This is a wrapper of *scipy.signal.filter_design.iirdesign*. Refer to `scipy.signal.filter_design.iirdesign`
-    for additional information
+    for additional information. The filter is designed as second-order sections (stable also at low normalized
+    cutoff frequencies) and applied forward and backward (see *scipy.signal.sosfiltfilt*). The designs are
+    cached (see design_cache_info).
     """
 
     def __init__(self, fp, fs, loss=.1, att=40, ftype='butter'):
@@ -103,31 +220,51 @@ class IIRFilter(_Filter):
             "Filter type must be in ['butter', 'cheby1', 'cheby2', 'ellip', 'bessel']"
         _Filter.__init__(self, fp=fp, fs=fs, loss=loss, att=att, ftype=ftype)
 
+    _multichannel = True
+    _lazy = True
+
+    @classmethod
+    def _design(cls, params, fsamp):
+        # second-order sections, cached (see design_cache_info); a copy, since the callers may modify it and
+        # scipy's sosfilt rejects read-only sections
+        return _iir_sos(_hashable(params["fp"]), _hashable(params["fs"]), params["loss"], params["att"],
+                        params["ftype"], fsamp).copy()
+
+    @classmethod
+    def get_margin(cls, params, fsamp):
+        # sosfiltfilt padding plus the decay of the slowest pole to _SETTLING_TOL of the edge transient
+        sos = cls._design(params, fsamp)
+        r_max = max([_np.max(_np.abs(_np.roots(section[3:])), initial=0) for section in sos] + [0])
+        if r_max >= 1:
+            return None
+        n_settling = int(_np.ceil(_np.log(_SETTLING_TOL) / _np.log(r_max))) if r_max > 0 else 0
+        return 3 * (2 * len(sos) + 1) + n_settling
+
     @classmethod
     def algorithm(cls, signal, params):
-        fsamp = signal.get_sampling_freq()
-        fp, fs, loss, att, ftype = params["fp"], params["fs"], params["loss"], params["att"], params["ftype"]
+        from scipy.signal import sosfiltfilt as _sosfiltfilt
 
         if isinstance(signal, _UnevenlySignal):
             cls.warn('Filtering Unevenly signal is undefined. Returning original signal.')
             return signal
 
-        nyq = 0.5 * fsamp
-        fp = _np.array(fp)
-        fs = _np.array(fs)
-
-        wp = fp / nyq
-        ws = fs / nyq
-        # noinspection PyTupleAssignmentBalance
-        b, a = _filter_design.iirdesign(wp, ws, loss, att, ftype=ftype, output="ba")
+        sos = cls._design(params, signal.get_sampling_freq())
 
-        sig_filtered = signal.clone_properties(_filtfilt(b, a, signal.get_values()))
+        values = _sosfiltfilt(sos, signal.get_values(), axis=0)
 
-        if _np.isnan(sig_filtered[0]):
+        # channels without solution (e.g. starting with NaN) are returned unfiltered, as by the per-channel execution
+        failed = _np.isnan(values[0])
+        for _ in range(int(_np.sum(failed))):
             cls.warn('Filter parameters allow no solution. Returning original signal.')
+        if _np.all(failed):
             return signal
-        else:
-            return sig_filtered
+        if _np.any(failed):
+            values[:, failed] = signal.get_values()[:, failed]
+        out = cls.get_out(signal)
+        if out is None:
+            return signal.clone_properties(values)
+        out[...] = values
+        return cls.view_as(out, signal)
 
     @_abstract
     def plot(self):
@@ -161,7 +298,7 @@ class FIRFilter(_Filter):
     Notes
     -----
     This is a wrapper of *scipy.signal.firwin*. Refer to `scipy.signal.firwin`
-    for additional information
+    for additional information. The taps are cached (see design_cache_info).
     """
 
     def __init__(self, fp, fs, loss=0.1, att=40, wtype='hamming'):
@@ -172,47 +309,30 @@ class FIRFilter(_Filter):
             "Window type must be in ['hamming']"
         _Filter.__init__(self, fp=fp, fs=fs, loss=loss, att=att, wtype=wtype)
 
+    _lazy = True
+
+    @classmethod
+    def _taps(cls, params, fsamp):
+        # cached (see design_cache_info); a copy, since the callers may modify it
+        return _fir_taps(_hashable(params["fp"]), _hashable(params["fs"]), params["loss"], params["att"],
+                         params["wtype"], fsamp).copy()
+
+    @classmethod
+    def get_margin(cls, params, fsamp):
+        return len(cls._taps(params, fsamp)) // 2
+
     @classmethod
     def algorithm(cls, signal, params):
-        fsamp = signal.get_sampling_freq()
-        fp, fs, loss, att, wtype = params["fp"], params["fs"], params["loss"], params["att"], params["wtype"]
+        from scipy.signal import convolve as _convolve
 
         if isinstance(signal, _UnevenlySignal):
             cls.warn('Filtering Unevenly signal is undefined. Returning original signal.')
             return signal
 
-        fp = _np.array(fp)
-        fs = _np.array(fs)
-        
-        if att>0:
-            att = -att
-        d1 = 10**(loss/10)
-        d2 = 10**(att/10)
-        Dsamp = _np.min(abs(fs-fp))/fsamp
-        
-
-        # from https://dsp.stackexchange.com/questions/31066/how-many-taps-does-an-fir-filter-need
-        N = int(2/3*_np.log10(1/(10*d1*d2))*fsamp/Dsamp)
-                
-        pass_zero=True
-                  
-        if isinstance(fp, Sequence):
-            if fp[0]>fs[0]:
-                pass_zero=False
-        else:    
-            if fp[0]>fs[0]:
-                pass_zero=False
-        
-            
-        
-        nyq = 0.5 * fsamp
-        fp = _np.array(fp)
-        wp = fp / nyq
-        
-        if N%2 ==0:
-            N+=1
-        b = _firwin(N, wp, width=Dsamp, window=wtype, pass_zero=pass_zero)
-        sig_filtered = signal.clone_properties(_convolve(signal.get_values(), b, mode='same'))
+        b = cls._taps(params, signal.get_sampling_freq())
+        values = signal.get_values()
+        values = values.astype(_float_dtype(values), copy=False)
+        sig_filtered = signal.clone_properties(_convolve(values, b.astype(values.dtype), mode='same'))
 
         if _np.isnan(sig_filtered[0]):
             cls.warn('Filter parameters allow no solution. Returning original signal.')
@@ -248,7 +368,7 @@ class KalmanFilter(_Filter):
             
         P = 1
         
-        x_out = signal.get_values().copy()
+        x_out = cls._out_copy(signal)
         for k in range(1,sz):
                 x_ = x_out[k-1]
                 P_ = P + Q
@@ -258,7 +378,7 @@ class KalmanFilter(_Filter):
                 x_out[k] = x_ + K * (x_out[k] - x_)
                 P = (1 - K ) * P_
 
-        x_out = signal.clone_properties(x_out)
+        x_out = cls._out_signal(x_out, signal)
         return(x_out)
 
 ############
@@ -270,6 +390,7 @@ class ImputeNAN(_Filter):
         
     @classmethod
     def algorithm(cls, signal, params):
+        from scipy.stats import linregress as _linregress
         def group_consecutives(vals, step=1):
             """Return list of consecutive lists of numbers from vals (number list)."""
             run = []
@@ -288,7 +409,7 @@ class ImputeNAN(_Filter):
         win_len = params['win_len']*signal.get_sampling_freq()
         allnan = params['allnan']
         
-        s = signal.get_values().copy()
+        s = cls._out_copy(signal)
         if _np.isnan(s).all():
             if allnan == 'nan':
                 return(signal)
@@ -327,13 +448,13 @@ class ImputeNAN(_Filter):
                 idx_win = idx_win[_np.where(~_np.isnan(s[idx_win]))[0]] # remove nans
                 
                 if len(idx_win)>3:
-                    R = _stats.linregress(idx_win, s[idx_win])
+                    R = _linregress(idx_win, s[idx_win])
                     s_nan = _np.array(SEG)*R[0]+R[1] + _np.random.normal(scale=STD, size = len(SEG))
                 else:
                     s_nan = _np.nanmean(s)*_np.ones(len(SEG))
                 s[SEG] = s_nan
         
-        signal_out = signal.clone_properties(s)
+        signal_out = cls._out_signal(s, signal)
         return(signal_out)
 
 
@@ -365,7 +486,7 @@ class RemoveSpikes(_Filter):
         spikes = _np.convolve(spikes, win, 'same')
         idx_spikes = _np.where(spikes>0)[0]
         
-        x_out = signal.get_values().copy()
+        x_out = cls._out_copy(signal)
         
         #TODO add linear connector method
         if method == 'linear':
@@ -387,7 +508,7 @@ class RemoveSpikes(_Filter):
             for IDX in idx_spikes:
                 delta = x_out[IDX] - x_out[IDX-1]
                 x_out[IDX:] = x_out[IDX:] - D*delta
-        x_out = signal.clone_properties(x_out)
+        x_out = cls._out_signal(x_out, signal)
         return(x_out)
 
 class DenoiseEDA(_Filter):
@@ -474,26 +595,35 @@ class ConvolutionalFilter(_Filter):
         assert irftype == 'custom' or win_len > 0, "Window length value should be positive"
         _Filter.__init__(self, irftype=irftype, win_len=win_len, irf=irf, normalize=normalize)
 
-    # TODO (Andrea): TEST normalization and results
+    _multichannel = True
+    _lazy = True
+
     @classmethod
-    def algorithm(cls, signal, params):
+    def get_margin(cls, params, fsamp):
+        if params['irftype'] == 'custom':
+            return len(params['irf']) if params.get('irf') is not None else 0
+        return int(params['win_len'] * fsamp)
+
+    @classmethod
+    def _irf(cls, params, fsamp):
+        # the IRF and the length of the padding, (None, 0) if the parameters are not valid
+        from scipy.signal import gaussian as _gaussian
         irftype = params["irftype"]
         normalize = params["normalize"]
 
-        fsamp = signal.get_sampling_freq()
         irf = None
 
         if irftype == 'custom':
             if 'irf' not in params:
                 cls.error("'irf' parameter missing.")
-                return signal
+                return None, 0
             else:
                 irf = _np.array(params["irf"])
                 n = len(irf)
         else:
             if 'win_len' not in params:
                 cls.error("'win_len' parameter missing.")
-                return signal
+                return None, 0
             else:
                 n = int(params['win_len'] * fsamp)
 
@@ -521,12 +651,41 @@ class ConvolutionalFilter(_Filter):
         # NORMALIZE
         if normalize:
             irf = irf / _np.sum(irf)
-            
-        signal_ = _np.r_[_np.ones(n) * signal[0], signal, _np.ones(n) * signal[-1]]  # TESTME
 
-        signal_f = _np.convolve(signal_, irf, mode='same')
+        return irf, n
+
+    # TODO (Andrea): TEST normalization and results
+    @classmethod
+    def algorithm(cls, signal, params):
+        from scipy.signal import convolve as _convolve
+
+        irf, n = cls._irf(params, signal.get_sampling_freq())
+        if irf is None:
+            return signal
 
-        signal_out = signal.clone_properties(signal_f[n:-n])
+        values = signal.get_values()
+        dtype = _float_dtype(values)
+        out = cls.get_out(signal)
+        if out is None:
+            values = values.astype(dtype, copy=False)
+            signal_ = _np.concatenate([_np.repeat(values[:1], n, axis=0), values,
+                                       _np.repeat(values[-1:], n, axis=0)])  # TESTME
+        else:
+            # padded copy of the input in a reused buffer (out can be the input)
+            signal_ = cls.scratch('padded', (len(values) + 2 * n,) + values.shape[1:], dtype)
+            signal_[:n] = values[:1]
+            signal_[n:-n] = values
+            signal_[-n:] = values[-1:]
+
+        # along the samples axis (FFT based for long IRFs)
+        irf = irf.astype(dtype).reshape((-1,) + (1,) * (values.ndim - 1))
+        signal_f = _convolve(signal_, irf, mode='same')
+
+        if out is None:
+            signal_out = signal.clone_properties(signal_f[n:-n])
+        else:
+            out[...] = signal_f[n:-n]
+            signal_out = cls.view_as(out, signal)
         return signal_out
 
     @classmethod
@@ -564,8 +723,12 @@ class DeConvolutionalFilter(_Filter):
         assert deconv_method in ['fft', 'sps'], "Deconvolution method not valid"
         _Filter.__init__(self, irf=irf, normalize=normalize, deconv_method=deconv_method)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, signal, params):
+        from scipy import fft as _fft
+        from scipy.signal import deconvolve as _deconvolve
         irf = params["irf"]
         normalize = params["normalize"]
         deconvolution_method = params["deconv_method"]
@@ -574,12 +737,19 @@ class DeConvolutionalFilter(_Filter):
             irf = irf / _np.sum(irf)
         if deconvolution_method == 'fft':
             l = len(signal)
-            fft_signal = _np.fft.fft(signal, n=l)
-            fft_irf = _np.fft.fft(irf, n=l)
-            out = _np.fft.ifft(fft_signal / fft_irf)
+            # scipy.fft keeps single precision inputs in single precision
+            values = signal.get_values()
+            values = values.astype(_float_dtype(values), copy=False)
+            fft_signal = _fft.fft(values, n=l, axis=0)
+            fft_irf = _fft.fft(_np.asarray(irf, dtype=values.dtype), n=l)
+            out = _fft.ifft(fft_signal / fft_irf.reshape((-1,) + (1,) * (values.ndim - 1)), axis=0)
         elif deconvolution_method == 'sps':
             cls.warn('sps based deconvolution needs to be tested. Use carefully.')
-            out, _ = _deconvolve(signal, irf)
+            values = signal.get_values()
+            if values.ndim > 1:
+                out = _np.column_stack([_deconvolve(values[:, i], irf)[0] for i in range(values.shape[1])])
+            else:
+                out, _ = _deconvolve(values, irf)
         else:
             cls.error('Deconvolution method not implemented. Returning original signal.')
             out = signal.get_values()
@@ -589,4 +759,68 @@ class DeConvolutionalFilter(_Filter):
         return out_signal
 
     def plot(self):
+        from matplotlib.pyplot import plot as _plot
         _plot(self._params['irf'])
+
+
+class FilterChain(_Filter):
+    """
+    Filter the input signal with a sequence of filters. Consecutive IIRFilter stages are fused into a single
+    cascade of second-order sections, applied with one forward-backward pass instead of one pass per stage.
+    The other filters are applied as they are.
+
+    Parameters
+    ----------
+    filters : list
+        The filters (Filter instances), in order of application
+
+    Returns
+    -------
+    signal : EvenlySignal
+        Filtered signal
+
+    Notes
+    -----
+    The fused stages have the frequency response of the sequence of IIRFilter. The samples near the ends can
+    differ, as the cascade is padded once. If the fused cascade has no solution, the stages are applied one at a
+    time, so that only the failing ones are skipped.
+    The designs of the stages are cached (see design_cache_info).
+    See *scipy.signal.sosfiltfilt*.
+    """
+
+    def __init__(self, filters):
+        assert len(filters) > 0 and all(isinstance(f, _Filter) for f in filters), \
+            "filters should be a non-empty list of Filter"
+        _Filter.__init__(self, filters=list(filters))
+
+    _multichannel = True
+
+    @classmethod
+    def _fused_sos(cls, stages, fsamp):
+        # cascade of the cached designs of the stages
+        return _np.concatenate([IIRFilter._design(f.get(), fsamp) for f in stages])
+
+    @classmethod
+    def algorithm(cls, signal, params):
+        from scipy.signal import sosfiltfilt as _sosfiltfilt
+        filters = params['filters']
+
+        i = 0
+        while i < len(filters):
+            i_stop = i
+            while i_stop < len(filters) and type(filters[i_stop]) is IIRFilter:
+                i_stop += 1
+            if i_stop - i > 1 and not isinstance(signal, _UnevenlySignal):
+                sos = cls._fused_sos(filters[i:i_stop], signal.get_sampling_freq())
+                values = _sosfiltfilt(sos, signal.get_values(), axis=0)
+                if _np.isnan(values[0]).any():
+                    # one stage at a time: only the stages without solution are skipped
+                    for f in filters[i:i_stop]:
+                        signal = f(signal)
+                else:
+                    signal = signal.clone_properties(values)
+                i = i_stop
+            else:
+                signal = filters[i](signal)
+                i += 1
+        return signal
@@ -0,0 +1,254 @@
+# coding=utf-8
+from __future__ import division
+import numpy as _np
+from ..Signal import EvenlySignal as _EvenlySignal, MultiEvenly as _MultiEvenly
+from ..Utility import float_dtype as _float_dtype, abstractmethod as _abstract
+from .Filters import IIRFilter as _IIRFilter, FIRFilter as _FIRFilter, ConvolutionalFilter as _ConvolutionalFilter
+
+__author__ = 'AleB'
+
+
+class StreamingFilter(object):
+    """
+    Base class of the filters processing a signal chunk by chunk (e.g. a live acquisition or a memory-mapped
+    recording), carrying their state between the chunks. The result of the causal filters and of the convolutions
+    does not depend on how the signal is split; the one of StreamingIIRFilter with zero_phase does, within the
+    transient of its backward pass (see StreamingIIRFilter). Each call to process returns the filtered samples that are available, which lag the input by get_delay()
+    samples; flush returns the remaining ones at the end of the signal.
+
+        streaming = ph.StreamingIIRFilter(ph.IIRFilter(fp=1, fs=2), 256)
+        for chunk in chunks:
+            filtered = streaming.process(chunk)
+        filtered = streaming.flush()
+
+    The chunks are arrays of samples ((samples x channels) if multichannel) or EvenlySignal / MultiEvenly; the
+    results are of the same kind, with the start time of their first sample.
+
+    Attributes:
+    -----------
+
+    sampling_freq : float, >0
+        Sampling frequency of the signal
+    """
+
+    def __init__(self, sampling_freq):
+        assert sampling_freq > 0, "The sampling frequency cannot be zero or negative"
+        self._fsamp = sampling_freq
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the state, to filter a new signal.
+        """
+        self._n_out = 0
+        self._start_time = None
+        self._signal_type = None
+        self._dtype = None
+
+    def get_sampling_freq(self):
+        return self._fsamp
+
+    def get_delay(self):
+        """
+        Returns the number of samples by which the output lags the input.
+        """
+        return 0
+
+    def process(self, chunk):
+        """
+        Filters the next chunk of the signal.
+        :param chunk: Array of samples ((samples x channels) if multichannel), EvenlySignal or MultiEvenly.
+        :return: The filtered samples now available (array or signal as chunk).
+        """
+        values = chunk.get_values() if isinstance(chunk, _EvenlySignal) else _np.asarray(chunk)
+        if self._start_time is None:
+            is_signal = isinstance(chunk, _EvenlySignal)
+            self._start_time = chunk.get_start_time() if is_signal else 0
+            self._signal_type = chunk.get_signal_type() if is_signal else None
+            self._dtype = _float_dtype(values)
+        if len(values) == 0:
+            return self._wrap(values[:0].astype(self._dtype))
+        return self._wrap(self._process(values.astype(float, copy=False)))
+
+    def flush(self):
+        """
+        Returns the filtered samples still lagging at the end of the signal, and clears the state.
+        """
+        values = self._flush() if self._start_time is not None else _np.empty(0)
+        out = self._wrap(values)
+        self.reset()
+        return out
+
+    def _wrap(self, values):
+        values = values.astype(self._dtype if self._dtype is not None else float, copy=False)
+        start_time = self._start_time + self._n_out / self._fsamp if self._start_time is not None else 0
+        self._n_out += len(values)
+        if self._signal_type is None:
+            return values
+        if values.ndim > 1:
+            return _MultiEvenly(values, self._fsamp, start_time, self._signal_type)
+        return _EvenlySignal(values, self._fsamp, start_time, self._signal_type)
+
+    @_abstract
+    def _process(self, values):
+        pass
+
+    @_abstract
+    def _flush(self):
+        pass
+
+
+class StreamingIIRFilter(StreamingFilter):
+    """
+    IIRFilter applied chunk by chunk, with the state of the second-order sections carried between the chunks.
+
+    By default the filter is causal (applied forward only): no delay, but the phase of the signal is distorted.
+    The output is the one of scipy.signal.sosfilt on the whole signal, with the steady state for the first
+    sample as initial state, whatever the chunks.
+    With zero_phase the filter is applied forward and backward as IIRFilter; the backward pass is computed on a
+    bounded look-ahead, whose transient decays below 1e-6 with the default length (see IIRFilter.get_margin),
+    so the output lags the input by look_ahead samples. The result approximates the one of IIRFilter, and it
+    depends (within the transient) on how the signal is split, since the backward pass restarts at each chunk.
+    The samples near the start (and, with zero_phase, near the end) differ from the ones of IIRFilter.
+
+    Attributes:
+    -----------
+
+    iir_filter : IIRFilter
+        The filter
+    sampling_freq : float, >0
+        Sampling frequency of the signal
+    zero_phase : bool, default = False
+        Whether to apply the filter forward and backward
+    look_ahead : int, optional
+        Length (samples) of the backward pass with zero_phase. By default the settling length of the filter.
+    """
+
+    def __init__(self, iir_filter, sampling_freq, zero_phase=False, look_ahead=None):
+        assert isinstance(iir_filter, _IIRFilter), "iir_filter should be an IIRFilter"
+        self._sos = _IIRFilter._design(iir_filter.get(), sampling_freq)
+        if zero_phase and look_ahead is None:
+            look_ahead = _IIRFilter.get_margin(iir_filter.get(), sampling_freq)
+            assert look_ahead is not None, "Unstable filter: the look ahead is unbounded"
+        assert look_ahead is None or look_ahead >= 0, "look_ahead should be positive"
+        self._zero_phase = zero_phase
+        self._look_ahead = int(look_ahead) if zero_phase else 0
+        StreamingFilter.__init__(self, sampling_freq)
+
+    def reset(self):
+        StreamingFilter.reset(self)
+        self._zi = None
+        # forward filtered samples not yet returned (zero_phase)
+        self._pending = None
+
+    def get_delay(self):
+        return self._look_ahead
+
+    def _steady_state(self, value):
+        # state of the sections after a constant input equal to value (per channel)
+        from scipy.signal import sosfilt_zi as _sosfilt_zi
+        zi = _sosfilt_zi(self._sos)
+        value = _np.asarray(value, dtype=float)
+        return zi.reshape(zi.shape + (1,) * value.ndim) * value
+
+    def _backward(self, values):
+        from scipy.signal import sosfilt as _sosfilt
+        reversed_values = values[::-1]
+        return _sosfilt(self._sos, reversed_values, axis=0, zi=self._steady_state(reversed_values[0]))[0][::-1]
+
+    def _process(self, values):
+        from scipy.signal import sosfilt as _sosfilt
+        if self._zi is None:
+            self._zi = self._steady_state(values[0])
+        forward, self._zi = _sosfilt(self._sos, values, axis=0, zi=self._zi)
+        if not self._zero_phase:
+            return forward
+
+        pending = forward if self._pending is None else _np.concatenate([self._pending, forward])
+        n_ready = len(pending) - self._look_ahead
+        if n_ready <= 0:
+            self._pending = pending
+            return pending[:0]
+        # the backward pass starts look_ahead samples after the returned ones
+        out = self._backward(pending)[:n_ready]
+        self._pending = pending[n_ready:]
+        return out
+
+    def _flush(self):
+        if self._pending is None or len(self._pending) == 0:
+            return _np.empty(0)
+        return self._backward(self._pending)
+
+
+class StreamingConvolution(StreamingFilter):
+    """
+    FIRFilter or ConvolutionalFilter applied chunk by chunk, by overlap-save: each chunk is convolved with the
+    last samples of the previous ones.
+
+    By default the convolution is causal: no delay, but the output is shifted by half the length of the
+    kernel. With zero_phase the output is aligned with the input as the one of the filter, and lags the input
+    by half the length of the kernel: the result is the one of the filter applied to the whole signal (the
+    signal is extended with its first and last value for ConvolutionalFilter, with zeros for FIRFilter).
+
+    Attributes:
+    -----------
+
+    conv_filter : FIRFilter or ConvolutionalFilter
+        The filter
+    sampling_freq : float, >0
+        Sampling frequency of the signal
+    zero_phase : bool, default = False
+        Whether to align the output with the input
+    """
+
+    def __init__(self, conv_filter, sampling_freq, zero_phase=False):
+        assert isinstance(conv_filter, (_FIRFilter, _ConvolutionalFilter)), \
+            "conv_filter should be a FIRFilter or a ConvolutionalFilter"
+        if isinstance(conv_filter, _FIRFilter):
+            kernel = _FIRFilter._taps(conv_filter.get(), sampling_freq)
+            self._edge = False
+        else:
+            kernel, _ = _ConvolutionalFilter._irf(conv_filter.get(), sampling_freq)
+            assert kernel is not None, "Invalid ConvolutionalFilter parameters"
+            self._edge = True
+        self._kernel = _np.asarray(kernel, dtype=float)
+        self._zero_phase = zero_phase
+        StreamingFilter.__init__(self, sampling_freq)
+
+    def reset(self):
+        StreamingFilter.reset(self)
+        # last len(kernel) - 1 input samples
+        self._history = None
+        # outputs still to be skipped to align them with the input (zero_phase)
+        self._to_skip = (len(self._kernel) - 1) // 2 if self._zero_phase else 0
+        self._last = None
+
+    def get_delay(self):
+        return (len(self._kernel) - 1) // 2 if self._zero_phase else 0
+
+    def _padding(self, value, n):
+        value = _np.asarray(value, dtype=float)
+        if not self._edge:
+            value = _np.zeros_like(value)
+        return _np.repeat(value[None], n, axis=0)
+
+    def _process(self, values):
+        from scipy.signal import convolve as _convolve
+        n_history = len(self._kernel) - 1
+        if self._history is None:
+            self._history = self._padding(values[0], n_history)
+        self._last = values[-1]
+        extended = _np.concatenate([self._history, values])
+        self._history = extended[len(extended) - n_history:]
+        kernel = self._kernel.reshape((-1,) + (1,) * (values.ndim - 1))
+        out = _convolve(extended, kernel, mode='valid')
+        n_skip = min(self._to_skip, len(out))
+        self._to_skip -= n_skip
+        return out[n_skip:]
+
+    def _flush(self):
+        delay = self.get_delay()
+        if self._history is None or delay == 0:
+            return _np.empty(0)
+        # the signal extended after its end: the outputs of the last delay samples
+        return self._process(self._padding(self._last, delay))
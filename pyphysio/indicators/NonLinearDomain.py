@@ -2,9 +2,7 @@
 from __future__ import division
 
 from ..BaseIndicator import Indicator as _Indicator
-from ..tools.Tools import Diff as _Diff
 from ..indicators.TimeDomain import Mean as _Mean, StDev as _StDev
-from scipy.spatial.distance import cdist as _cd
 import numpy as _np
 
 __author__ = 'AleB'
@@ -150,8 +148,8 @@ class NNx(_Indicator):
     @classmethod
     def algorithm(cls, signal, params):
         th = params['threshold']
-        diff = _Diff()(signal)
-        return sum(1.0 for x in diff * 1000 if x > th)
+        diff = signal.get_derived('diff')
+        return float(_np.count_nonzero(diff * 1000 > th))
 
 
 class _Embed(_Indicator):
@@ -199,6 +197,7 @@ class ApproxEntropy(_Indicator):
 
     @classmethod
     def algorithm(cls, data, params):
+        from scipy.spatial.distance import cdist as _cd
         if len(data) < 3:
             return _np.nan
         else:
@@ -251,6 +250,7 @@ class SampleEntropy(_Indicator):
 
     @classmethod
     def algorithm(cls, data, params):
+        from scipy.spatial.distance import cdist as _cd
         if len(data) < 4:
             return _np.nan
         else:
@@ -305,7 +305,7 @@ class DFAShortTerm(_Indicator):
             return _np.nan
         else:
             ave = float(_Mean()(x))
-            y = _np.cumsum(x).astype(float)
+            y = x.get_derived('cumsum').astype(float)
             y -= ave
             l = _np.arange(4, 17, 4)
             f = _np.zeros(len(l))  # f(n) of different given box length n
@@ -344,7 +344,7 @@ class DFALongTerm(_Indicator):
             return _np.nan
         else:
             ave = float(_Mean()(x))
-            y = _np.cumsum(x).astype(float)
+            y = x.get_derived('cumsum').astype(float)
             y -= ave
             l_max = _np.min([64, len(x)])
             l = _np.arange(16, l_max + 1, 4)
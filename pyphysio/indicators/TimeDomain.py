@@ -4,7 +4,6 @@ from __future__ import division
 import numpy as _np
 
 from ..BaseIndicator import Indicator as _Indicator
-from ..tools.Tools import Diff as _Diff
 from ..Signal import EvenlySignal as _EvenlySignal, Signal as _Signal
 
 
@@ -18,9 +17,15 @@ class Mean(_Indicator):
     def __init__(self, **kwargs):
         _Indicator.__init__(self, **kwargs)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, data, params):
-        return _np.nanmean(data.get_values())
+        return _np.nanmean(data.get_values(), axis=0)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.nanmean(values, axis=1)
 
 
 class Min(_Indicator):
@@ -30,9 +35,15 @@ class Min(_Indicator):
     def __init__(self, **kwargs):
         _Indicator.__init__(self, **kwargs)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, data, params):
-        return _np.nanmin(data.get_values())
+        return _np.nanmin(data.get_values(), axis=0)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.nanmin(values, axis=1)
 
 
 class Max(_Indicator):
@@ -42,9 +53,15 @@ class Max(_Indicator):
     def __init__(self, **kwargs):
         _Indicator.__init__(self, **kwargs)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, data, params):
-        return _np.nanmax(data.get_values())
+        return _np.nanmax(data.get_values(), axis=0)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.nanmax(values, axis=1)
 
 
 class Range(_Indicator):
@@ -54,9 +71,15 @@ class Range(_Indicator):
     def __init__(self, **kwargs):
         _Indicator.__init__(self, **kwargs)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, data, params):
-        return Max()(data) - Min()(data)
+        return _np.nanmax(data.get_values(), axis=0) - _np.nanmin(data.get_values(), axis=0)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.nanmax(values, axis=1) - _np.nanmin(values, axis=1)
 
 
 class Median(_Indicator):
@@ -66,9 +89,23 @@ class Median(_Indicator):
     def __init__(self, **kwargs):
         _Indicator.__init__(self, **kwargs)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, data, params):
-        return _np.median(data.get_values())
+        values = data.get_derived('sorted')
+        n = len(values)
+        if n == 0:
+            return _np.median(values, axis=0)
+        median = (values[(n - 1) // 2] + values[n // 2]) / 2
+        # NaNs are sorted last: as with numpy.median, a channel with NaNs has NaN median
+        if values.ndim == 1:
+            return _np.nan if _np.isnan(values[-1]) else median
+        return _np.where(_np.isnan(values[-1]), _np.nan, median)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.median(values, axis=1)
 
 
 class StDev(_Indicator):
@@ -78,9 +115,15 @@ class StDev(_Indicator):
     def __init__(self, **kwargs):
         _Indicator.__init__(self, **kwargs)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, data, params):
-        return _np.nanstd(data.get_values())
+        return _np.nanstd(data.get_values(), axis=0)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.nanstd(values, axis=1)
 
 
 class Sum(_Indicator):
@@ -90,9 +133,15 @@ class Sum(_Indicator):
     def __init__(self, **kwargs):
         _Indicator.__init__(self, **kwargs)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, data, params):
-        return _np.nansum(data.get_values())
+        return _np.nansum(data.get_values(), axis=0)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.nansum(values, axis=1)
 
 
 class AUC(_Indicator):
@@ -102,12 +151,18 @@ class AUC(_Indicator):
     def __init__(self, **kwargs):
         _Indicator.__init__(self, **kwargs)
 
+    _multichannel = True
+
     @classmethod
     def algorithm(cls, signal, params):
         if isinstance(signal, _Signal) and not isinstance(signal, _EvenlySignal):
             cls.warn('Calculating Area Under the Curve of an Unevenly signal!')
         fsamp = signal.get_sampling_freq()
-        return (1. / fsamp) * Sum()(signal)
+        return (1. / fsamp) * _np.nansum(signal.get_values(), axis=0)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return (1. / meta['sampling_freq']) * _np.nansum(values, axis=1)
 
 
 class RMSSD(_Indicator):
@@ -119,8 +174,12 @@ class RMSSD(_Indicator):
 
     @classmethod
     def algorithm(cls, signal, params):
-        diff = _Diff()(signal)
-        return _np.sqrt(_np.mean(_np.power(diff.get_values(), 2)))
+        diff = signal.get_derived('diff')
+        return _np.sqrt(_np.mean(_np.power(diff, 2)))
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.sqrt(_np.mean(_np.power(_np.diff(values, axis=1), 2), axis=1))
 
 
 class SDSD(_Indicator):
@@ -132,8 +191,8 @@ class SDSD(_Indicator):
 
     @classmethod
     def algorithm(cls, signal, params):
-        diff = _Diff()(signal)
-        return StDev()(diff)
+        diff = signal.get_derived('diff')
+        return _np.nanstd(diff)
 
 # TODO: FIX Histogram missing
 class Triang(_Indicator):
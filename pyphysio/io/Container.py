@@ -0,0 +1,230 @@
+# coding=utf-8
+from __future__ import division
+import json as _json
+import struct as _struct
+import zlib as _zlib
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+import numpy as _np
+from ..Signal import Signal as _Signal, EvenlySignal as _EvenlySignal, UnevenlySignal as _UnevenlySignal, \
+    MultiEvenly as _MultiEvenly
+
+__author__ = 'AleB'
+
+# Binary container for Signals:
+#
+#     MAGIC | values chunks | x_values chunks (UnevenlySignal) | header (json) | header offset (uint64) | MAGIC
+#
+# Chunks hold 'chunk_len' samples of one channel each (zlib compressed, optionally byte-shuffled). If not
+# compressed, the values are stored as a single (samples x channels) block that can be memory-mapped.
+# The header holds the Signal metadata and the chunk index.
+
+_MAGIC = b'PHYC'
+_VERSION = 1
+_FOOTER = '<Q4s'
+_CLASSES = {'EvenlySignal': _EvenlySignal, 'UnevenlySignal': _UnevenlySignal, 'MultiEvenly': _MultiEvenly}
+# metadata set by the constructors
+_CONSTRUCTOR_KEYS = [_Signal._MT_SAMPLING_FREQ, _Signal._MT_START_TIME, _Signal._MT_NATURE,
+                     _UnevenlySignal._MT_X_INDICES, _UnevenlySignal._MT_DURATION]
+
+
+def _encode(value):
+    if isinstance(value, _np.ndarray):
+        return {'__array__': value.tolist(), 'dtype': value.dtype.str}
+    if isinstance(value, _np.generic):
+        return value.item()
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and '__array__' in value:
+        return _np.array(value['__array__'], dtype=value['dtype'])
+    return value
+
+
+def _compress(array, level, shuffle):
+    if shuffle and array.dtype.itemsize > 1:
+        # byte-transposition: the most significant bytes of neighbouring samples are similar
+        array = array.view(_np.uint8).reshape(-1, array.dtype.itemsize).T
+    return _zlib.compress(_np.ascontiguousarray(array).tobytes(), level)
+
+
+def _decompress(data, dtype, shuffle):
+    raw = _np.frombuffer(_zlib.decompress(data), dtype=_np.uint8)
+    if shuffle and dtype.itemsize > 1:
+        raw = raw.reshape(dtype.itemsize, -1).T.copy()
+    return raw.view(dtype).reshape(-1)
+
+
+def _write_region(f, array, chunk_len, compression, level, shuffle):
+    # array is 2D (samples x channels)
+    if compression is None:
+        offset = f.tell()
+        f.write(_np.ascontiguousarray(array).tobytes())
+        return {'offset': offset}
+    chunks = []
+    for i_ch in range(array.shape[1]):
+        ch_chunks = []
+        for i in range(0, array.shape[0], chunk_len):
+            data = _compress(_np.ascontiguousarray(array[i:i + chunk_len, i_ch]), level, shuffle)
+            ch_chunks.append([f.tell(), len(data)])
+            f.write(data)
+        chunks.append(ch_chunks)
+    return {'chunks': chunks}
+
+
+def save(signal, path, chunk_len=65536, compression='zlib', level=1, shuffle=True):
+    """
+    Saves a Signal (EvenlySignal, UnevenlySignal or MultiEvenly) into a container file.
+    :param signal: The Signal to save.
+    :param path: File system path to the file to write (create/overwrite).
+    :param chunk_len: Number of samples of each chunk.
+    :param compression: 'zlib' or None. Uncompressed files can be loaded memory-mapped.
+    :param level: zlib compression level.
+    :param shuffle: Whether to byte-shuffle the chunks before the compression (better ratio on numeric data).
+    """
+    assert compression in ['zlib', None], "compression should be 'zlib' or None"
+    assert chunk_len > 0, "chunk_len should be positive"
+    assert signal.__class__.__name__ in _CLASSES, "Unsupported signal class " + signal.__class__.__name__
+
+    values = signal.get_raw_values()
+    values_2d = values.reshape(len(values), -1)
+    header = {
+        'version': _VERSION,
+        'class': signal.__class__.__name__,
+        'n_samples': len(values),
+        'n_channels': values_2d.shape[1],
+        'dtype': values.dtype.str,
+        'chunk_len': int(chunk_len),
+        'compression': compression,
+        'shuffle': bool(shuffle),
+        'ph': dict((k, _encode(v)) for k, v in signal.ph.items() if k != _UnevenlySignal._MT_X_INDICES)
+    }
+
+    with open(path, 'wb') as f:
+        f.write(_MAGIC)
+        header['values'] = _write_region(f, values_2d, chunk_len, compression, level, shuffle)
+        if isinstance(signal, _UnevenlySignal):
+            x = _np.asarray(signal.get_indices(), dtype=_np.int64)
+            header['x_dtype'] = x.dtype.str
+            header['x_values'] = _write_region(f, x.reshape(-1, 1), chunk_len, compression, level, shuffle)
+            # time index of the chunks: first sample index of each chunk
+            header['x_chunk_first'] = x[::chunk_len].tolist()
+        header_offset = f.tell()
+        f.write(_json.dumps(header).encode('utf-8'))
+        f.write(_struct.pack(_FOOTER, header_offset, _MAGIC))
+
+
+def info(path):
+    """
+    Reads the header of a container file.
+    :param path: File system path to the container file.
+    :return: dict with the metadata and the chunk index.
+    """
+    with open(path, 'rb') as f:
+        assert f.read(len(_MAGIC)) == _MAGIC, "Not a pyphysio container file"
+        footer_offset = f.seek(-_struct.calcsize(_FOOTER), 2)
+        header_offset, magic = _struct.unpack(_FOOTER, f.read())
+        assert magic == _MAGIC, "Truncated container file"
+        f.seek(header_offset)
+        header = _json.loads(f.read(footer_offset - header_offset).decode('utf-8'))
+    return header
+
+
+def _read_region(path, header, region, dtype, n_channels, i_start, i_stop, channels, mmap, n_workers):
+    if i_stop <= i_start:
+        return _np.empty((0, n_channels if channels is None else len(channels)), dtype=dtype)
+    if header['compression'] is None:
+        values = _np.memmap(path, dtype=dtype, mode='r', offset=region['offset'],
+                            shape=(header['n_samples'], n_channels))
+        values = values[i_start:i_stop]
+        if channels is not None:
+            values = values[:, channels]
+        return values if mmap else _np.array(values)
+
+    chunk_len = header['chunk_len']
+    c_start, c_stop = i_start // chunk_len, (i_stop - 1) // chunk_len + 1
+    channels = range(n_channels) if channels is None else channels
+    jobs = [(i_ch, c) for i_ch in channels for c in range(c_start, c_stop)]
+
+    with open(path, 'rb') as f:
+        blobs = []
+        for i_ch, c in jobs:
+            offset, size = region['chunks'][i_ch][c]
+            f.seek(offset)
+            blobs.append(f.read(size))
+
+    def decode(blob):
+        return _decompress(blob, dtype, header['shuffle'])
+
+    # zlib releases the GIL: the chunks are decompressed in parallel
+    if n_workers is not None and n_workers > 1 and len(blobs) > 1:
+        with _ThreadPoolExecutor(n_workers) as pool:
+            decoded = list(pool.map(decode, blobs))
+    else:
+        decoded = [decode(b) for b in blobs]
+
+    out = _np.empty((i_stop - i_start, len(channels)), dtype=dtype, order='F')
+    n_chunks = c_stop - c_start
+    for j in range(len(channels)):
+        column = _np.concatenate(decoded[j * n_chunks:(j + 1) * n_chunks])
+        out[:, j] = column[i_start - c_start * chunk_len:i_stop - c_start * chunk_len]
+    return out
+
+
+def load(path, t_start=None, t_stop=None, channels=None, mmap=False, n_workers=None):
+    """
+    Loads a Signal, or a portion of it, from a container file. Only the chunks of the requested portion
+    and channels are read.
+    :param path: File system path to the container file.
+    :param t_start: The instant of the start of the portion. By default is the start of the signal.
+    :param t_stop: The instant of the end of the portion. By default is the end of the signal.
+    :param channels: List of the channels to load (MultiEvenly). By default all the channels.
+    :param mmap: Whether to memory-map the values instead of reading them (uncompressed files only).
+    :param n_workers: Number of threads used to decompress the chunks.
+    :return: The Signal (portion)
+    """
+    header = info(path)
+    assert not mmap or header['compression'] is None, "Only uncompressed containers can be memory-mapped"
+    ph = dict((k, _decode(v)) for k, v in header['ph'].items())
+    cls = _CLASSES[header['class']]
+    dtype = _np.dtype(header['dtype'])
+    fsamp = ph[_Signal._MT_SAMPLING_FREQ]
+    start_time = ph[_Signal._MT_START_TIME]
+    n = header['n_samples']
+
+    def idx(time):
+        return max(int((time - start_time) * fsamp), 0)
+
+    if cls is _UnevenlySignal:
+        # chunks overlapping the requested portion, then exact segmentation as in UnevenlySignal.segment_time
+        x_first = _np.array(header['x_chunk_first'], dtype=_np.int64)
+        c_start = 0 if t_start is None else max(int(_np.searchsorted(x_first, idx(t_start), side='right')) - 1, 0)
+        c_stop = len(x_first) if t_stop is None else max(int(_np.searchsorted(x_first, idx(t_stop))), c_start + 1)
+        i_start, i_stop = c_start * header['chunk_len'], min(c_stop * header['chunk_len'], n)
+        x_values = _read_region(path, header, header['x_values'], _np.dtype(header['x_dtype']), 1, i_start, i_stop,
+                                None, mmap, n_workers)[:, 0]
+        values = _read_region(path, header, header['values'], dtype, 1, i_start, i_stop, None, mmap, n_workers)
+        signal = _UnevenlySignal(values[:, 0], fsamp, start_time, ph[_Signal._MT_NATURE], x_values, 'indices',
+                                 ph[_UnevenlySignal._MT_DURATION])
+        if t_start is not None or t_stop is not None:
+            signal = signal.segment_time(t_start if t_start is not None else start_time, t_stop)
+    else:
+        i_start = 0 if t_start is None else min(idx(t_start), n)
+        i_stop = n if t_stop is None else min(max(idx(t_stop), i_start), n)
+        values = _read_region(path, header, header['values'], dtype, header['n_channels'], i_start, i_stop,
+                              channels, mmap, n_workers)
+        if values.shape[1] == 1 and (cls is _EvenlySignal or channels is not None):
+            signal = _EvenlySignal(values[:, 0], fsamp, start_time + i_start / fsamp, ph[_Signal._MT_NATURE])
+        else:
+            signal = _MultiEvenly(values, fsamp, start_time + i_start / fsamp, ph[_Signal._MT_NATURE])
+
+    for k, v in ph.items():
+        if k not in _CONSTRUCTOR_KEYS:
+            signal.ph[k] = v
+    if channels is not None and signal.is_scaled() and signal.get_scale().ndim > 0:
+        scale = signal.get_scale()[channels]
+        offset = _np.broadcast_to(signal.get_offset(), signal.get_scale().shape)[channels]
+        if not signal.is_multi():
+            scale, offset = scale[0], offset[0]
+        signal.set_scaling(scale, offset)
+    return signal
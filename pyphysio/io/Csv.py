@@ -0,0 +1,116 @@
+# coding=utf-8
+from __future__ import division
+import io as _io
+import warnings as _warnings
+import numpy as _np
+from ..Signal import EvenlySignal as _EvenlySignal, MultiEvenly as _MultiEvenly
+from ..Utility import float_dtype as _float_dtype
+
+__author__ = 'AleB'
+
+# columns written by the to_csv methods that are not signal values
+_INDEX_COLUMNS = ['idx', 'time']
+
+
+def _is_data(line, delimiter):
+    try:
+        [float(x) for x in line.split(delimiter)]
+        return True
+    except ValueError:
+        return False
+
+
+def _parse_block(text, delimiter, n_columns, comments):
+    text = text.replace('\r', '')
+    if comments and comments in text:
+        text = '\n'.join(line for line in text.split('\n') if not line.startswith(comments))
+    text = text.strip('\n')
+    if len(text) == 0:
+        return _np.empty((0, n_columns))
+    n_rows = text.count('\n') + 1
+    with _warnings.catch_warnings():
+        _warnings.simplefilter('ignore')
+        # C parser: the rows are joined into a single delimited sequence
+        values = _np.fromstring(text.replace('\n', delimiter), sep=delimiter)
+    if values.size != n_rows * n_columns:
+        # missing values or blank lines: slower but tolerant parser
+        values = _np.genfromtxt(_io.StringIO(text), delimiter=delimiter)
+    return values.reshape(-1, n_columns)
+
+
+def from_csv(path, sampling_freq=None, columns=None, start_time=None, signal_type=None, delimiter=',',
+             chunk_bytes=2 ** 24, comments='#'):
+    """
+    Loads an evenly sampled signal from a CSV file, parsing it in chunks. The header lines (those that are not
+    all numbers) are detected and skipped; the header written by to_csv provides signal type, sampling frequency,
+    column names and start time. The comment lines (starting with comments) are skipped anywhere in the file.
+    :param path: File system path to the CSV file.
+    :param sampling_freq: Sampling frequency. By default the one in the header.
+    :param columns: Column (index or name) or list of columns of the values. By default all the columns except
+    'idx' and 'time'.
+    :param start_time: Instant of the first sample. By default the first value of the 'time' column, or 0.
+    :param signal_type: Type of signal. By default the one in the header.
+    :param delimiter: Separator of the values.
+    :param chunk_bytes: Size of the text blocks parsed at once: bounds the memory used besides the result.
+    :param comments: Prefix of the comment lines, None if the file has no comments.
+    :return: EvenlySignal, MultiEvenly if more than one column is selected.
+    """
+    with open(path, 'rb') as f:
+        header = []
+        first_row = None
+        while True:
+            pos = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            line = line.decode('latin-1').rstrip('\r\n')
+            if comments and line.startswith(comments):
+                continue
+            if _is_data(line, delimiter):
+                first_row = [float(x) for x in line.split(delimiter)]
+                f.seek(pos)
+                break
+            header.append(line)
+
+        n_columns = len(first_row) if first_row is not None else 0
+        names = header[-1].split(delimiter) if len(header) > 0 else []
+        names = [x.strip() for x in names] if len(names) == n_columns else []
+        for i, line in enumerate(header):
+            if line.startswith('Fsamp:'):
+                if sampling_freq is None:
+                    sampling_freq = float(line[len('Fsamp:'):])
+                if signal_type is None and i > 0:
+                    signal_type = header[i - 1].strip()
+        assert sampling_freq is not None, "sampling_freq was not given and it was not found in the header"
+
+        if columns is None:
+            columns = [i for i in range(n_columns) if len(names) == 0 or names[i] not in _INDEX_COLUMNS]
+        elif not isinstance(columns, list):
+            columns = [columns]
+        columns = [names.index(c) if isinstance(c, str) else c for c in columns]
+        assert len(columns) > 0, "No columns to load"
+        if start_time is None and 'time' in names:
+            start_time = first_row[names.index('time')]
+
+        parts = []
+        rest = b''
+        while n_columns > 0:
+            data = f.read(chunk_bytes)
+            if data:
+                data = rest + data
+                cut = data.rfind(b'\n') + 1
+                block, rest = data[:cut], data[cut:]
+            else:
+                block, rest = rest, b''
+            if len(block) > 0:
+                # only the selected columns of each chunk are retained
+                parts.append(_parse_block(block.decode('latin-1'), delimiter, n_columns, comments)[:, columns])
+            if not data and len(rest) == 0:
+                break
+
+    values = _np.concatenate(parts) if len(parts) > 0 else _np.empty((0, len(columns)))
+    values = values.astype(_float_dtype(), copy=False)
+    signal_type = signal_type if signal_type is not None else ""
+    if values.shape[1] == 1:
+        return _EvenlySignal(values[:, 0], sampling_freq, start_time, signal_type)
+    return _MultiEvenly(values, sampling_freq, start_time, signal_type)
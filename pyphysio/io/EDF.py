@@ -0,0 +1,207 @@
+# coding=utf-8
+from __future__ import division
+import datetime as _datetime
+import os as _os
+import numpy as _np
+from ..Signal import EvenlySignal as _EvenlySignal, MultiEvenly as _MultiEvenly, UnevenlySignal as _UnevenlySignal
+from ..Utility import PhUI as _PhUI
+
+__author__ = 'AleB'
+
+_ANNOTATIONS_LABEL = 'EDF Annotations'
+# (name, width) of the fields of the fixed and of the per-signal header
+_HEADER_FIELDS = [('version', 8), ('patient', 80), ('recording', 80), ('start_date', 8), ('start_time', 8),
+                  ('header_bytes', 8), ('reserved', 44), ('n_records', 8), ('record_duration', 8), ('n_signals', 4)]
+_SIGNAL_FIELDS = [('label', 16), ('transducer', 80), ('physical_dimension', 8), ('physical_min', 8),
+                  ('physical_max', 8), ('digital_min', 8), ('digital_max', 8), ('prefiltering', 80),
+                  ('n_samples', 8), ('reserved', 32)]
+
+
+class EDFReader(object):
+    """
+    Reader of EDF and EDF+ files. The data records are memory-mapped: only the requested channels and time spans
+    are decoded. Values are kept as the stored 16 bit integers, with the scale and offset that convert them to
+    physical units (see Signal.set_scaling).
+
+    Parameters
+    ----------
+    path : str
+        File system path to the EDF file
+
+    Notes
+    -----
+    Discontinuous EDF+ files (EDF+D) are read as if the records were contiguous.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = dict((name, f.read(width).decode('latin-1').strip()) for name, width in _HEADER_FIELDS)
+            n_signals = int(header['n_signals'])
+            signals = dict((name, [f.read(width).decode('latin-1').strip() for _ in range(n_signals)])
+                           for name, width in _SIGNAL_FIELDS)
+
+        self._path = path
+        self._header = header
+        self._labels = signals['label']
+        self._dimensions = signals['physical_dimension']
+        self._record_duration = float(header['record_duration'])
+        self._n_samples = _np.array(signals['n_samples'], dtype=int)
+        self._offsets = _np.concatenate([[0], _np.cumsum(self._n_samples)])
+        record_len = int(self._offsets[-1])
+        header_bytes = int(header['header_bytes'])
+        n_records = int(header['n_records'])
+        if n_records < 0:
+            # unknown while recording
+            n_records = (_os.path.getsize(path) - header_bytes) // (2 * record_len)
+
+        p_min, p_max = [_np.array(signals[k], dtype=float) for k in ['physical_min', 'physical_max']]
+        d_min, d_max = [_np.array(signals[k], dtype=float) for k in ['digital_min', 'digital_max']]
+        self._scale = (p_max - p_min) / (d_max - d_min)
+        self._offset = p_min - d_min * self._scale
+        if header['reserved'].startswith('EDF+D'):
+            _PhUI.w("EDF+D file: the records are read as contiguous")
+
+        self._records = _np.memmap(path, dtype='<i2', mode='r', offset=header_bytes, shape=(n_records, record_len))
+
+    def get_labels(self):
+        """
+        Returns the labels of the channels (including the annotation channels).
+        """
+        return list(self._labels)
+
+    def get_sampling_freq(self, channel):
+        return self._n_samples[self._index(channel)] / self._record_duration
+
+    def get_physical_dimension(self, channel):
+        return self._dimensions[self._index(channel)]
+
+    def get_duration(self):
+        return self._records.shape[0] * self._record_duration
+
+    def get_start_datetime(self):
+        """
+        Returns the date and time of the start of the recording (instant 0 of the signals).
+        """
+        day, month, year = [int(x) for x in self._header['start_date'].split('.')]
+        hours, minutes, seconds = [int(x) for x in self._header['start_time'].split('.')]
+        # EDF clipping date: years 85-99 are 1985-1999
+        year += 1900 if year >= 85 else 2000
+        return _datetime.datetime(year, month, day, hours, minutes, seconds)
+
+    def _index(self, channel):
+        return self._labels.index(channel) if isinstance(channel, str) else int(channel)
+
+    def read(self, channels=None, t_start=None, t_stop=None):
+        """
+        Decodes the given channels in the given time span. Channels with the same sampling frequency are
+        grouped in a MultiEvenly, whose channel labels are in signal.ph['channels'].
+
+        Parameters
+        ----------
+        channels : list, optional
+            Labels or indices of the channels. By default all the channels except the annotations.
+        t_start : float, optional
+            The instant of the start of the span. By default is the start of the recording.
+        t_stop : float, optional
+            The instant of the end of the span. By default is the end of the recording.
+
+        Returns
+        -------
+        signals : list
+            One EvenlySignal (single channel) or MultiEvenly per sampling frequency
+        """
+        if channels is None:
+            channels = [i for i, label in enumerate(self._labels) if label != _ANNOTATIONS_LABEL]
+        channels = [self._index(c) for c in channels]
+        t_start = 0 if t_start is None else max(t_start, 0)
+        t_stop = self.get_duration() if t_stop is None else min(t_stop, self.get_duration())
+
+        groups = []
+        for i in channels:
+            group = [g for g in groups if self._n_samples[g[0]] == self._n_samples[i]]
+            if len(group) > 0:
+                group[0].append(i)
+            else:
+                groups.append([i])
+        return [self._read_group(group, t_start, t_stop) for group in groups]
+
+    def _read_group(self, group, t_start, t_stop):
+        n_rec = int(self._n_samples[group[0]])
+        fsamp = n_rec / self._record_duration
+        i_start = int(t_start * fsamp)
+        i_stop = max(int(t_stop * fsamp), i_start)
+        r_start, r_stop = i_start // n_rec, -(-i_stop // n_rec)
+
+        # records interleave the channels: each channel is copied once into a (samples x channels) block
+        values = _np.empty(((r_stop - r_start) * n_rec, len(group)), dtype='<i2')
+        blocks = values.reshape(r_stop - r_start, n_rec, len(group))
+        for j, i in enumerate(group):
+            blocks[:, :, j] = self._records[r_start:r_stop, self._offsets[i]:self._offsets[i + 1]]
+        values = values[i_start - r_start * n_rec:i_stop - r_start * n_rec]
+
+        labels = [self._labels[i] for i in group]
+        if len(group) == 1:
+            signal = _EvenlySignal(values[:, 0], fsamp, i_start / fsamp, labels[0])
+            signal.set_scaling(self._scale[group[0]], self._offset[group[0]])
+        else:
+            signal = _MultiEvenly(values, fsamp, i_start / fsamp, "")
+            signal.set_scaling(self._scale[group], self._offset[group])
+        signal.ph['channels'] = labels
+        return signal
+
+    def get_annotations(self, sampling_freq=None):
+        """
+        Decodes the EDF+ annotations into a label signal, usable with LabelSegments. The label of an annotation
+        starts at its onset; annotations with a duration are followed by an empty label at their end.
+
+        Parameters
+        ----------
+        sampling_freq : float, optional
+            Sampling frequency of the label signal. By default the highest one of the channels.
+
+        Returns
+        -------
+        labels : UnevenlySignal
+            The label signal (None if the file has no annotations)
+        """
+        channels = [i for i, label in enumerate(self._labels) if label == _ANNOTATIONS_LABEL]
+        if len(channels) == 0:
+            return None
+        if sampling_freq is None:
+            sampling_freq = _np.max(self._n_samples[[i for i in range(len(self._labels)) if i not in channels]],
+                                    initial=1) / self._record_duration
+
+        events = []
+        for i in channels:
+            texts = _np.ascontiguousarray(self._records[:, self._offsets[i]:self._offsets[i + 1]])
+            for record in texts:
+                events.extend(self._parse_tals(record.tobytes()))
+
+        duration = self.get_duration()
+        labels = {}
+        for onset, length, text in sorted(events, key=lambda e: e[0]):
+            labels[int(round(onset * sampling_freq))] = text
+            if length is not None and onset + length < duration:
+                labels.setdefault(int(round((onset + length) * sampling_freq)), '')
+        idxs = sorted(labels.keys())
+        if len(idxs) > 0:
+            duration = max(duration, (idxs[-1] + 1) / sampling_freq)
+        return _UnevenlySignal(_np.array([labels[i] for i in idxs]), sampling_freq, 0, _ANNOTATIONS_LABEL,
+                               _np.array(idxs, dtype=int), 'indices', duration)
+
+    @staticmethod
+    def _parse_tals(record):
+        # Time-stamped Annotation Lists: +onset[\x15duration]\x14text\x14[text\x14...]\x00
+        events = []
+        for tal in record.split(b'\x00'):
+            fields = tal.split(b'\x14')
+            if len(fields) < 2:
+                continue
+            timing = fields[0].split(b'\x15')
+            onset = float(timing[0])
+            length = float(timing[1]) if len(timing) > 1 and len(timing[1]) > 0 else None
+            for text in fields[1:]:
+                # the first TAL of each record (time keeping) has no text
+                if len(text) > 0:
+                    events.append((onset, length, text.decode('utf-8')))
+        return events
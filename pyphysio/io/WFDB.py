@@ -0,0 +1,266 @@
+# coding=utf-8
+from __future__ import division
+import os as _os
+import re as _re
+import numpy as _np
+from ..Signal import EvenlySignal as _EvenlySignal, MultiEvenly as _MultiEvenly, UnevenlySignal as _UnevenlySignal
+
+__author__ = 'AleB'
+
+# sample format -> (numpy type of the decoded values, bytes per sample); 212 packs two samples in three bytes
+_FORMATS = {16: ('<i2', 2), 61: ('>i2', 2), 80: ('u1', 1), 24: (None, 3), 32: ('<i4', 4), 212: (None, None)}
+_RE_FORMAT = _re.compile(r'(\d+)(?:x(\d+))?(?::(\d+))?(?:\+(\d+))?$')
+_RE_GAIN = _re.compile(r'([-+\d.eE]+)(?:\(([-+\d]+)\))?(?:/(.*))?$')
+_DEFAULT_GAIN = 200
+
+# annotation codes (WFDB ecgcodes.h)
+_SYMBOLS = {1: 'N', 2: 'L', 3: 'R', 4: 'a', 5: 'V', 6: 'F', 7: 'J', 8: 'A', 9: 'S', 10: 'E', 11: 'j', 12: '/',
+            13: 'Q', 14: '~', 16: '|', 18: 's', 19: 'T', 20: '*', 21: 'D', 22: '"', 23: '=', 24: 'p', 25: 'B',
+            26: '^', 27: 't', 28: '+', 29: 'u', 30: '?', 31: '!', 32: '[', 33: ']', 34: 'e', 35: 'n', 36: '@',
+            37: 'x', 38: 'f', 39: '(', 40: ')', 41: 'r'}
+_BEATS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 25, 34, 35, 38, 41]
+_RHYTHM = 28
+_SKIP, _NUM, _SUB, _CHN, _AUX = 59, 60, 61, 62, 63
+
+
+class WFDBRecord(object):
+    """
+    Reader of WFDB records (.hea header, .dat signal files, annotation files). The signal files are
+    memory-mapped and only the requested channels and time spans are decoded. Values are kept as the stored
+    integers, with the scale and offset that convert them to physical units (see Signal.set_scaling).
+    Supported sample formats: 16, 61, 80, 24, 32 and 212. Multi-segment records and multi-frequency signal
+    files are not supported.
+
+    Parameters
+    ----------
+    path : str
+        File system path to the record, without extension (e.g. 'mitdb/100')
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._dir = _os.path.dirname(path)
+        with open(path + '.hea', 'r') as f:
+            lines = [line.strip() for line in f if len(line.strip()) > 0 and not line.startswith('#')]
+
+        record = lines[0].split()
+        assert '/' not in record[0], "Multi-segment records are not supported"
+        n_signals = int(record[1])
+        self._fsamp = float(_re.split(r'[/(]', record[2])[0]) if len(record) > 2 else 250.
+        n_samples = int(record[3]) if len(record) > 3 else None
+
+        self._labels, self._files, self._formats = [], [], []
+        self._scale, self._offset, self._units = [], [], []
+        self._byte_offsets = {}
+        for i, line in enumerate(lines[1:1 + n_signals]):
+            fields = line.split(None, 8)
+            fmt, spf, _, byte_offset = _RE_FORMAT.match(fields[1]).groups()
+            fmt = int(fmt)
+            assert fmt in _FORMATS, "Unsupported sample format %d" % fmt
+            assert spf is None or int(spf) == 1, "Multi-frequency signal files are not supported"
+            gain, baseline, units = (None, None, None) if len(fields) < 3 else _RE_GAIN.match(fields[2]).groups()
+            gain = float(gain) if gain is not None and float(gain) != 0 else _DEFAULT_GAIN
+            adc_zero = int(fields[4]) if len(fields) > 4 else 0
+            baseline = int(baseline) if baseline is not None else adc_zero
+
+            self._files.append(fields[0])
+            self._formats.append(fmt)
+            self._byte_offsets.setdefault(fields[0], int(byte_offset) if byte_offset is not None else 0)
+            self._scale.append(1. / gain)
+            self._offset.append(-baseline / gain)
+            self._units.append(units if units is not None else 'mV')
+            self._labels.append(fields[8] if len(fields) > 8 else 'ch%d' % i)
+        self._scale, self._offset = _np.array(self._scale), _np.array(self._offset)
+
+        self._maps = {}
+        if n_samples is None and n_signals > 0:
+            n_samples = self._file_len(self._files[0])
+        self._n_samples = n_samples if n_samples is not None else 0
+
+    def get_labels(self):
+        return list(self._labels)
+
+    def get_sampling_freq(self):
+        return self._fsamp
+
+    def get_units(self, channel):
+        return self._units[self._index(channel)]
+
+    def get_duration(self):
+        return self._n_samples / self._fsamp
+
+    def __len__(self):
+        return self._n_samples
+
+    def _index(self, channel):
+        return self._labels.index(channel) if isinstance(channel, str) else int(channel)
+
+    def _file_signals(self, name):
+        return [i for i, f in enumerate(self._files) if f == name]
+
+    def _file_len(self, name):
+        fmt = self._formats[self._file_signals(name)[0]]
+        n_bytes = _os.path.getsize(_os.path.join(self._dir, name)) - self._byte_offsets[name]
+        n_values = n_bytes * 2 // 3 if fmt == 212 else n_bytes // _FORMATS[fmt][1]
+        return n_values // len(self._file_signals(name))
+
+    def _map(self, name):
+        if name not in self._maps:
+            self._maps[name] = _np.memmap(_os.path.join(self._dir, name), dtype='u1', mode='r',
+                                          offset=self._byte_offsets[name])
+        return self._maps[name]
+
+    def _decode(self, name, i_start, i_stop):
+        # decodes the frames [i_start, i_stop) of a signal file: (samples x signals of the file)
+        n_sig = len(self._file_signals(name))
+        fmt = self._formats[self._file_signals(name)[0]]
+        raw = self._map(name)
+        v_start, v_stop = i_start * n_sig, i_stop * n_sig
+        if fmt == 212:
+            g_start, g_stop = v_start // 2, -(-v_stop // 2)
+            b = _np.zeros((g_stop - g_start, 3), dtype=_np.int16)
+            packed = raw[3 * g_start:3 * g_stop]
+            b.reshape(-1)[:len(packed)] = packed
+            values = _np.empty(2 * len(b), dtype=_np.int16)
+            values[0::2] = b[:, 0] | ((b[:, 1] & 0x0F) << 8)
+            values[1::2] = b[:, 2] | ((b[:, 1] & 0xF0) << 4)
+            values[values >= 2048] -= 4096
+            values = values[v_start - 2 * g_start:v_stop - 2 * g_start]
+        elif fmt == 24:
+            b = raw[3 * v_start:3 * v_stop].reshape(-1, 3).astype(_np.int32)
+            values = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+            values = (values ^ 0x800000) - 0x800000
+        elif fmt == 80:
+            values = raw[v_start:v_stop].astype(_np.int16) - 128
+        else:
+            dtype, width = _FORMATS[fmt]
+            raw = raw[width * v_start:width * v_stop]
+            values = raw[:len(raw) // width * width].view(dtype)
+        return values[:len(values) // n_sig * n_sig].reshape(-1, n_sig)
+
+    def read(self, channels=None, t_start=None, t_stop=None):
+        """
+        Decodes the given channels in the given time span.
+
+        Parameters
+        ----------
+        channels : list, optional
+            Labels or indices of the channels. By default all the channels.
+        t_start : float, optional
+            The instant of the start of the span. By default is the start of the record.
+        t_stop : float, optional
+            The instant of the end of the span. By default is the end of the record.
+
+        Returns
+        -------
+        signal : EvenlySignal or MultiEvenly
+            The span, whose channel labels are in signal.ph['channels']
+        """
+        channels = range(len(self._labels)) if channels is None else channels
+        channels = [self._index(c) for c in channels]
+        assert len(channels) > 0, "No channels to read"
+        i_start = 0 if t_start is None else min(max(int(t_start * self._fsamp), 0), len(self))
+        i_stop = len(self) if t_stop is None else min(max(int(t_stop * self._fsamp), i_start), len(self))
+
+        dtype = _np.int32 if any(self._formats[i] in [24, 32] for i in channels) else _np.int16
+        values = _np.empty((i_stop - i_start, len(channels)), dtype=dtype, order='F')
+        n_read = i_stop - i_start
+        for name in set(self._files[i] for i in channels):
+            decoded = self._decode(name, i_start, i_stop)
+            in_file = self._file_signals(name)
+            for j, i in enumerate(channels):
+                if self._files[i] == name:
+                    values[:len(decoded), j] = decoded[:, in_file.index(i)]
+            # truncated signal file
+            n_read = min(n_read, len(decoded))
+        values = values[:n_read]
+
+        labels = [self._labels[i] for i in channels]
+        if len(channels) == 1:
+            signal = _EvenlySignal(values[:, 0], self._fsamp, i_start / self._fsamp, labels[0])
+            signal.set_scaling(self._scale[channels[0]], self._offset[channels[0]])
+        else:
+            signal = _MultiEvenly(values, self._fsamp, i_start / self._fsamp, "")
+            signal.set_scaling(self._scale[channels], self._offset[channels])
+        signal.ph['channels'] = labels
+        return signal
+
+    def _read_annotations(self, extension):
+        words = _np.fromfile(self._path + '.' + extension, dtype='<u2')
+        samples, codes, aux = [], [], []
+        i, sample = 0, 0
+        while i < len(words):
+            code, value = int(words[i]) >> 10, int(words[i]) & 0x3FF
+            i += 1
+            if code == 0 and value == 0:
+                break
+            if code == _SKIP:
+                # 32 bit interval, most significant word first
+                interval = (int(words[i]) << 16) | int(words[i + 1])
+                sample += interval - (1 << 32) if interval >= 1 << 31 else interval
+                i += 2
+            elif code == _AUX:
+                if len(aux) > 0:
+                    aux[-1] = words[i:i + (value + 1) // 2].tobytes()[:value].decode('latin-1').rstrip('\x00')
+                i += (value + 1) // 2
+            elif code not in [_NUM, _SUB, _CHN]:
+                sample += value
+                samples.append(sample)
+                codes.append(code)
+                aux.append(None)
+        return _np.array(samples, dtype=int), _np.array(codes, dtype=int), aux
+
+    def read_annotations(self, extension='atr'):
+        """
+        Loads an annotation file into a label signal, usable with LabelSegments. The labels are the annotation
+        symbols (e.g. 'N', 'V'), or the auxiliary text for rhythm annotations (e.g. '(AFIB').
+
+        Parameters
+        ----------
+        extension : str, default='atr'
+            Extension of the annotation file
+
+        Returns
+        -------
+        labels : UnevenlySignal
+            The label signal
+        """
+        samples, codes, aux = self._read_annotations(extension)
+        labels = {}
+        for sample, code, text in zip(samples, codes, aux):
+            labels[sample] = text if code == _RHYTHM and text is not None else _SYMBOLS.get(code, '')
+        idxs = sorted(labels.keys())
+        return _UnevenlySignal(_np.array([labels[i] for i in idxs]), self._fsamp, 0, extension,
+                               _np.array(idxs, dtype=int), 'indices',
+                               max(self.get_duration(), (idxs[-1] + 1) / self._fsamp if len(idxs) > 0 else 0))
+
+    def read_beats(self, extension='atr'):
+        """
+        Loads the beat annotations as an IBI signal, as the one computed by BeatFromECG. The annotation symbols
+        are in signal.ph['symbols'].
+
+        Parameters
+        ----------
+        extension : str, default='atr'
+            Extension of the annotation file
+
+        Returns
+        -------
+        ibi : UnevenlySignal
+            The IBI signal at the beat indices
+        """
+        samples, codes, _ = self._read_annotations(extension)
+        is_beat = _np.isin(codes, _BEATS)
+        idx_beats, codes = samples[is_beat], codes[is_beat]
+        ibi_values = _np.diff(idx_beats) / self._fsamp
+        ibi_values = _np.r_[ibi_values[0], ibi_values] if len(ibi_values) > 0 else _np.ones(len(idx_beats))
+        ibi = _UnevenlySignal(values=ibi_values,
+                              sampling_freq=self._fsamp,
+                              start_time=0,
+                              signal_type='IBI',
+                              x_values=idx_beats,
+                              x_type='indices',
+                              duration=max(self.get_duration(), (idx_beats[-1] + 1) / self._fsamp
+                                           if len(idx_beats) > 0 else 0))
+        ibi.ph['symbols'] = [_SYMBOLS[c] for c in codes]
+        return ibi
@@ -3,7 +3,6 @@ import numpy as _np
 
 from ..BaseIndicator import Indicator as _Indicator
 from ..indicators.FrequencyDomain import PowerInBand as _PowerInBand
-import scipy.stats as _sps
 from ..filters.Filters import ImputeNAN as _ImputeNAN
 
 __author__ = 'AleB'
@@ -18,22 +17,58 @@ class Kurtosis(_Indicator):
 
     @classmethod
     def algorithm(cls, data, params):
-        k = _sps.kurtosis(data.get_values())
+        from scipy.stats import kurtosis as _kurtosis
+        k = _kurtosis(data.get_values())
         return(k)
 
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        from scipy.stats import kurtosis as _kurtosis
+        return _kurtosis(values, axis=1)
+
+
+def _histograms(values, nbins):
+    # counts of the values of each row (windows x samples) in nbins equal-width bins between the minimum and the
+    # maximum of the row, as numpy.histogram
+    v_min, v_max = values.min(axis=1), values.max(axis=1)
+    if not (_np.isfinite(v_min).all() and _np.isfinite(v_max).all()):
+        raise ValueError("autodetected range of the values is not finite")
+    n_win = values.shape[0]
+    flat = v_min == v_max
+    v_min, v_max = _np.where(flat, v_min - 0.5, v_min), _np.where(flat, v_max + 0.5, v_max)
+    edges = _np.linspace(v_min, v_max, nbins + 1, axis=1)
+    idx = ((values - v_min[:, None]) * (nbins / (v_max - v_min))[:, None]).astype(int)
+    idx[idx == nbins] -= 1
+    rows = _np.arange(n_win)[:, None]
+    # corrections of the rounding near the edges
+    idx[values < edges[rows, idx]] -= 1
+    idx[(values >= edges[rows, idx + 1]) & (idx != nbins - 1)] += 1
+    return _np.bincount((idx + rows * nbins).ravel(), minlength=n_win * nbins).reshape(n_win, nbins)
+
+
 class Entropy(_Indicator):
     def __init__(self, nbins=25, **kwargs):
         _Indicator.__init__(self, nbins=nbins, **kwargs)
     
     @classmethod
     def algorithm(cls, data, params):
+        from scipy.stats import entropy as _entropy
         if _np.isnan(data).all():
             return(_np.nan)
         nbins=params['nbins']
-        p_data = _np.histogram(data.get_values(), bins=nbins)[0]/len(data) # calculates the probabilities
-        entropy = _sps.entropy(p_data)  # input probabilities to get the entropy 
+        p_data = _histograms(data.get_values()[None, :], nbins)[0]/len(data) # calculates the probabilities
+        entropy = _entropy(p_data)  # input probabilities to get the entropy 
         return(entropy)
 
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        if _np.isnan(values).any():
+            # not all-NaN windows are rejected by the binning: processed one at a time
+            return None
+        counts = _histograms(values, params['nbins'])
+        p_data = counts / counts.sum(axis=1, keepdims=True)
+        return -_np.sum(p_data * _np.log(_np.where(p_data > 0, p_data, 1)), axis=1)
+
 class DerivativeEnergy(_Indicator):
     """
     Compute the Derivative Energy
@@ -47,6 +82,10 @@ class DerivativeEnergy(_Indicator):
         x = data.get_values()
         de = _np.sqrt(_np.nanmean(_np.power(_np.diff(x), 2)))
         return(de)
+
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.sqrt(_np.nanmean(_np.power(_np.diff(values, axis=1), 2), axis=1))
         
 class SpectralPowerRatio(_Indicator):
     """
@@ -82,6 +121,10 @@ class CVSignal(_Indicator):
         cv = sd/mean
         return(cv)
 
+    @classmethod
+    def algorithm_batch(cls, values, meta, params):
+        return _np.nanstd(values, axis=1) / _np.nanmean(values, axis=1)
+
 class PercentageNAN(_Indicator):
     """
     Compute the Percentage of NaNs
@@ -0,0 +1,99 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, np
+from pyphysio import _window_stack
+
+__author__ = 'aleb'
+
+
+class BatchTest(unittest.TestCase):
+    def test_window_stack(self):
+        s = ph.EvenlySignal(np.arange(100.), 10)
+        windows, n = _window_stack(list(ph.FixedSegments(step=1, width=2)(s)), s)
+        self.assertEqual(windows.shape, (n, 20))
+        np.testing.assert_array_equal(windows[3], np.arange(30, 50))
+        # view, no copy
+        self.assertTrue(np.shares_memory(windows, s))
+        self.assertFalse(windows.flags.writeable)
+
+        # shorter last segment: not in the stack
+        segments = list(ph.FixedSegments(step=3, width=4, drop_cut=False)(s))
+        windows, n = _window_stack(segments, s)
+        self.assertEqual(n, len(segments) - 1)
+
+        # equally spaced prefix only
+        segments = [ph.Segment(0, 1, None), ph.Segment(2, 3, None), ph.Segment(3, 4, None)]
+        self.assertEqual(_window_stack(segments, s)[1], 2)
+        segments = [ph.Segment(0, 1, None), ph.Segment(2, 3.5, None)]
+        self.assertEqual(_window_stack(segments, s)[1], 0)
+
+    def test_open_segments(self):
+        s = ph.EvenlySignal(np.arange(100.), 10)
+        segments = [ph.Segment(0, 5), ph.Segment(5, None)]
+        self.assertEqual(_window_stack(segments, s)[1], 2)
+        values, _ = ph.fmap(segments, [ph.Mean(), ph.PNNx(threshold=10)], s)
+        np.testing.assert_allclose(values[:, 3].astype(float), [24.5, 74.5])
+        # the open segment is not the same length as the first: not stacked
+        segments = [ph.Segment(0, 4), ph.Segment(5, None)]
+        self.assertEqual(_window_stack(segments, s)[1], 0)
+        values, _ = ph.fmap(segments, [ph.Mean()], s)
+        np.testing.assert_allclose(values[:, 3].astype(float), [19.5, 74.5])
+
+    def test_window_stack_scaled(self):
+        s = ph.from_adc(np.arange(1000), 10, scale=.5, offset=1)
+        segments = [ph.Segment(10, 12, None), ph.Segment(11, 13, None), ph.Segment(12, 14, None)]
+        windows, n = _window_stack(segments, s)
+        self.assertEqual(n, 3)
+        np.testing.assert_array_equal(windows[1], np.arange(110, 130) * .5 + 1)
+        # only the range covered by the windows is converted
+        converted = windows
+        while converted.base is not None:
+            converted = converted.base
+        self.assertEqual(converted.size, 40)
+
+    def test_fmap_generator(self):
+        s = ph.EvenlySignal(np.arange(100.), 10)
+        events = []
+
+        def segments():
+            for i in range(3):
+                events.append('segment')
+                yield ph.Segment(i, i + 1, None)
+
+        def count(data, params):
+            events.append('algorithm')
+            return len(data)
+
+        # without batch implementations the segments are processed as they are generated
+        values, _ = ph.fmap(segments(), [ph.algo(count, k=1)], s)
+        self.assertEqual(events, ['segment', 'algorithm'] * 3)
+        np.testing.assert_array_equal(values[:, 3].astype(float), [10, 10, 10])
+
+    def test_entropy_binning(self):
+        np.random.seed(1)
+        values = np.round(np.random.randn(6, 50) * 3)
+        expected = [ph.Entropy(nbins=7)(ph.EvenlySignal(v, 10)) for v in values]
+        np.testing.assert_allclose(ph.Entropy.run_batch(values, {}, {'nbins': 7}), expected, rtol=1e-12)
+
+    def test_fmap(self):
+        np.random.seed(0)
+        s = ph.EvenlySignal(np.cumsum(np.random.randn(2000)), 16, signal_type='EDA')
+        algorithms = [ph.Mean(), ph.StDev(), ph.Median(), ph.Range(), ph.AUC(), ph.RMSSD(), ph.Kurtosis(),
+                      ph.Entropy(), ph.DerivativeEnergy(), ph.CVSignal(), ph.PNNx(threshold=10)]
+        segments = list(ph.FixedSegments(step=1.5, width=4, drop_cut=False)(s))
+        values, col_names = ph.fmap(segments, algorithms, s)
+        self.assertEqual(values.shape, (len(segments), 3 + len(algorithms)))
+        for i, seg in enumerate(segments):
+            portion = seg(s)
+            np.testing.assert_allclose(values[i, 3:].astype(float), [a(portion) for a in algorithms],
+                                       rtol=1e-10)
+
+    def test_batch_hook(self):
+        values = np.array([[1., 2., 4.], [0., 0., 3.]])
+        meta = {'sampling_freq': 2, 'signal_type': ''}
+        np.testing.assert_array_equal(ph.Mean.run_batch(values, meta, {}), [7 / 3, 1])
+        np.testing.assert_array_equal(ph.AUC.run_batch(values, meta, {}), [3.5, 1.5])
+        # no batch implementation
+        self.assertIsNone(ph.PNNx.run_batch(values, meta, {'threshold': 10}))
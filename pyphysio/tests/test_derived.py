@@ -0,0 +1,67 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, np
+from pyphysio.tools.Tools import Diff
+
+__author__ = 'aleb'
+
+
+class DerivedTest(unittest.TestCase):
+    def test_derived(self):
+        s = ph.EvenlySignal(np.array([3., 1., np.nan, 2.]), 10)
+        np.testing.assert_array_equal(s.get_derived('diff'), [-2, np.nan, np.nan])
+        np.testing.assert_array_equal(s.get_derived('cumsum')[:2], [3, 4])
+        np.testing.assert_array_equal(s.get_derived('sorted'), [1, 2, 3, np.nan])
+        # computed once, read-only
+        self.assertIs(s.get_derived('diff'), s.get_derived('diff'))
+        with self.assertRaises(ValueError):
+            s.get_derived('diff')[0] = 0
+
+        m = ph.MultiEvenly(np.array([[1., 4.], [2., 3.], [0., 5.]]), 10)
+        np.testing.assert_array_equal(m.get_derived('sorted'), [[0, 3], [1, 4], [2, 5]])
+
+    def test_invalidation(self):
+        s = ph.EvenlySignal(np.array([1., 2., 4.]), 10)
+        diff = s.get_derived('diff')
+        s[0] = 0
+        np.testing.assert_array_equal(s.get_derived('diff'), [2, 2])
+        s += 1
+        np.testing.assert_array_equal(s.get_derived('cumsum'), [1, 4, 9])
+        self.assertIsNot(s.get_derived('diff'), diff)
+        s.set_scaling(2)
+        np.testing.assert_array_equal(s.get_derived('cumsum'), [2, 8, 18])
+
+    def test_indicators(self):
+        np.random.seed(3)
+        ibi = ph.EvenlySignal(np.random.rand(200) * .3 + .7, 4)
+        diff = Diff()(ibi).get_values()
+        self.assertAlmostEqual(ph.RMSSD()(ibi), np.sqrt(np.mean(diff ** 2)))
+        self.assertAlmostEqual(ph.SDSD()(ibi), np.std(diff))
+        self.assertEqual(ph.NNx(threshold=100)(ibi), np.sum(diff * 1000 > 100))
+        self.assertEqual(ph.Median()(ibi), np.median(ibi.get_values()))
+        # shared by the indicators
+        self.assertIs(ibi.get_derived('diff'), ibi.get_derived('diff'))
+
+
+    def test_scaled(self):
+        s = ph.EvenlySignal(np.array([1, 3, 2, 5], dtype=np.int16), 10)
+        s.set_scaling(.5, 1)
+        self.assertIs(s.to_physical().get_derived('diff'), s.get_derived('diff'))
+        np.testing.assert_array_equal(s.get_derived('diff'), [1, -.5, 1.5])
+        # shared by the indicators, which process the physical view
+        self.assertAlmostEqual(ph.RMSSD()(s), np.sqrt(np.mean(np.array([1, -.5, 1.5]) ** 2)))
+        self.assertIs(s.to_physical().get_derived('diff'), s.get_derived('diff'))
+        s[0] = 3
+        np.testing.assert_array_equal(s.to_physical().get_derived('diff'), [0, -.5, 1.5])
+
+    def test_channels(self):
+        # the channels processed one by one are new signals: their series are computed at each run
+        m = ph.MultiEvenly(np.array([[1., 4.], [2., 3.], [0., 5.]]), 10)
+        self.assertEqual(ph.RMSSD()(m), [np.sqrt(2.5), np.sqrt(2.5)])
+        self.assertNotIn(('derived', 'diff'), getattr(m, '_cache', {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, np
+
+__author__ = 'aleb'
+
+
+class DesignCacheTest(unittest.TestCase):
+    def test_cache(self):
+        ph.clear_design_cache()
+        s = ph.EvenlySignal(np.random.randn(2000), 100)
+        m = ph.MultiEvenly(np.random.randn(2000, 3), 100)
+        for _ in range(3):
+            ph.IIRFilter(fp=5, fs=15)(s)
+            ph.FIRFilter(fp=[3], fs=[5])(s)
+        ph.IIRFilter(fp=[5], fs=[15])(m)
+        info = ph.design_cache_info()
+        self.assertEqual(info['IIRFilter']['misses'], 2)
+        self.assertEqual(info['IIRFilter']['hits'], 2)
+        self.assertEqual(info['IIRFilter']['hit_rate'], .5)
+        self.assertEqual(info['FIRFilter']['size'], 1)
+        self.assertEqual(info['FIRFilter']['hits'], 2)
+
+        # per sampling frequency
+        ph.IIRFilter(fp=5, fs=15)(ph.EvenlySignal(np.random.randn(2000), 200))
+        self.assertEqual(ph.design_cache_info()['IIRFilter']['misses'], 3)
+        ph.clear_design_cache()
+        self.assertEqual(ph.design_cache_info()['IIRFilter'], {'hits': 0, 'misses': 0, 'size': 0, 'hit_rate': 0.})
+
+    def test_low_cutoff(self):
+        # second-order sections: stable at low normalized cutoff frequencies
+        np.random.seed(1)
+        s = ph.EvenlySignal(np.cumsum(np.random.randn(256 * 600)), 256)
+        f = ph.IIRFilter(fp=.5, fs=1)
+        filtered = f(s)
+        self.assertFalse(np.isnan(filtered).any())
+        self.assertLess(np.std(np.diff(filtered)), .1 * np.std(np.diff(s)))
+        # the portions computed by LazySignal match the whole signal
+        lazy = f(ph.LazySignal(s))
+        np.testing.assert_allclose(lazy.segment_time(300, 305), filtered.segment_time(300, 305), rtol=1e-7)
+
+    def test_design_copies(self):
+        # modifying a returned design leaves the cached one untouched
+        s = ph.EvenlySignal(np.random.randn(2000), 100)
+        iir, fir = ph.IIRFilter(fp=5, fs=15), ph.FIRFilter(fp=[3], fs=[5])
+        expected_iir, expected_fir = iir(s), fir(s)
+        ph.IIRFilter._design(iir.get(), 100)[:] = 0
+        ph.FIRFilter._taps(fir.get(), 100)[:] = 0
+        self.assertTrue(ph.IIRFilter._design(iir.get(), 100).any())
+        np.testing.assert_array_equal(iir(s), expected_iir)
+        np.testing.assert_array_equal(fir(s), expected_fir)
@@ -0,0 +1,140 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+import tempfile
+import time
+import unittest
+from . import ph, TestData, np
+from pyphysio.BaseAlgorithm import Algorithm, capture_log
+import pyphysio.DiskCache as DiskCacheModule
+from pyphysio.DiskCache import DiskCache
+
+__author__ = 'aleb'
+
+
+class SlowWarn(Algorithm):
+    """
+    Test algorithm (disk-cached): counts its executions, warns and returns the signal times two.
+    """
+    _disk_cache = True
+    runs = [0]
+
+    @classmethod
+    def algorithm(cls, data, params):
+        cls.runs[0] += 1
+        cls.warn('computed')
+        return data * params.get('k', 2)
+
+
+class DiskCacheTest(unittest.TestCase):
+    def test_run(self):
+        path = tempfile.mkdtemp()
+        ecg = ph.EvenlySignal(TestData.ecg()[:20000], 2048, signal_type='ECG')
+        with ph.disk_cache(path) as cache:
+            ibi = ph.BeatFromECG()(ecg)
+            self.assertEqual(len(os.listdir(path)), 1)
+            with ph.profile() as p:
+                ibi_cached = ph.BeatFromECG()(ecg)
+            self.assertEqual(p.to_dict()[0]['cache_hits'], 1)
+            # other parameters, other input
+            ph.BeatFromECG(bpm_max=150)(ecg)
+            ph.BeatFromECG()(ecg[:10000])
+            self.assertEqual(len(os.listdir(path)), 3)
+            self.assertGreater(cache.size(), 0)
+            # not disk-cached
+            ph.Mean()(ecg)
+            self.assertEqual(len(os.listdir(path)), 3)
+        self.assertIsNone(ph.get_disk_cache())
+
+        self.assertIsInstance(ibi_cached, ph.UnevenlySignal)
+        np.testing.assert_array_equal(ibi_cached, ibi)
+        np.testing.assert_array_equal(ibi_cached.get_indices(), ibi.get_indices())
+        self.assertEqual(ibi_cached.get_sampling_freq(), ibi.get_sampling_freq())
+        self.assertEqual(ibi_cached.get_signal_type(), ibi.get_signal_type())
+
+    def test_log_and_memory_cache(self):
+        s = ph.EvenlySignal(np.arange(10.), 10)
+        SlowWarn.runs[0] = 0
+        with ph.disk_cache(tempfile.mkdtemp()):
+            SlowWarn()(s)
+            with capture_log() as log:
+                out = SlowWarn()(s)
+            # used also by the memory cache
+            out_mem = SlowWarn.run(s.copy(), {}, use_cache=True)
+            out_k = SlowWarn(k=3)(s)
+        self.assertEqual(SlowWarn.runs[0], 2)
+        self.assertEqual([m for _, m in log], ['SlowWarn: computed'])
+        np.testing.assert_array_equal(out, s * 2)
+        np.testing.assert_array_equal(out_mem, s * 2)
+        np.testing.assert_array_equal(out_k, s * 3)
+
+    def test_precision(self):
+        eda = ph.EvenlySignal(TestData.eda()[:40000], sampling_freq=2048, signal_type='EDA').resample(32)
+        path = tempfile.mkdtemp()
+        with ph.disk_cache(path):
+            self.assertEqual(ph.DriverEstim()(eda).dtype, np.float64)
+            with ph.precision('float32'):
+                self.assertEqual(ph.DriverEstim()(eda).dtype, np.float32)
+                self.assertEqual(ph.DriverEstim()(eda).dtype, np.float32)
+            self.assertEqual(ph.DriverEstim()(eda).dtype, np.float64)
+        # one entry per policy
+        self.assertEqual(len(os.listdir(path)), 2)
+
+    def test_lru(self):
+        cache = DiskCache(tempfile.mkdtemp(), max_bytes=10 ** 6)
+        block = np.random.rand(50000)
+        cache.put('a', block, [])
+        cache.put('b', block, [])
+        # 'a' is the most recently used
+        time.sleep(0.01)
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', block, [])
+        self.assertIsNone(cache.get('b'))
+        np.testing.assert_array_equal(cache.get('a')[0], block)
+        self.assertLessEqual(cache.size(), 10 ** 6)
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+
+    def test_scans(self):
+        cache = DiskCache(tempfile.mkdtemp(), max_bytes=10 ** 6)
+        scans = [0]
+        entries = cache._entries
+
+        def counted_entries():
+            scans[0] += 1
+            return entries()
+
+        cache._entries = counted_entries
+        small = np.zeros(10)
+        for i in range(10):
+            cache.put(str(i), small, [])
+        # the directory is read at the first write only, while below the cap
+        self.assertEqual(scans[0], 1)
+        block = np.random.rand(100000)
+        cache.put('a', block, [])
+        cache.put('b', block, [])
+        self.assertIsNone(cache.get('0'))
+        self.assertLessEqual(cache.size(), 10 ** 6)
+
+    def test_key(self):
+        s = ph.EvenlySignal(np.arange(10.), 10)
+        key = DiskCache.key(SlowWarn, {}, s)
+        self.assertEqual(DiskCache.key(SlowWarn, {}, s.copy()), key)
+        self.assertNotEqual(DiskCache.key(SlowWarn, {'k': 3}, s), key)
+        # changes of the source code or of the cache format invalidate the results
+        source = DiskCacheModule._sources[SlowWarn]
+        DiskCacheModule._sources[SlowWarn] = 'changed'
+        try:
+            self.assertNotEqual(DiskCache.key(SlowWarn, {}, s), key)
+        finally:
+            DiskCacheModule._sources[SlowWarn] = source
+        DiskCacheModule._FORMAT += 1
+        try:
+            self.assertNotEqual(DiskCache.key(SlowWarn, {}, s), key)
+        finally:
+            DiskCacheModule._FORMAT -= 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, np
+from scipy.signal import sosfiltfilt
+
+__author__ = 'aleb'
+
+
+class FilterChainTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        fsamp = 200
+        self.s = ph.EvenlySignal(np.cumsum(np.random.randn(fsamp * 120)) +
+                                 np.sin(2 * np.pi * 50 * np.arange(fsamp * 120) / fsamp), fsamp, 5, 'ECG')
+        self.stages = [ph.IIRFilter(fp=1, fs=0.2), ph.IIRFilter(fp=30, fs=60), ph.IIRFilter(fp=[40, 60], fs=[48, 52])]
+
+    def test_fused(self):
+        s, stages = self.s, self.stages
+        result = ph.FilterChain(stages)(s)
+        self.assertIsInstance(result, ph.EvenlySignal)
+        self.assertEqual(result.get_start_time(), s.get_start_time())
+
+        # same as the stages applied one at a time, with second-order sections
+        expected = s.get_values()
+        for f in stages:
+            expected = sosfiltfilt(ph.IIRFilter._design(f.get(), s.get_sampling_freq()), expected)
+        np.testing.assert_allclose(result[2000:-2000], expected[2000:-2000], rtol=0, atol=1e-4)
+
+        unfused = s
+        for f in stages:
+            unfused = f(unfused)
+        np.testing.assert_allclose(result[2000:-2000], unfused[2000:-2000], rtol=0, atol=1e-2)
+
+        # the cached designs of the stages are reused
+        ph.FilterChain(stages)(s)
+        self.assertEqual(len(ph.FilterChain._fused_sos(stages, s.get_sampling_freq())),
+                         sum(len(ph.IIRFilter._design(f.get(), 200)) for f in stages))
+
+    def test_no_solution(self):
+        s, stages = self.s, self.stages
+        design = ph.IIRFilter.__dict__['_design']
+        unstable = np.array([[1., 0, 0, 1, -4, 3.5]])
+
+        def failing_design(cls, params, fsamp):
+            return unstable if params['fp'] == 30 else design.__func__(cls, params, fsamp)
+
+        ph.IIRFilter._design = classmethod(failing_design)
+        try:
+            with np.errstate(all='ignore'):
+                result = ph.FilterChain(stages)(s)
+        finally:
+            ph.IIRFilter._design = design
+        # only the stage without solution is skipped
+        np.testing.assert_array_equal(result, stages[2](stages[0](s)))
+
+    def test_mixed(self):
+        s, stages = self.s, self.stages
+        chain = [ph.Normalize('standard')] + stages[:2] + [ph.ConvolutionalFilter('rect', 0.1), stages[2]]
+        result = ph.FilterChain(chain)(s)
+        expected = ph.FilterChain(stages[:2])(ph.Normalize('standard')(s))
+        expected = stages[2](ph.ConvolutionalFilter('rect', 0.1)(expected))
+        np.testing.assert_array_equal(result, expected)
+
+        m = ph.MultiEvenly(np.c_[s.get_values(), -s.get_values()], s.get_sampling_freq())
+        result = ph.FilterChain(stages)(m)
+        self.assertIsInstance(result, ph.MultiEvenly)
+        np.testing.assert_allclose(result[:, 0], ph.FilterChain(stages)(s), rtol=0, atol=1e-9)
+        np.testing.assert_allclose(result[:, 1], -result[:, 0], rtol=0, atol=1e-9)
@@ -0,0 +1,33 @@
+# coding=utf-8
+from __future__ import division
+
+import subprocess
+import sys
+import unittest
+from . import ph
+
+__author__ = 'aleb'
+
+
+class ImportTest(unittest.TestCase):
+    def test_silent_and_lazy(self):
+        # fresh interpreter: the modules imported by the test session do not count
+        code = ("import sys, pyphysio\n"
+                "print(sorted(m for m in ('matplotlib', 'scipy.signal', 'scipy.stats', 'scipy.optimize') "
+                "if m in sys.modules))\n"
+                "pyphysio.Annotate\n"
+                "print('matplotlib' in sys.modules)")
+        out = subprocess.check_output([sys.executable, '-c', code]).decode().split('\n')
+        self.assertEqual(out[0], '[]')
+        self.assertEqual(out[1], 'True')
+
+    def test_lazy_attributes(self):
+        self.assertIn('EDFReader', dir(ph))
+        from pyphysio.io.EDF import EDFReader
+        self.assertIs(ph.EDFReader, EDFReader)
+        with self.assertRaises(AttributeError):
+            ph.NotAnAttribute
+
+
+if __name__ == '__main__':
+    unittest.main()
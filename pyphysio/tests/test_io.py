@@ -0,0 +1,259 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+import shutil
+import tempfile
+import unittest
+from . import ph, np
+
+__author__ = 'aleb'
+
+
+class ContainerTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1234)
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'signal.phc')
+        self.values = np.cumsum(np.random.rand(10000, 3) - .5, axis=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_evenly(self):
+        s = ph.EvenlySignal(self.values[:, 0], 100, 3, 'EDA')
+        for compression in ['zlib', None]:
+            ph.save(s, self.path, chunk_len=1000, compression=compression)
+            s_ = ph.load(self.path)
+            self.assertIsInstance(s_, ph.EvenlySignal)
+            np.testing.assert_array_equal(s_, s)
+            self.assertEqual(s_.get_sampling_freq(), 100)
+            self.assertEqual(s_.get_start_time(), 3)
+            self.assertEqual(s_.get_signal_type(), 'EDA')
+
+            p = ph.load(self.path, 15.5, 40.2, n_workers=2)
+            p_ = s.segment_time(15.5, 40.2)
+            np.testing.assert_array_equal(p, p_)
+            self.assertEqual(p.get_start_time(), p_.get_start_time())
+
+    def test_multi_channels_and_mmap(self):
+        s = ph.MultiEvenly(self.values, 100, 0, 'ACC')
+        ph.save(s, self.path, chunk_len=512)
+        p = ph.load(self.path, 10, 20, channels=[0, 2])
+        self.assertIsInstance(p, ph.MultiEvenly)
+        np.testing.assert_array_equal(p, self.values[1000:2000][:, [0, 2]])
+        p = ph.load(self.path, channels=[1])
+        self.assertIsInstance(p, ph.EvenlySignal)
+        np.testing.assert_array_equal(p, self.values[:, 1])
+
+        ph.save(s, self.path, compression=None)
+        p = ph.load(self.path, 10, 20, mmap=True)
+        base = p.get_values()
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        self.assertIsInstance(base, np.memmap)
+        np.testing.assert_array_equal(p, self.values[1000:2000])
+
+    def test_scaled(self):
+        counts = (self.values[:, :2] * 100).astype(np.int16)
+        s = ph.from_adc(counts, 100, [0.01, 0.02], [1, 2])
+        ph.save(s, self.path, chunk_len=700)
+        s_ = ph.load(self.path)
+        self.assertEqual(s_.get_raw_values().dtype, np.int16)
+        np.testing.assert_array_equal(s_.get_values(), s.get_values())
+        ch = ph.load(self.path, channels=[1])
+        np.testing.assert_array_equal(ch.get_values(), s.get_channel(1).get_values())
+
+    def test_unevenly(self):
+        x = np.cumsum(np.random.randint(50, 150, 500))
+        s = ph.UnevenlySignal(self.values[:500, 0], 100, 2, 'IBI', x_values=x, x_type='indices',
+                              duration=(x[-1] + 10) / 100)
+        ph.save(s, self.path, chunk_len=64)
+        s_ = ph.load(self.path)
+        self.assertIsInstance(s_, ph.UnevenlySignal)
+        np.testing.assert_array_equal(s_, s)
+        np.testing.assert_array_equal(s_.get_indices(), s.get_indices())
+        self.assertEqual(s_.get_duration(), s.get_duration())
+        for t_start, t_stop in [(100, 200), (2, 50.5), (300, None)]:
+            p, p_ = ph.load(self.path, t_start, t_stop), s.segment_time(t_start, t_stop)
+            np.testing.assert_array_equal(p, p_)
+            np.testing.assert_array_equal(p.get_indices(), p_.get_indices())
+            self.assertEqual(p.get_start_time(), p_.get_start_time())
+
+
+class CsvTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1234)
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'signal.csv')
+        self.values = np.cumsum(np.random.rand(5000, 2) - .5, axis=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_evenly_round_trip(self):
+        s = ph.EvenlySignal(self.values[:, 0], 128, 2, 'EDA')
+        s.to_csv(self.path, 'a comment', block_len=333)
+        s_ = ph.from_csv(self.path, chunk_bytes=1000)
+        np.testing.assert_array_equal(s_, s)
+        self.assertEqual(s_.get_sampling_freq(), 128)
+        self.assertEqual(s_.get_start_time(), 2)
+        self.assertEqual(s_.get_signal_type(), 'EDA')
+        table = np.genfromtxt(self.path, delimiter=',', skip_header=4)
+        np.testing.assert_array_equal(table[:, 0], np.arange(len(s)))
+        np.testing.assert_allclose(table[:, 1], s.get_times())
+
+    def test_multi_columns(self):
+        s = ph.MultiEvenly(self.values, 100, 0, 'ACC')
+        s.to_csv(self.path)
+        s_ = ph.from_csv(self.path, chunk_bytes=4096)
+        self.assertIsInstance(s_, ph.MultiEvenly)
+        np.testing.assert_allclose(s_, self.values, atol=1e-6)
+        ch = ph.from_csv(self.path, columns='ch1')
+        np.testing.assert_allclose(ch, self.values[:, 1], atol=1e-6)
+
+    def test_no_header_missing_values(self):
+        with open(self.path, 'w') as f:
+            f.write('1;2\n3;\n\n5;6\n7;8')
+        s = ph.from_csv(self.path, 10, columns=[1, 0], delimiter=';', chunk_bytes=4)
+        np.testing.assert_array_equal(s, [[2, 1], [np.nan, 3], [6, 5], [8, 7]])
+        self.assertEqual(s.get_start_time(), 0)
+
+    def test_comments(self):
+        with open(self.path, 'w') as f:
+            f.write('# 2024,10\nFsamp: 10\n#1,2\na,b\n1,2\n#3,4\n5,6\n# 7,8\n9,10\n')
+        s = ph.from_csv(self.path, chunk_bytes=6)
+        np.testing.assert_array_equal(s, [[1, 2], [5, 6], [9, 10]])
+        self.assertEqual(s.get_sampling_freq(), 10)
+        np.testing.assert_array_equal(ph.from_csv(self.path, columns='b'), [2, 6, 10])
+
+
+def write_edf(path, channels, record_duration, n_records, annotations):
+    # channels: list of (label, samples per record, int16 values, physical min, physical max)
+    labels = [c[0] for c in channels] + ['EDF Annotations']
+    n_samples = [c[1] for c in channels] + [30]
+
+    def field(values, width):
+        return ''.join(str(v).ljust(width)[:width] for v in values).encode('latin-1')
+
+    n = len(labels)
+    header = b''.join([field(['0'], 8), field(['X X X X'], 80), field(['Startdate X X X X'], 80),
+                       field(['01.02.03'], 8), field(['04.05.06'], 8), field([256 * (n + 1)], 8),
+                       field(['EDF+C'], 44), field([n_records], 8), field([record_duration], 8), field([n], 4)])
+    header += field(labels, 16) + field([''] * n, 80) + field(['uV'] * n, 8)
+    header += field([c[3] for c in channels] + [-1], 8) + field([c[4] for c in channels] + [1], 8)
+    header += field([-32768] * n, 8) + field([32767] * n, 8) + field([''] * n, 80)
+    header += field(n_samples, 8) + field([''] * n, 32)
+    with open(path, 'wb') as f:
+        f.write(header)
+        for r in range(n_records):
+            for label, spr, values, _, _ in channels:
+                f.write(values[r * spr:(r + 1) * spr].astype('<i2').tobytes())
+            tal = ('+%d\x14\x14\x00' % (r * record_duration)).encode('latin-1')
+            tal += b''.join(annotations.get(r, []))
+            f.write(tal.ljust(60, b'\x00'))
+
+
+class EDFTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1234)
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'signal.edf')
+        self.a = np.random.randint(-32768, 32767, 10 * 256)
+        self.b = np.random.randint(-32768, 32767, 10 * 256)
+        self.c = np.random.randint(-32768, 32767, 10 * 32)
+        write_edf(self.path, [('A', 256, self.a, -100, 100), ('C', 32, self.c, 0, 10), ('B', 256, self.b, 0, 1)],
+                  1, 10, {1: [b'+1.5\x150.5\x14stim\x14\x00'], 4: [b'+4\x14rest\x14\x00']})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read(self):
+        reader = ph.EDFReader(self.path)
+        self.assertEqual(reader.get_labels(), ['A', 'C', 'B', 'EDF Annotations'])
+        self.assertEqual(reader.get_duration(), 10)
+        self.assertEqual(reader.get_start_datetime().year, 2003)
+        ab, c = reader.read()
+        self.assertEqual(ab.ph['channels'], ['A', 'B'])
+        self.assertEqual(ab.get_sampling_freq(), 256)
+        self.assertEqual(c.get_sampling_freq(), 32)
+        self.assertEqual(ab.get_raw_values().dtype, np.int16)
+        np.testing.assert_array_equal(ab.get_raw_values(), np.c_[self.a, self.b])
+        np.testing.assert_allclose(c.get_values(), (self.c + 32768) * 10 / 65535)
+
+        b, = reader.read(['B'], 2.5, 4.25)
+        self.assertIsInstance(b, ph.EvenlySignal)
+        self.assertEqual(b.get_start_time(), 2.5)
+        np.testing.assert_array_equal(b.get_raw_values(), self.b[640:1088])
+
+    def test_annotations(self):
+        labels = ph.EDFReader(self.path).get_annotations()
+        np.testing.assert_array_equal(labels, ['stim', '', 'rest'])
+        np.testing.assert_array_equal(labels.get_indices(), [384, 512, 1024])
+        s = ph.EvenlySignal(self.a, 256)
+        segments = [(seg.get_begin_time(), seg.get_end_time(), seg.get_label())
+                    for seg in ph.LabelSegments(labels=labels)(s)]
+        self.assertEqual(segments[:2], [(1.5, 2, 'stim'), (2, 4, '')])
+
+
+class WFDBTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1234)
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, '100')
+        n = 3601
+        self.ecg = np.random.randint(-2048, 2048, (n, 2))
+        self.resp = np.random.randint(-32768, 32768, n)
+
+        # format 212: two 12 bit samples in three bytes
+        flat = self.ecg.ravel() & 0xFFF
+        packed = np.empty((len(flat) // 2, 3), dtype=np.uint8)
+        packed[:, 0] = flat[0::2] & 0xFF
+        packed[:, 1] = ((flat[0::2] >> 8) & 0x0F) | ((flat[1::2] >> 4) & 0xF0)
+        packed[:, 2] = flat[1::2] & 0xFF
+        packed.tofile(self.path + '.dat')
+        self.resp.astype('<i2').tofile(self.path + '_2.dat')
+        with open(self.path + '.hea', 'w') as f:
+            f.write('100 3 360 %d\n' % n)
+            f.write('100.dat 212 200(10)/mV 11 1024 0 0 0 MLII\n')
+            f.write('100.dat 212 100 11 5 0 0 0 V5\n')
+            f.write('100_2.dat 16 1000/mmHg 16 0 0 0 0 RESP\n')
+
+        # annotations: N at 100, rhythm '(AFIB' at 500, V at 70500 (after a SKIP)
+        words = [(1 << 10) | 100, (28 << 10) | 400, (63 << 10) | 5] + \
+                list(np.frombuffer(b'(AFIB\x00', dtype='<u2')) + \
+                [(59 << 10), 1, 4464, (5 << 10) | 0, (1 << 10) | 360, 0]
+        np.array(words, dtype='<u2').tofile(self.path + '.atr')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read(self):
+        record = ph.WFDBRecord(self.path)
+        self.assertEqual(record.get_labels(), ['MLII', 'V5', 'RESP'])
+        self.assertEqual(len(record), 3601)
+        s = record.read()
+        self.assertIsInstance(s, ph.MultiEvenly)
+        np.testing.assert_array_equal(s.get_raw_values(), np.c_[self.ecg, self.resp])
+        np.testing.assert_allclose(s.get_channel(0).get_values(), (self.ecg[:, 0] - 10) / 200)
+        np.testing.assert_allclose(s.get_channel(1).get_values(), (self.ecg[:, 1] - 5) / 100)
+
+        v5 = record.read(['V5'], 1.001, 2.5)
+        self.assertIsInstance(v5, ph.EvenlySignal)
+        self.assertEqual(v5.ph['channels'], ['V5'])
+        np.testing.assert_array_equal(v5.get_raw_values(), self.ecg[360:900, 1])
+        np.testing.assert_array_equal(record.read([2, 0], 3, 4).get_raw_values(), np.c_[self.resp, self.ecg[:, 0]][1080:1440])
+
+    def test_annotations(self):
+        record = ph.WFDBRecord(self.path)
+        labels = record.read_annotations()
+        np.testing.assert_array_equal(labels, ['N', '(AFIB', 'V', 'N'])
+        np.testing.assert_array_equal(labels.get_indices(), [100, 500, 70500, 70860])
+        beats = record.read_beats()
+        np.testing.assert_array_equal(beats.get_indices(), [100, 70500, 70860])
+        self.assertEqual(beats.ph['symbols'], ['N', 'V', 'N'])
+        np.testing.assert_allclose(beats, [70400 / 360, 70400 / 360, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, np
+
+__author__ = 'aleb'
+
+
+class LazyTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1)
+        self.s = ph.EvenlySignal(np.cumsum(np.random.randn(64 * 600)), 64, 3, 'EDA')
+
+    def test_segments(self):
+        s = self.s
+        for chain, tol in [([ph.IIRFilter(fp=5, fs=15)], 1e-6),
+                           ([ph.FIRFilter(fp=[3], fs=[5])], 1e-9),
+                           ([ph.ConvolutionalFilter('gauss', 2)], 1e-9),
+                           ([ph.Normalize('standard'), ph.ConvolutionalFilter('rect', 1), ph.Normalize('maxmin')],
+                            1e-9)]:
+            full, lazy = s, ph.LazySignal(s)
+            for f in chain:
+                full, lazy = f(full), f(lazy)
+            self.assertIsInstance(lazy, ph.LazySignal)
+            for t in [3, 50, 300, 598]:
+                a, b = lazy.segment_time(t, t + 4), full.segment_time(t, t + 4)
+                self.assertEqual(a.get_start_time(), b.get_start_time())
+                np.testing.assert_allclose(a, b, rtol=0, atol=tol)
+            np.testing.assert_allclose(lazy.to_evenly(), full, rtol=0, atol=1e-9)
+
+    def test_portion(self):
+        # only the segment plus the margin is filtered
+        filtered = []
+
+        class Probe(ph.ConvolutionalFilter):
+            @classmethod
+            def algorithm(cls, signal, params):
+                filtered.append(len(signal))
+                return ph.ConvolutionalFilter.algorithm(signal, params)
+
+        lazy = Probe('rect', 0.5)(ph.LazySignal(self.s))
+        self.assertEqual(lazy.get_margin(), 32)
+        self.assertEqual(filtered, [])
+        self.assertEqual(len(lazy.segment_time(100, 110)), 640)
+        self.assertEqual(filtered, [640 + 2 * 32])
+
+    def test_normalize_barrier(self):
+        filtered = []
+
+        class Probe(ph.ConvolutionalFilter):
+            @classmethod
+            def algorithm(cls, signal, params):
+                filtered.append(len(signal))
+                return ph.ConvolutionalFilter.algorithm(signal, params)
+
+        # first in the chain: the statistics of the source, nothing else is computed
+        lazy = Probe('rect', 0.5)(ph.Normalize('standard')(ph.LazySignal(self.s)))
+        lazy.segment_time(100, 110)
+        self.assertEqual(filtered, [640 + 2 * 32])
+
+        # after another filter: the filter is computed on the whole signal once, the following ones by portions
+        del filtered[:]
+        lazy = Probe('rect', 0.5)(ph.Normalize('standard')(Probe('rect', 0.5)(ph.LazySignal(self.s))))
+        self.assertEqual(filtered, [])
+        lazy.segment_time(100, 110)
+        lazy.segment_time(200, 210)
+        self.assertEqual(filtered, [len(self.s), 640 + 2 * 32, 640 + 2 * 32])
+        self.assertFalse(hasattr(lazy, 'append'))
+
+    def test_algorithms(self):
+        s = self.s
+        lazy = ph.ConvolutionalFilter('rect', 1)(ph.LazySignal(s))
+        full = ph.ConvolutionalFilter('rect', 1)(s)
+        # other algorithms receive the whole signal
+        self.assertAlmostEqual(ph.Mean()(lazy), ph.Mean()(full))
+        values, _ = ph.fmap(ph.FixedSegments(step=60, width=60), [ph.Mean(), ph.StDev()], lazy)
+        values_full, _ = ph.fmap(ph.FixedSegments(step=60, width=60), [ph.Mean(), ph.StDev()], full)
+        np.testing.assert_allclose(values[:, [0, 1, 3, 4]].astype(float), values_full[:, [0, 1, 3, 4]].astype(float))
@@ -0,0 +1,112 @@
+# coding=utf-8
+from __future__ import division
+
+import logging
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from . import ph, np
+from pyphysio.BaseAlgorithm import Algorithm, Cache, capture_log
+
+__author__ = 'aleb'
+
+
+class WarnLast(Algorithm):
+    """
+    Test algorithm: warns the last value of the signal, after a delay given by the value.
+    """
+    @classmethod
+    def algorithm(cls, data, params):
+        last = data.get_values()[-1]
+        time.sleep(0.01 * (3 - last))
+        cls.warn(str(last))
+        return last
+
+
+class LoggingTest(unittest.TestCase):
+    def test_capture(self):
+        s = ph.EvenlySignal(np.arange(4.), 10)
+        with capture_log() as outer:
+            with capture_log() as inner:
+                WarnLast()(s)
+            WarnLast.log('done')
+        self.assertEqual([m for _, m in inner], ['WarnLast: 3.0'])
+        self.assertEqual([m for _, m in outer], ['WarnLast: 3.0', 'WarnLast: done'])
+
+    def test_set_logger_in_capture(self):
+        s = ph.EvenlySignal(np.arange(4.), 10)
+        with capture_log() as outer:
+            Algorithm.set_logger()
+            WarnLast()(s)
+            inner = Algorithm.unset_logger()
+            WarnLast.log('after')
+        self.assertEqual([m for _, m in inner], ['WarnLast: 3.0'])
+        self.assertEqual([m for _, m in outer], ['WarnLast: 3.0', 'WarnLast: after'])
+        self.assertIsNone(Algorithm.unset_logger())
+
+    def test_parallel_channels_order(self):
+        multi = ph.MultiEvenly(np.tile(np.arange(4.), (5, 1)), 10)
+        with ph.parallel(4), capture_log() as log:
+            WarnLast()(multi)
+        self.assertEqual([m for _, m in log], ['WarnLast: %s' % float(i) for i in range(4)])
+
+    def test_threads_and_cache(self):
+        signals = [ph.EvenlySignal(np.arange(i + 1.), 10) for i in range(4)]
+
+        def run(s):
+            with capture_log() as log:
+                Cache.cache_check(s)
+                WarnLast.run(s, {}, use_cache=True)
+                # replayed from the cache
+                WarnLast.run(s, {}, use_cache=True)
+            return threading.current_thread().ident, [m for _, m in log]
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(run, signals))
+        for i, (_, log) in enumerate(results):
+            self.assertEqual(log, ['WarnLast: %s' % float(i)] * 2)
+
+    def test_cache_hit_logged_once(self):
+        ph.reset_log_counts()
+        try:
+            s = ph.EvenlySignal(np.arange(4.), 10)
+            Cache.cache_check(s)
+            with self.assertLogs('pyphysio', logging.INFO) as logs, capture_log() as log:
+                WarnLast.run(s, {}, use_cache=True)
+                WarnLast.run(s, {}, use_cache=True)
+            # the hit passes the entry to the capture, not to the logger
+            self.assertEqual([m for _, m in log], ['WarnLast: 3.0'] * 2)
+            self.assertEqual([r.getMessage() for r in logs.records], ['WarnLast: 3.0'])
+            self.assertEqual(ph.get_log_counts()['WarnLast: 3.0'], 1)
+
+            ph.set_log_replay(True)
+            with self.assertLogs('pyphysio', logging.INFO) as logs:
+                WarnLast.run(s, {}, use_cache=True)
+            self.assertEqual([r.getMessage() for r in logs.records], ['WarnLast: 3.0'])
+            self.assertEqual(ph.get_log_counts()['WarnLast: 3.0'], 2)
+        finally:
+            ph.set_log_replay(False)
+            ph.reset_log_counts()
+
+    def test_rate_limit_and_fmap_summary(self):
+        ph.reset_log_counts()
+        ph.set_log_rate_limit(3)
+        try:
+            s = ph.EvenlySignal(np.zeros(1000), 10)
+            with self.assertLogs('pyphysio', logging.INFO) as logs:
+                values, names = ph.fmap(ph.FixedSegments(step=1, width=2)(s), [ph.PeaksMax(delta=1)], s)
+            self.assertEqual(len(values), 99)
+            message = 'PeaksMax: No peak found'
+            self.assertEqual(ph.get_log_counts()[message], 99)
+            emitted = [r.getMessage() for r in logs.records]
+            self.assertEqual(emitted[:3], [message, message, message + ' (further occurrences are only counted)'])
+            self.assertEqual(emitted[-1], 'fmap: %s (99 times)' % message)
+            self.assertEqual(logs.records[-1].levelno, logging.WARNING)
+        finally:
+            ph.set_log_rate_limit(10)
+            ph.reset_log_counts()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# coding=utf-8
+from __future__ import division
+
+import threading
+import time
+import unittest
+from . import ph, TestData, np
+
+__author__ = 'aleb'
+
+
+class MultichannelTest(unittest.TestCase):
+    def setUp(self):
+        values = np.c_[TestData.ecg()[:20000], TestData.eda()[:20000], TestData.bvp()[:20000]]
+        self.multi = ph.MultiEvenly(values, 1024, 10, 'RAW')
+        self.multi_f = ph.MultiEvenly(values, 1024, 10, 'RAW', order='F')
+
+    def test_column_major_storage(self):
+        self.assertFalse(self.multi.is_channel_contiguous())
+        self.assertTrue(self.multi_f.is_channel_contiguous())
+        ch = self.multi_f.get_channel(1)
+        self.assertTrue(ch.get_values().flags.c_contiguous)
+        self.assertTrue(np.shares_memory(ch, self.multi_f))
+        np.testing.assert_array_equal(ch, self.multi.get_channel(1))
+        self.assertTrue(self.multi_f.segment_time(11, 12).is_channel_contiguous())
+
+    def test_channel_outputs_block(self):
+        f = ph.FIRFilter(fp=[45], fs=[50])
+        self.assertFalse(f._multichannel)
+        out = f(self.multi)
+        out_f = f(self.multi_f)
+        self.assertIsInstance(out, ph.MultiEvenly)
+        self.assertTrue(out.is_channel_contiguous())
+        np.testing.assert_array_equal(out, out_f)
+        for i_ch in range(3):
+            np.testing.assert_allclose(out.get_channel(i_ch), f(self.multi.get_channel(i_ch)))
+        self.assertEqual(out.get_start_time(), 10)
+
+    def test_channels_written_in_block(self):
+        written = []
+
+        class Probe(ph.KalmanFilter):
+            @classmethod
+            def algorithm(cls, signal, params):
+                out = super(Probe, cls).algorithm(signal, params)
+                written.append(out)
+                return out
+
+        f = Probe(R=2, ratio=2)
+        out = f(self.multi_f)
+        for i_ch in range(3):
+            # each channel is computed in its column of the result, without a further copy
+            self.assertTrue(np.shares_memory(written[i_ch], out))
+            np.testing.assert_allclose(out.get_channel(i_ch),
+                                       ph.KalmanFilter(R=2, ratio=2)(self.multi_f.get_channel(i_ch)))
+
+    def test_mixed_channel_outputs(self):
+        def signal_or_value(data, params):
+            return data if data.get_values()[0] > 0 else 0.
+
+        multi = ph.MultiEvenly(np.c_[np.ones(10), -np.ones(10)], 10)
+        with self.assertRaises(AssertionError):
+            ph.algo(signal_or_value)()(multi)
+
+    def test_vectorized_algorithms(self):
+        multi = self.multi.resample(128)
+        channels = [multi.get_channel(i_ch) for i_ch in range(3)]
+        irf = np.exp(-np.arange(128) / 32.)
+        for f in [ph.IIRFilter(fp=45, fs=50), ph.ConvolutionalFilter(irftype='gauss', win_len=0.5),
+                  ph.ConvolutionalFilter(irftype='rect', win_len=0.1),
+                  ph.DeConvolutionalFilter(irf, deconv_method='fft'), ph.Normalize('standard'),
+                  ph.Normalize('maxmin')]:
+            self.assertTrue(f._multichannel)
+            out = f(multi)
+            self.assertIsInstance(out, ph.MultiEvenly)
+            for i_ch in range(3):
+                np.testing.assert_allclose(out.get_channel(i_ch), f(channels[i_ch]), rtol=1e-9, atol=1e-9)
+
+        # a channel without solution is returned unfiltered, the others are filtered
+        values = multi.get_values().copy()
+        values[0, 1] = np.nan
+        multi_nan = ph.MultiEvenly(values, 128)
+        f = ph.IIRFilter(fp=45, fs=50)
+        out = f(multi_nan)
+        for i_ch in range(3):
+            np.testing.assert_allclose(out.get_channel(i_ch), f(multi_nan.get_channel(i_ch)), rtol=1e-9, atol=1e-9)
+        np.testing.assert_array_equal(out.get_channel(1), values[:, 1])
+
+        for f in [ph.Mean(), ph.Min(), ph.Max(), ph.Range(), ph.Median(), ph.StDev(), ph.Sum(), ph.AUC()]:
+            out = f(multi)
+            self.assertIsInstance(out, list)
+            np.testing.assert_allclose(out, [f(ch) for ch in channels])
+
+        for method in ['welch', 'fft', 'ar']:
+            out = ph.PSD(method, nfft=256, normalize=True)(multi)
+            self.assertEqual(len(out), 3)
+            for i_ch in range(3):
+                freqs, psd = ph.PSD(method, nfft=256, normalize=True)(channels[i_ch])
+                np.testing.assert_allclose(out[i_ch][0], freqs)
+                np.testing.assert_allclose(out[i_ch][1], psd, rtol=1e-9)
+
+    def test_parallel_channels(self):
+        f = ph.FIRFilter(fp=[45], fs=[50])
+        serial = f(self.multi)
+        threads = set()
+
+        def last(data, params):
+            threads.add(threading.current_thread().ident)
+            time.sleep(0.05)
+            return data.get_values()[-1]
+
+        with ph.parallel(3):
+            self.assertEqual(ph.get_n_workers(), 3)
+            np.testing.assert_array_equal(f(self.multi), serial)
+            self.assertEqual(ph.algo(last)()(self.multi), list(self.multi.get_values()[-1]))
+        self.assertEqual(ph.get_n_workers(), 1)
+        self.assertEqual(len(threads), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, np
+
+__author__ = 'aleb'
+
+
+class OutTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(2)
+        values = np.cumsum(np.random.randn(4000)) + 10 * (np.random.rand(4000) > .995)
+        values[1000:1003] = np.nan
+        self.s = ph.EvenlySignal(values, 64, 2, 'EDA')
+
+    def test_filters(self):
+        s = self.s
+        for f in [ph.Normalize('standard'), ph.Normalize('maxmin'), ph.IIRFilter(fp=5, fs=15),
+                  ph.ConvolutionalFilter('gauss', 1), ph.KalmanFilter(R=2, ratio=2), ph.RemoveSpikes(),
+                  ph.ImputeNAN()]:
+            np.random.seed(0)
+            expected = f(s)
+            out = np.empty(len(s))
+            np.random.seed(0)
+            result = f(s, out=out)
+            self.assertIsInstance(result, ph.EvenlySignal)
+            self.assertTrue(np.shares_memory(result, out))
+            self.assertEqual(result.get_start_time(), s.get_start_time())
+            np.testing.assert_array_equal(result, expected)
+
+            s_copy = s.copy()
+            np.random.seed(0)
+            result = f(s_copy, inplace=True)
+            self.assertTrue(np.shares_memory(result, s_copy))
+            np.testing.assert_array_equal(s_copy, expected)
+
+    def test_multi(self):
+        m = ph.MultiEvenly(np.random.rand(500, 3), 10)
+        for f in [ph.Normalize('standard'), ph.ConvolutionalFilter('rect', 1), ph.KalmanFilter(R=2, ratio=2)]:
+            expected = f(m)
+            out = np.empty((500, 3), order='F')
+            result = f(m, out=out)
+            self.assertIsInstance(result, ph.MultiEvenly)
+            self.assertTrue(np.shares_memory(result, out))
+            np.testing.assert_array_equal(result, expected)
+
+    def test_chain(self):
+        # a chain alternating two buffers
+        s = ph.ImputeNAN()(self.s)
+        chain = [ph.Normalize('standard'), ph.ConvolutionalFilter('rect', 1), ph.IIRFilter(fp=5, fs=15),
+                 ph.Normalize('min')]
+        expected = s
+        for f in chain:
+            expected = f(expected)
+        buffers = [np.empty(len(s)), np.empty(len(s))]
+        result = s
+        for i, f in enumerate(chain):
+            result = f(result, out=buffers[i % 2])
+        self.assertTrue(np.shares_memory(result, buffers[1]))
+        np.testing.assert_array_equal(result, expected)
+
+    def test_checks(self):
+        with self.assertRaises(AssertionError):
+            ph.Normalize()(self.s, out=np.empty(10))
+        with self.assertRaises(AssertionError):
+            ph.Normalize()(self.s, out=np.empty(len(self.s), dtype=np.float32))
+        scaled = ph.EvenlySignal(np.arange(100, dtype=np.int16), 10)
+        scaled.set_scaling(.5, 1)
+        with self.assertRaises(AssertionError):
+            ph.Normalize()(scaled, inplace=True)
@@ -0,0 +1,95 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, TestData, np
+
+__author__ = 'aleb'
+
+
+class PrecisionTest(unittest.TestCase):
+    def setUp(self):
+        self.eda64 = ph.EvenlySignal(TestData.eda()[:40000], sampling_freq=2048, signal_type='EDA').resample(32)
+        self.eda32 = ph.EvenlySignal(self.eda64.get_values().astype(np.float32), sampling_freq=32,
+                                     signal_type='EDA')
+
+    def assert_close(self, r32, r64, rtol):
+        self.assertEqual(np.asarray(r32).dtype, np.float32)
+        self.assertEqual(np.asarray(r64).dtype, np.float64)
+        scale = np.max(np.abs(r64))
+        np.testing.assert_allclose(np.asarray(r32, dtype=float), r64, rtol=0, atol=rtol * scale)
+
+    def test_filters_keep_single_precision(self):
+        for f in [ph.IIRFilter(fp=1, fs=2),
+                  ph.FIRFilter(fp=[1], fs=[2]),
+                  ph.ConvolutionalFilter(irftype='gauss', win_len=2),
+                  ph.Normalize('standard')]:
+            self.assert_close(f(self.eda32), f(self.eda64), 1e-4)
+
+    def test_psd(self):
+        f32, p32 = ph.PSD(method='welch', nfft=512)(self.eda32)
+        f64, p64 = ph.PSD(method='welch', nfft=512)(self.eda64)
+        self.assert_close(f32, f64, 1e-6)
+        self.assert_close(p32, p64, 1e-4)
+
+    def test_driver(self):
+        d32 = ph.DriverEstim()(self.eda32)
+        d64 = ph.DriverEstim()(self.eda64)
+        self.assert_close(d32, d64, 1e-3)
+
+    def test_policy(self):
+        with ph.precision('float32'):
+            self.assertEqual(ph.get_precision(), np.float32)
+            self.assert_close(ph.ConvolutionalFilter(irftype='rect', win_len=1)(self.eda64),
+                              ph.ConvolutionalFilter(irftype='rect', win_len=1)(self.eda64).astype(float), 1e-6)
+            d32 = ph.DriverEstim()(self.eda64)
+        self.assertIsNone(ph.get_precision())
+        self.assert_close(d32, ph.DriverEstim()(self.eda64), 1e-3)
+
+    def test_memory_cache(self):
+        from pyphysio.BaseAlgorithm import Cache
+        s = self.eda64.copy()
+        Cache.cache_check(s)
+        f = ph.IIRFilter(fp=1, fs=2)
+        with ph.precision('float32'):
+            self.assertEqual(f.run(s, f.get(), use_cache=True).dtype, np.float32)
+        self.assertEqual(f.run(s, f.get(), use_cache=True).dtype, np.float64)
+        with ph.precision('float32'):
+            self.assertEqual(f.run(s, f.get(), use_cache=True).dtype, np.float32)
+
+    def test_policy_per_thread(self):
+        import threading
+        entered, done = threading.Event(), threading.Event()
+        dtypes = []
+
+        def other():
+            entered.wait()
+            dtypes.append(ph.IIRFilter(fp=1, fs=2)(self.eda64).dtype)
+            done.set()
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        with ph.precision('float32'):
+            entered.set()
+            done.wait()
+            # the worker threads of the multichannel execution follow the calling thread
+            multi = ph.MultiEvenly(np.c_[self.eda64.get_values(), self.eda64.get_values()], 32)
+            workers = []
+
+            class Recording(ph.FIRFilter):
+                @classmethod
+                def algorithm(cls, signal, params):
+                    workers.append((threading.current_thread().name, ph.get_precision()))
+                    return ph.FIRFilter.algorithm(signal, params)
+
+            with ph.parallel(2):
+                Recording(fp=[1], fs=[2])(multi)
+            self.assertEqual(len(workers), 2)
+            self.assertNotIn(threading.current_thread().name, [name for name, _ in workers])
+            self.assertEqual([dtype for _, dtype in workers], [np.float32, np.float32])
+        thread.join()
+        self.assertEqual(dtypes, [np.float64])
+
+
+if __name__ == '__main__':
+    unittest.main()
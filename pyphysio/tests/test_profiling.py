@@ -0,0 +1,150 @@
+# coding=utf-8
+from __future__ import division
+
+import json
+import os
+import tempfile
+import unittest
+from . import ph, TestData, np
+from pyphysio.BaseAlgorithm import Algorithm, Cache
+
+__author__ = 'aleb'
+
+
+class Outer(Algorithm):
+    """
+    Test algorithm: allocates a temporary copy of the input ten times as large, then calls Inner.
+    """
+    @classmethod
+    def algorithm(cls, data, params):
+        tmp = np.tile(data.get_values(), 10)
+        del tmp
+        return Inner()(data)
+
+
+class Inner(Algorithm):
+    """
+    Test algorithm: allocates a temporary copy of the input twice as large.
+    """
+    @classmethod
+    def algorithm(cls, data, params):
+        return np.tile(data.get_values(), 2).sum()
+
+
+class ProfilingTest(unittest.TestCase):
+    def test_profile(self):
+        eda = ph.EvenlySignal(TestData.eda()[:20000], 2048, signal_type='EDA').resample(32)
+        with ph.profile() as p:
+            for _ in range(3):
+                ph.Normalize('standard')(eda)
+            Cache.cache_check(eda)
+            for _ in range(2):
+                ph.Mean.run(eda, {}, use_cache=True)
+        # not recorded
+        ph.Max()(eda)
+
+        stats = dict((s['algorithm'], s) for s in p.to_dict())
+        self.assertEqual(set(stats.keys()), {'Normalize', 'Mean', 'StDev'})
+        self.assertEqual(stats['Normalize']['calls'], 3)
+        self.assertEqual(stats['Normalize']['samples'], 3 * len(eda))
+        self.assertEqual(stats['Normalize']['params'], '{norm_bias: 0, norm_method: standard, norm_range: 1}')
+        # Mean: 3 calls by Normalize, 2 cached calls (1 hit)
+        self.assertEqual(stats['Mean']['calls'], 5)
+        self.assertEqual(stats['Mean']['cache_hits'], 1)
+        self.assertEqual(stats['StDev']['calls'], 3)
+        norm = stats['Normalize']
+        self.assertLess(norm['self_time'], norm['total_time'])
+        self.assertGreater(norm['self_time'], 0)
+
+        self.assertEqual([s['calls'] for s in p.to_dict('calls')], [5, 3, 3])
+        report = p.report('calls').split('\n')
+        self.assertEqual(len(report), 4)
+        self.assertTrue(report[1].startswith('Mean'))
+
+    def test_memory(self):
+        s = ph.EvenlySignal(np.arange(100000.), 10)
+        with ph.profile(memory=True) as p:
+            Outer()(s)
+            Outer()(s)
+        stats = dict((x['algorithm'], x) for x in p.to_dict('amplification'))
+        self.assertEqual([x['algorithm'] for x in p.to_dict('amplification')], ['Outer', 'Inner'])
+        self.assertEqual(stats['Outer']['input_bytes'], s.nbytes)
+        # the peak of the nested call is included in the caller's one
+        self.assertGreaterEqual(stats['Outer']['amplification'], 10)
+        self.assertLess(stats['Outer']['amplification'], 11)
+        self.assertGreaterEqual(stats['Inner']['amplification'], 2)
+        self.assertLess(stats['Inner']['amplification'], 3)
+        self.assertTrue(p.memory_report().split('\n')[1].startswith('Outer'))
+
+        with ph.profile() as p:
+            Outer()(s)
+        self.assertNotIn('peak_bytes', p.to_dict()[0])
+
+    def test_memory_caller_tracing(self):
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            tmp = np.ones(10 ** 6)
+            del tmp
+            peak = tracemalloc.get_traced_memory()[1]
+            with ph.profile(memory=True):
+                Outer()(ph.EvenlySignal(np.arange(10.), 10))
+            # the peak of the caller is not reset, tracemalloc is not stopped
+            self.assertGreaterEqual(tracemalloc.get_traced_memory()[1], peak)
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_trace(self):
+        s = ph.EvenlySignal(np.cumsum(np.random.rand(1000) - .5), 10)
+        segments = [seg for seg in ph.FixedSegments(step=20, width=30)(s)]
+        with ph.trace() as t:
+            ph.fmap(segments, [ph.PNNx(threshold=10), ph.NNx(threshold=10)], s)
+        events = [e for e in t.events() if e['ph'] == 'X']
+        segment_spans = [e for e in events if e['cat'] == 'segment']
+        self.assertEqual([e['args']['segment'] for e in segment_spans], list(range(len(segments))))
+        self.assertEqual(segment_spans[1]['args']['begin'], segments[1].get_begin_time())
+        algorithm_spans = [e for e in events if e['cat'] == 'algorithm']
+        self.assertEqual(len(algorithm_spans), 2 * len(segments))
+        self.assertEqual(algorithm_spans[0]['name'], 'PNNx{threshold: 10}')
+        for e in algorithm_spans:
+            seg = segment_spans[e['args']['segment']]
+            self.assertGreaterEqual(e['ts'], seg['ts'])
+            self.assertLessEqual(e['ts'] + e['dur'], seg['ts'] + seg['dur'] + 1e-3)
+            self.assertFalse(e['args']['cache_hit'])
+        self.assertEqual(len([e for e in t.events() if e['ph'] == 'M']), 1)
+
+        # algorithms with a batch implementation: one call for all the segments
+        with ph.trace() as t:
+            ph.fmap(segments, [ph.Mean(), ph.StDev()], s)
+        algorithm_spans = [e for e in t.events() if e['ph'] == 'X' and e['cat'] == 'algorithm']
+        self.assertEqual([(e['name'], e['args']['segment']) for e in algorithm_spans],
+                         [('Mean{}', None), ('StDev{}', None)])
+
+    def test_trace_open_segment(self):
+        s = ph.EvenlySignal(np.cumsum(np.random.rand(1000) - .5), 10)
+        segments = [ph.Segment(0, 50), ph.Segment(50, None)]
+        with ph.trace() as t:
+            values, _ = ph.fmap(segments, [ph.PNNx(threshold=10)], s)
+        segment_spans = [e for e in t.events() if e['ph'] == 'X' and e['cat'] == 'segment']
+        self.assertEqual([e['args']['end'] for e in segment_spans], [50., None])
+
+    def test_trace_file(self):
+        m = ph.MultiEvenly(np.random.rand(500, 3), 10)
+        path = os.path.join(tempfile.mkdtemp(), 'trace.json')
+        with ph.parallel(3):
+            with ph.trace(path, batch_size=2):
+                ph.fmap(ph.FixedSegments(step=10, width=10)(m), [ph.DFAShortTerm()], m)
+        with open(path) as f:
+            events = json.load(f)
+        spans = [e for e in events if e['ph'] == 'X']
+        self.assertEqual(len([e for e in spans if e['cat'] == 'segment']), 5)
+        # DFAShortTerm runs on each channel in the worker threads
+        algorithm_spans = [e for e in spans if e['cat'] == 'algorithm']
+        self.assertEqual(len([e for e in algorithm_spans if e['name'].startswith('DFAShortTerm')]), 5)
+        self.assertEqual(len([e for e in algorithm_spans if e['name'].startswith('Mean')]), 15)
+        self.assertTrue(all(e['args']['segment'] is not None for e in algorithm_spans))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+import tempfile
+import unittest
+from . import ph, np
+
+__author__ = 'aleb'
+
+
+class ScaledSignalTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1234)
+        self.counts = np.random.randint(-2000, 2000, 10000).astype(np.int16)
+        self.scale = 0.0025
+        self.offset = 1.5
+
+    def test_values_are_scaled_on_read(self):
+        s = ph.from_adc(self.counts, 100, self.scale, self.offset)
+        self.assertTrue(s.is_scaled())
+        self.assertEqual(s.get_raw_values().dtype, np.int16)
+        np.testing.assert_allclose(s.get_values(), self.counts * self.scale + self.offset)
+        self.assertAlmostEqual(s.get_value_t(1), self.counts[100] * self.scale + self.offset)
+
+    def test_numpy_operations_on_counts(self):
+        s = ph.from_adc(self.counts.copy(), 100, self.scale, self.offset)
+        np.testing.assert_array_equal(np.asarray(s), self.counts)
+        self.assertAlmostEqual(float(s.mean()), self.counts.mean())
+        # results of the operations are raw counts, not labelled as scaled
+        shifted = s + 1
+        self.assertFalse(shifted.is_scaled())
+        np.testing.assert_array_equal(shifted.get_values(), self.counts + 1)
+        self.assertFalse((s > 0).is_scaled())
+        self.assertTrue(s.is_scaled())
+        # in place: the storage stays in counts of the same scale
+        s += 1
+        self.assertTrue(s.is_scaled())
+        np.testing.assert_allclose(s.get_values(), (self.counts + 1) * self.scale + self.offset)
+
+    def test_segment_keeps_integer_storage(self):
+        s = ph.from_adc(self.counts, 100, self.scale, self.offset, start_time=10)
+        seg = s.segment_time(20, 30)
+        self.assertEqual(seg.get_raw_values().dtype, np.int16)
+        self.assertTrue(np.shares_memory(seg.get_raw_values(), s.get_raw_values()))
+        self.assertEqual(seg.get_start_time(), 20)
+        np.testing.assert_allclose(seg.get_values(), self.counts[1000:2000] * self.scale + self.offset)
+
+    def test_algorithms_read_physical_values(self):
+        s = ph.from_adc(self.counts, 100, self.scale, self.offset)
+        expected = ph.EvenlySignal(self.counts * self.scale + self.offset, 100)
+        self.assertAlmostEqual(ph.Mean()(s), ph.Mean()(expected))
+        f = ph.IIRFilter(fp=5, fs=10)
+        np.testing.assert_allclose(f(s), f(expected))
+
+    def test_multi_channel_scales(self):
+        counts = np.c_[self.counts, -self.counts, self.counts // 2]
+        scale = [0.1, 0.2, 0.3]
+        offset = [0, 1, 2]
+        s = ph.from_adc(counts, 100, scale, offset)
+        self.assertIsInstance(s, ph.MultiEvenly)
+        np.testing.assert_allclose(s.get_values(), counts * np.array(scale) + np.array(offset))
+        ch = s.get_channel(1)
+        np.testing.assert_allclose(ch.get_values(), -self.counts * 0.2 + 1)
+        seg = s.segment_time(1, 2)
+        np.testing.assert_allclose(seg.get_values(), counts[100:200] * np.array(scale) + np.array(offset))
+
+    def test_memory_mapped_file(self):
+        counts = np.c_[self.counts, -self.counts].astype('<i2')
+        fd, path = tempfile.mkstemp()
+        try:
+            os.write(fd, b'HEAD' + counts.tobytes())
+            os.close(fd)
+            s = ph.from_adc_file(path, 100, [0.5, 0.25], dtype='<i2', n_channels=2, header_bytes=4)
+            self.assertEqual(s.shape, counts.shape)
+            np.testing.assert_allclose(s.get_channel(0).get_values(), self.counts * 0.5)
+            np.testing.assert_allclose(s.get_channel(1).get_values(), -self.counts * 0.25)
+            del s
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
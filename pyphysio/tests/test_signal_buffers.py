@@ -0,0 +1,95 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, np
+
+__author__ = 'aleb'
+
+
+class ChunkedSignalTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1234)
+        self.values = np.cumsum(np.random.rand(10000) - .5)
+        self.s = ph.ChunkedSignal(100, block_len=1000, start_time=5, signal_type='EDA')
+        for i in range(0, len(self.values), 333):
+            self.s.append(self.values[i:i + 333])
+
+    def test_append(self):
+        self.assertEqual(len(self.s), len(self.values))
+        self.assertEqual(len(self.s.get_blocks()), 10)
+        self.assertAlmostEqual(self.s.get_end_time(), 105)
+        np.testing.assert_array_equal(self.s.to_evenly(), self.values)
+
+    def test_segment_within_block_is_a_view(self):
+        seg = self.s.segment_time(15, 20)
+        self.assertIsInstance(seg, ph.EvenlySignal)
+        self.assertEqual(seg.get_start_time(), 15)
+        self.assertTrue(np.shares_memory(seg, self.s.get_blocks()[1]))
+        np.testing.assert_array_equal(seg, self.values[1000:1500])
+
+    def test_segment_across_blocks(self):
+        seg = self.s.segment_time(12, 38)
+        self.assertEqual(seg.get_start_time(), 12)
+        np.testing.assert_array_equal(seg, self.values[700:3300])
+
+    def test_algorithms_and_segmentation(self):
+        evenly = ph.EvenlySignal(self.values, 100, 5, 'EDA')
+        self.assertAlmostEqual(ph.Mean()(self.s), ph.Mean()(evenly))
+        np.testing.assert_allclose(ph.IIRFilter(fp=5, fs=10)(self.s), ph.IIRFilter(fp=5, fs=10)(evenly))
+        r, c = ph.fmap(ph.FixedSegments(step=10, width=10)(self.s), [ph.Mean()], self.s)
+        r_evenly, c = ph.fmap(ph.FixedSegments(step=10, width=10)(evenly), [ph.Mean()], evenly)
+        np.testing.assert_allclose(r.astype(float), r_evenly.astype(float))
+
+    def test_multichannel(self):
+        s = ph.ChunkedSignal(10, block_len=7, n_channels=2)
+        s.append(np.c_[np.arange(20), -np.arange(20)])
+        seg = s.segment_iidx(5, 12)
+        self.assertIsInstance(seg, ph.MultiEvenly)
+        np.testing.assert_array_equal(seg.get_channel(1), -np.arange(5, 12))
+
+
+class RingEvenlySignalTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1234)
+        self.values = np.cumsum(np.random.rand(5000) - .5)
+        self.s = ph.RingEvenlySignal(100, duration=10, start_time=2, signal_type='PPG')
+
+    def test_fill_and_wrap(self):
+        self.s.append(self.values[:600])
+        self.assertEqual(len(self.s), 600)
+        self.assertEqual(self.s.get_start_time(), 2)
+        self.s.append(self.values[600:1250])
+        self.assertEqual(len(self.s), 1000)
+        self.assertAlmostEqual(self.s.get_start_time(), 4.5)
+        self.assertAlmostEqual(self.s.get_end_time(), 14.5)
+        np.testing.assert_array_equal(self.s.to_evenly(), self.values[250:1250])
+        self.assertIn('start_time: 4.5 ', repr(self.s))
+
+    def test_last_views(self):
+        self.s.append(self.values[:1250])
+        last = self.s.get_last(2)
+        self.assertAlmostEqual(last.get_start_time(), 12.5)
+        self.assertTrue(np.shares_memory(last, self.s._buffer))
+        np.testing.assert_array_equal(last, self.values[1050:1250])
+        seg = self.s.segment_time(8, 13)
+        self.assertAlmostEqual(seg.get_start_time(), 8)
+        np.testing.assert_array_equal(seg, self.values[600:1100])
+
+    def test_long_append(self):
+        self.s.append(self.values[:10])
+        self.s.append(self.values[10:])
+        np.testing.assert_array_equal(self.s.to_evenly(), self.values[-1000:])
+        self.assertAlmostEqual(self.s.get_end_time(), 52)
+
+    def test_algorithms(self):
+        self.s.append(self.values[:1700])
+        evenly = ph.EvenlySignal(self.values[700:1700], 100, 9, 'PPG')
+        self.assertAlmostEqual(ph.StDev()(self.s), ph.StDev()(evenly))
+        np.testing.assert_allclose(ph.ConvolutionalFilter('rect', win_len=0.5)(self.s),
+                                   ph.ConvolutionalFilter('rect', win_len=0.5)(evenly))
+        self.assertAlmostEqual(ph.Mean()(self.s.get_last(3)), np.mean(self.values[1400:1700]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# coding=utf-8
+from __future__ import division
+
+import unittest
+from . import ph, np
+from scipy.signal import sosfilt, sosfilt_zi
+
+__author__ = 'aleb'
+
+
+class StreamingTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.s = ph.EvenlySignal(np.cumsum(np.random.randn(128 * 120)), 128, 7, 'EDA')
+        # irregular chunks
+        sizes = np.random.randint(1, 3000, 30)
+        self.bounds = [0] + [b for b in np.cumsum(sizes) if b < len(self.s)] + [len(self.s)]
+
+    def stream(self, streaming, signal=None):
+        signal = self.s if signal is None else signal
+        outputs = [streaming.process(signal.segment_idx(i_start, i_stop))
+                   for i_start, i_stop in zip(self.bounds[:-1], self.bounds[1:])]
+        outputs.append(streaming.flush())
+        return outputs
+
+    def test_convolution(self):
+        s = self.s
+        for f in [ph.ConvolutionalFilter('gauss', 1), ph.ConvolutionalFilter('triang', .5), ph.FIRFilter(fp=[5], fs=[25])]:
+            streaming = ph.StreamingConvolution(f, s.get_sampling_freq(), zero_phase=True)
+            outputs = self.stream(streaming)
+            self.assertGreater(streaming.get_delay(), 0)
+            # the result of the filter on the whole signal
+            np.testing.assert_allclose(np.concatenate(outputs), f(s), rtol=0, atol=1e-9)
+            self.assertIsInstance(outputs[-1], ph.EvenlySignal)
+            i = [len(o) > 0 for o in outputs].index(True)
+            self.assertEqual(outputs[i].get_start_time(), s.get_start_time())
+            self.assertEqual(outputs[i + 1].get_start_time(), s.get_time(len(outputs[i])))
+
+        # causal
+        streaming = ph.StreamingConvolution(ph.ConvolutionalFilter('rect', 1), s.get_sampling_freq())
+        y = np.concatenate([streaming.process(s.get_values()[i:i + 1000]) for i in range(0, len(s), 1000)])
+        self.assertEqual(len(y), len(s))
+        np.testing.assert_allclose(y[128:], np.convolve(s, np.ones(128) / 128)[128:len(s)], rtol=0, atol=1e-9)
+
+    def test_iir(self):
+        s, f = self.s, ph.IIRFilter(fp=2, fs=5)
+        sos = ph.IIRFilter._design(f.get(), s.get_sampling_freq())
+        y = np.concatenate(self.stream(ph.StreamingIIRFilter(f, s.get_sampling_freq())))
+        np.testing.assert_allclose(y, sosfilt(sos, s, zi=sosfilt_zi(sos) * s[0])[0], rtol=0, atol=1e-9)
+
+        streaming = ph.StreamingIIRFilter(f, s.get_sampling_freq(), zero_phase=True)
+        delay = streaming.get_delay()
+        self.assertEqual(delay, ph.IIRFilter.get_margin(f.get(), s.get_sampling_freq()))
+        y = np.concatenate(self.stream(streaming))
+        self.assertEqual(len(y), len(s))
+        # approximately the forward-backward filter, except near the ends
+        np.testing.assert_allclose(y[2 * delay:-2 * delay], f(s)[2 * delay:-2 * delay], rtol=0, atol=1e-4)
+
+    def test_iir_split(self):
+        s, f = self.s, ph.IIRFilter(fp=2, fs=5)
+        fsamp = s.get_sampling_freq()
+        halves = [s.get_values()[:len(s) // 2], s.get_values()[len(s) // 2:]]
+        # causal: the same result whatever the chunks
+        streaming = ph.StreamingIIRFilter(f, fsamp)
+        y_halves = np.concatenate([streaming.process(h) for h in halves] + [streaming.flush()])
+        np.testing.assert_allclose(np.concatenate(self.stream(ph.StreamingIIRFilter(f, fsamp))), y_halves,
+                                   rtol=0, atol=1e-9)
+        # zero phase: the chunks change the result, within the transient of the backward pass
+        streaming = ph.StreamingIIRFilter(f, fsamp, zero_phase=True)
+        y_halves = np.concatenate([streaming.process(h) for h in halves] + [streaming.flush()])
+        y = np.concatenate(self.stream(ph.StreamingIIRFilter(f, fsamp, zero_phase=True)))
+        self.assertGreater(np.max(np.abs(y - y_halves)), 0)
+        np.testing.assert_allclose(y, y_halves, rtol=0, atol=1e-4)
+
+    def test_multi(self):
+        m = ph.MultiEvenly(np.c_[self.s.get_values(), -self.s.get_values()], 128)
+        for streaming in [ph.StreamingIIRFilter(ph.IIRFilter(fp=2, fs=5), 128, zero_phase=True),
+                          ph.StreamingConvolution(ph.ConvolutionalFilter('gauss', 1), 128, zero_phase=True)]:
+            outputs = self.stream(streaming, m)
+            self.assertIsInstance(outputs[-1], ph.MultiEvenly)
+            y = np.concatenate(outputs)
+            self.assertEqual(y.shape, (len(m), 2))
+            np.testing.assert_allclose(y[:, 1], -y[:, 0], rtol=0, atol=1e-9)
@@ -1,13 +1,11 @@
 # coding=utf-8
 from __future__ import division
 import numpy as _np
-from scipy.signal import welch as _welch, periodogram as _periodogram, freqz as _freqz
-import scipy.optimize as _opt
-from scipy import linalg as _linalg
 
 import itertools as _itertools
 from ..BaseTool import Tool as _Tool
 from ..Signal import UnevenlySignal as _UnevenlySignal, EvenlySignal as _EvenlySignal
+from ..Utility import float_dtype as _float_dtype
 
 
 class Diff(_Tool):
@@ -188,7 +186,7 @@ class PeakSelection(_Tool):
         i_start = _np.empty(len(i_peaks), int)
         i_stop = _np.empty(len(i_peaks), int)
 
-        signal_dt = Diff()(signal)
+        signal_dt = signal.get_derived('diff')
         for i in range(len(i_peaks)):
             i_pk = int(i_peaks[i])
 
@@ -335,6 +333,8 @@ class PSD(_Tool):
         _Tool.__init__(self, method=method, nfft=nfft, window=window, min_order=min_order,
                        max_order=max_order, normalize=normalize, remove_mean=remove_mean, **kwargs)
 
+    _multichannel = True
+
     # TODO (Feature - Issue #15): consider point below:
     # A density spectrum considers the amplitudes per unit frequency.
     # Density spectra are used to compare spectra with different frequency resolution as the
@@ -343,6 +343,8 @@ class PSD(_Tool):
 
     @classmethod
     def algorithm(cls, signal, params):
+        from scipy.signal import welch as _welch, periodogram as _periodogram, freqz as _freqz
+        from scipy import linalg as _linalg
         method = params['method']
         nfft = params['nfft'] if "nfft" in params else None
         window = params['window']
@@ -351,16 +353,21 @@ class PSD(_Tool):
 
         assert isinstance(signal, _EvenlySignal), "The PSD can be computed on EvenlySignals only. Consider interpolating the signal: signal.resample(fsamp)"
 
+        if signal.is_multi() and method not in ['fft', 'welch']:
+            return [cls.algorithm(signal.get_channel(i_ch), params) for i_ch in range(signal.get_nchannels())]
+
         fsamp = signal.get_sampling_freq()
+        signal = signal.astype(_float_dtype(signal), copy=False)
 
         if remove_mean:
-            signal = signal - _np.mean(signal)
+            signal = signal - _np.mean(signal, axis=0)
 
+        # multichannel signals are processed along the samples axis
         if method == 'fft':
-            freqs, psd = _periodogram(signal, fs=fsamp, window = window, nfft=nfft, return_onesided=True)
+            freqs, psd = _periodogram(signal, fs=fsamp, window = window, nfft=nfft, return_onesided=True, axis=0)
 
         elif method == 'welch':
-            freqs, psd = _welch(signal, fsamp, window=window, return_onesided=True, nfft=nfft)
+            freqs, psd = _welch(signal, fsamp, window=window, return_onesided=True, nfft=nfft, axis=0)
 
         elif method == 'ar':
             cls.warn("Using AR method: results might not be comparable with other methods")
@@ -438,11 +445,14 @@ class PSD(_Tool):
             cls.warn('Method not understood, using welch.')
             bands_w, psd = _welch(signal, fsamp, nfft=nfft, scaling = 'spectrum')
 
-        freqs = _np.linspace(start=0, stop=fsamp / 2, num=len(psd))
+        freqs = _np.linspace(start=0, stop=fsamp / 2, num=len(psd)).astype(signal.dtype)
+        psd = psd.astype(signal.dtype, copy=False)
 
         # NORMALIZE
         if normalize:
-            psd /= _np.sum(psd)
+            psd /= _np.sum(psd, axis=0)
+        if psd.ndim > 1:
+            return [(freqs, psd[:, i_ch]) for i_ch in range(psd.shape[1])]
         return freqs, psd
 
 
@@ -1141,8 +1151,11 @@ class OptimizeBateman(_Tool):
                        par_ranges=par_ranges, maxiter=maxiter, n_step_1=n_step_1, n_step_2=n_step_2,
                        **kwargs)
 
+    _disk_cache = True
+
     @classmethod
     def algorithm(cls, signal, params):
+        import scipy.optimize as _opt
         delta = params['delta']
         opt_method = params['opt_method']
         complete = params['complete']
@@ -7,6 +7,7 @@ setup(
               'pyphysio.estimators',
               'pyphysio.filters',
               'pyphysio.indicators',
+              'pyphysio.io',
               'pyphysio.segmentation',
               'pyphysio.tools',
               'pyphysio.tests',